@@ -3,29 +3,134 @@ KrishiVannai AI Plant Disease Prediction System
 Advanced Flask web application for AI-powered plant disease detection
 """
 
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, Request, request, render_template, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import numpy as np
 from PIL import Image
 import io
 import base64
-from predict_advanced import AdvancedPlantDiseasePredictor
+import gzip
+import struct
+import copy
+from predict_advanced import AdvancedPlantDiseasePredictor, CascadePlantDiseasePredictor, model_available
+from inference_scheduler import MicroBatchScheduler, QueueFullError, BATCH, BACKGROUND
+from degradation_policy import DegradationPolicy
+from prediction_cache import PredictionCache, hash_stream
+from embedding_index import EmbeddingIndex
+from predictor_manager import PredictorManager, READY, FAILED
+from predictor_pool import PredictorPool, default_pool_size
+from inference_worker import RemotePredictor, DEFAULT_SLOTS
+from model_registry import ModelRegistry, DEFAULT_REGISTRY_PATH
+from model_artifacts import DEFAULT_CACHE_DIR
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import json
 from datetime import datetime
 import traceback
 import logging
+import tempfile
+import threading
+import time
+import functools
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional fast JSON serialization and brotli compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class SpoolingRequest(Request):
+    """Request that spools large multipart uploads to UPLOAD_FOLDER instead of holding them in RAM"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(
+            max_size=app.config['UPLOAD_SPOOL_THRESHOLD'],
+            dir=app.config['UPLOAD_FOLDER']
+        )
+    
+    @property
+    def max_content_length(self):
+        """Only /batch_predict gets the batch allowance; every other route is held to about one upload"""
+        if self.endpoint == 'batch_predict':
+            return app.config['MAX_BATCH_CONTENT_LENGTH']
+        return app.config['MAX_CONTENT_LENGTH']
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which also serializes NumPy values natively"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 app.config['SECRET_KEY'] = 'krishivannai-ai-plant-disease-prediction-secret-key'
 app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max file size
+app.config['MAX_FILE_SIZE'] = 32 * 1024 * 1024  # 32MB max per uploaded image
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_FILE_SIZE'] + 1024 * 1024  # One upload plus form fields
+app.config['MAX_BATCH_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max /batch_predict request
+app.config['UPLOAD_SPOOL_THRESHOLD'] = 1024 * 1024  # Uploads above 1MB are spooled to disk
+app.config['MAX_DECODED_PIXELS'] = int(os.environ.get('MAX_DECODED_PIXELS', 16_000_000))  # Per image, after draft decoding
+app.config['MAX_REQUEST_PIXELS'] = int(os.environ.get('MAX_REQUEST_PIXELS', 200_000_000))  # Across all images in a request
+app.config['THUMBNAIL_SIZE'] = 256  # Longest side of the optional image echo
+app.config['COMPRESSION_MIN_SIZE'] = 1024  # Smaller responses are sent uncompressed
+app.config['MAX_BATCH_FILES'] = int(os.environ.get('MAX_BATCH_FILES', 200))  # Files per /batch_predict call
+app.config['INFERENCE_ENGINE'] = os.environ.get('INFERENCE_ENGINE', 'tensorflow')  # 'tensorflow', 'tflite' or 'onnx'
+app.config['TFLITE_QUANTIZATION'] = os.environ.get('TFLITE_QUANTIZATION', 'float16')  # 'float16' or 'int8'
+app.config['INFERENCE_THREADS'] = int(os.environ['INFERENCE_THREADS']) if os.environ.get('INFERENCE_THREADS') else None
+app.config['CASCADE_ENABLED'] = os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true'  # Basic model first, advanced on low confidence
+app.config['CASCADE_ADVANCED_MODEL'] = os.environ.get('CASCADE_ADVANCED_MODEL', 'best_model_advanced.h5')
+app.config['CASCADE_THRESHOLD'] = float(os.environ.get('CASCADE_THRESHOLD', 0.85))
+app.config['DECODE_WORKERS'] = int(os.environ.get('DECODE_WORKERS', min(8, os.cpu_count() or 1)))
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))  # In-memory results
+app.config['PREDICTION_CACHE_TTL'] = float(os.environ.get('PREDICTION_CACHE_TTL', 24 * 3600))  # Seconds
+app.config['PREDICTION_CACHE_DB'] = os.environ.get('PREDICTION_CACHE_DB')  # SQLite path for the persistent tier
+app.config['NEAR_DUPLICATE_INDEX'] = os.environ.get('NEAR_DUPLICATE_INDEX', 'false').lower() == 'true'  # Embedding lookup
+app.config['NEAR_DUPLICATE_THRESHOLD'] = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.97))  # Cosine similarity
+app.config['NEAR_DUPLICATE_CAPACITY'] = int(os.environ.get('NEAR_DUPLICATE_CAPACITY', 20000))
+app.config['BATCH_WINDOW_MS'] = float(os.environ.get('BATCH_WINDOW_MS', 10))  # Micro-batching window
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MAX_BATCH_SIZE', 16))  # Max requests per forward pass
+app.config['MAX_QUEUE_DEPTH'] = int(os.environ.get('MAX_QUEUE_DEPTH', 64))  # Queued /predict images before 429
+app.config['MAX_CONCURRENT_DECODES'] = int(os.environ.get('MAX_CONCURRENT_DECODES', 2 * app.config['DECODE_WORKERS']))
+app.config['MAX_CONCURRENT_BATCHES'] = int(os.environ.get('MAX_CONCURRENT_BATCHES', 2))  # /batch_predict calls in progress
+app.config['BACKPRESSURE_RETRY_AFTER'] = int(os.environ.get('BACKPRESSURE_RETRY_AFTER', 1))  # Seconds, on 429
+app.config['DEGRADATION_MODE'] = os.environ.get('DEGRADATION_MODE', 'queue_depth')  # 'queue_depth', 'latency' or 'off'
+app.config['DEGRADATION_QUEUE_THRESHOLDS'] = tuple(
+    int(depth) for depth in os.environ.get('DEGRADATION_QUEUE_THRESHOLDS', '8,24,48').split(',')
+)  # Queued /predict images at which each degradation level starts
+app.config['DEGRADATION_LATENCY_SLO_MS'] = float(os.environ.get('DEGRADATION_LATENCY_SLO_MS', 1000))  # Latency mode target
+app.config['DEGRADATION_RECOVERY_SECONDS'] = float(os.environ.get('DEGRADATION_RECOVERY_SECONDS', 5))  # Per level restored
+app.config['MODEL_RETRY_AFTER'] = int(os.environ.get('MODEL_RETRY_AFTER', 5))  # Seconds clients wait while the model loads
+app.config['MODEL_RETRY_BACKOFF'] = float(os.environ.get('MODEL_RETRY_BACKOFF', 5))  # First backoff after a failed load
+app.config['MODEL_RETRY_BACKOFF_MAX'] = float(os.environ.get('MODEL_RETRY_BACKOFF_MAX', 300))  # Backoff cap
+app.config['MODEL_REGISTRY'] = os.environ.get('MODEL_REGISTRY', DEFAULT_REGISTRY_PATH)  # Versioned model registry
+app.config['MODEL_ADMIN_TOKEN'] = os.environ.get('MODEL_ADMIN_TOKEN')  # Enables /model/swap when set
+app.config['MODEL_ARTIFACT_CACHE'] = os.environ.get('MODEL_ARTIFACT_CACHE', DEFAULT_CACHE_DIR) or None  # '' disables
+app.config['PREDICTOR_REPLICAS'] = int(os.environ.get('PREDICTOR_REPLICAS') or default_pool_size(
+    app.config['INFERENCE_ENGINE'], app.config['INFERENCE_THREADS']
+))  # Concurrent model copies; 1 for TensorFlow unless set
+app.config['INFERENCE_WORKERS'] = [a for a in os.environ.get('INFERENCE_WORKERS', '').split(',') if a]  # host:port list
+app.config['INFERENCE_AUTHKEY'] = os.environ.get('INFERENCE_AUTHKEY', '')  # Shared with the inference workers
+app.config['INFERENCE_SLOTS'] = int(os.environ.get('INFERENCE_SLOTS', DEFAULT_SLOTS))  # Shared-memory ring slots
+app.config['INFERENCE_SLOT_MB'] = float(os.environ.get('INFERENCE_SLOT_MB', 4))  # Largest image per slot
 
 # Global error handler for 500 errors only
 @app.errorhandler(500)
@@ -37,6 +142,14 @@ def handle_internal_error(e):
         'error': 'Internal server error occurred'
     }), 500
 
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    """Reject request bodies over the route's limit, including chunked uploads without Content-Length"""
+    return jsonify({
+        'success': False,
+        'error': f"Request too large. Maximum size is {request.max_content_length // (1024 * 1024)}MB."
+    }), 413
+
 # Handle favicon requests
 @app.route('/favicon.ico')
 def favicon():
@@ -45,31 +158,207 @@ def favicon():
 
 
 
+@app.after_request
+def compress_response(response):
+    """
+    Compress JSON and HTML responses with brotli or gzip when the client accepts it
+    
+    The encoding is negotiated on Accept-Encoding quality values: the one the
+    client rates highest wins (brotli on a tie), and q=0 refuses an encoding.
+    """
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'text/html')):
+        return response
+    
+    data = response.get_data()
+    if len(data) < app.config['COMPRESSION_MIN_SIZE']:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    candidates = [('br', request.accept_encodings['br'])] if brotli is not None else []
+    candidates.append(('gzip', request.accept_encodings['gzip']))
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    if quality <= 0:
+        return response
+    
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = len(response.get_data())
+    return response
+
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Initialize the advanced predictor
-predictor = None
+def build_replica(model_path='best_model.h5', class_names_path='class_names.txt', version=None):
+    """
+    Build one (not yet warmed up) predictor
+    
+    Args:
+        model_path (str): Model file to serve (the basic stage in cascade mode)
+        class_names_path (str): Class names file for the model
+        version (str): Version label reported by the predictor
+    """
+    # Check if model files exist (a gzip-compressed copy is decompressed into the artifact cache,
+    # and an exported ONNX model can be served without the Keras file)
+    if not model_available(model_path, app.config['INFERENCE_ENGINE'], app.config['TFLITE_QUANTIZATION']):
+        raise FileNotFoundError(f"No model files found. Please ensure {model_path} is available.")
+    
+    engine_options = {
+        'engine': app.config['INFERENCE_ENGINE'],
+        'quantization': app.config['TFLITE_QUANTIZATION'],
+        'num_threads': app.config['INFERENCE_THREADS'],
+        'model_version': version,
+        'artifact_cache_dir': app.config['MODEL_ARTIFACT_CACHE'],
+        'warmup': False  # The manager warms up separately so readiness can report it
+    }
+    
+    if app.config['CASCADE_ENABLED'] and model_available(
+            app.config['CASCADE_ADVANCED_MODEL'], app.config['INFERENCE_ENGINE'], app.config['TFLITE_QUANTIZATION']):
+        return CascadePlantDiseasePredictor(
+            basic_model_path=model_path,
+            advanced_model_path=app.config['CASCADE_ADVANCED_MODEL'],
+            class_names_path=class_names_path,
+            escalation_threshold=app.config['CASCADE_THRESHOLD'],
+            **engine_options
+        )
+    
+    if app.config['CASCADE_ENABLED']:
+        logger.warning(f"Cascade model {app.config['CASCADE_ADVANCED_MODEL']} not found - using single model")
+    return AdvancedPlantDiseasePredictor(
+        model_path=model_path,
+        class_names_path=class_names_path,
+        fallback_model=model_path,
+        **engine_options
+    )
+
+def build_predictor(model_path='best_model.h5', class_names_path='class_names.txt', version=None):
+    """
+    Build the serving predictor: a client of out-of-process inference workers when
+    INFERENCE_WORKERS is set, a pool of replicas when PREDICTOR_REPLICAS > 1, otherwise
+    a single in-process predictor; called on the loader and swap threads
+    """
+    if app.config['INFERENCE_WORKERS']:
+        # The model lives in the inference processes; this process never imports TensorFlow
+        return RemotePredictor(
+            app.config['INFERENCE_WORKERS'],
+            app.config['INFERENCE_AUTHKEY'].encode(),
+            slots=app.config['INFERENCE_SLOTS'],
+            slot_bytes=int(app.config['INFERENCE_SLOT_MB'] * 1024 * 1024)
+        )
+    
+    replica_factory = functools.partial(
+        build_replica, model_path=model_path, class_names_path=class_names_path, version=version
+    )
+    if app.config['PREDICTOR_REPLICAS'] > 1:
+        return PredictorPool(replica_factory, size=app.config['PREDICTOR_REPLICAS'])
+    return replica_factory()
 
-def initialize_predictor():
-    """Initialize predictor with better error handling"""
-    global predictor
-    try:
-        # Check if model files exist
-        if not os.path.exists('best_model.h5'):
-            logger.error("No model files found. Please ensure best_model.h5 is available.")
-            return False
-        
-        predictor = AdvancedPlantDiseasePredictor(model_path='best_model.h5', class_names_path='class_names.txt', fallback_model='best_model.h5')
-        logger.info("✅ Advanced predictor initialized successfully")
-        return True
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize advanced predictor: {e}")
-        logger.error(traceback.format_exc())
-        return False
+def scheduler_dispatchers(config):
+    """
+    Dispatcher threads for the /predict scheduler: one per batch that can be in
+    flight at once. With INFERENCE_WORKERS that is every full batch that fits in
+    each inference process's ring slots, since a dispatcher waits on its batch
+    while the remote process runs it; in process it is one per predictor replica.
+    """
+    if config['INFERENCE_WORKERS']:
+        return len(config['INFERENCE_WORKERS']) * max(1, config['INFERENCE_SLOTS'] // config['MAX_BATCH_SIZE'])
+    return config['PREDICTOR_REPLICAS']
+
+def registry_factory(entry):
+    """Predictor factory for a model registry entry"""
+    return functools.partial(
+        build_predictor,
+        model_path=entry['model_path'],
+        class_names_path=entry['class_names_path'],
+        version=entry['version']
+    )
+
+# Serve the registry's active version, or best_model.h5 when nothing is registered
+model_registry = ModelRegistry(app.config['MODEL_REGISTRY'])
+active_entry = model_registry.active()
+
+# Load and warm up the predictor in the background so the server starts answering immediately
+predictor_manager = PredictorManager(
+    registry_factory(active_entry) if active_entry else build_predictor,
+    version=active_entry['version'] if active_entry else None,
+    retry_backoff=app.config['MODEL_RETRY_BACKOFF'],
+    max_retry_backoff=app.config['MODEL_RETRY_BACKOFF_MAX']
+)
+predictor_manager.start()
+
+def get_predictor():
+    """Get the serving predictor, or None until it is loaded and warmed up"""
+    return predictor_manager.predictor
+
+def retry_after_header(status):
+    """Retry-After value: the load poll interval, or the remaining backoff while the circuit is open"""
+    return str(max(app.config['MODEL_RETRY_AFTER'], int(status['retry_in_seconds'] + 0.999)))
+
+def unavailable_response():
+    """
+    503 response for requests that arrive before the model is ready
+    
+    A failed load is retried on demand once the circuit breaker's backoff
+    has expired; until then the client is told when to come back.
+    """
+    if predictor_manager.state == FAILED:
+        predictor_manager.start()
+    status = predictor_manager.get_status()
+    
+    response = jsonify({
+        'success': False,
+        'error': f"Prediction service unavailable. Model is {status['state']}.",
+        'model_state': status['state'],
+        'circuit': status['circuit']
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = retry_after_header(status)
+    return response
+
+# Decode batch uploads in parallel (PIL releases the GIL while decoding)
+decode_executor = ThreadPoolExecutor(max_workers=app.config['DECODE_WORKERS'], thread_name_prefix='decode')
+
+# Cache results by upload content and prediction options
+prediction_cache = PredictionCache(
+    max_entries=app.config['PREDICTION_CACHE_SIZE'],
+    ttl_seconds=app.config['PREDICTION_CACHE_TTL'],
+    sqlite_path=app.config['PREDICTION_CACHE_DB']
+)
+
+# Answer recropped / recompressed re-uploads from their nearest embedding neighbour
+near_duplicate_index = EmbeddingIndex(
+    max_items=app.config['NEAR_DUPLICATE_CAPACITY'],
+    similarity_threshold=app.config['NEAR_DUPLICATE_THRESHOLD']
+) if app.config['NEAR_DUPLICATE_INDEX'] else None
+
+# Coalesce concurrent /predict requests into batched forward passes
+scheduler = MicroBatchScheduler(
+    lambda image_arrays, predictor, **options: predictor.predict_batch_from_arrays(image_arrays, **options),
+    max_batch_size=app.config['MAX_BATCH_SIZE'],
+    batch_window_ms=app.config['BATCH_WINDOW_MS'],
+    num_workers=scheduler_dispatchers(app.config),
+    max_queue_depth=app.config['MAX_QUEUE_DEPTH']
+)
+
+# Shed optional work (TTA views, enhancement, cascade escalation, top-N) while the queue is deep
+degradation_policy = DegradationPolicy(
+    mode='latency' if app.config['DEGRADATION_MODE'] == 'latency' else 'queue_depth',
+    queue_thresholds=app.config['DEGRADATION_QUEUE_THRESHOLDS'],
+    latency_slo_ms=app.config['DEGRADATION_LATENCY_SLO_MS'],
+    recovery_seconds=app.config['DEGRADATION_RECOVERY_SECONDS'],
+    enabled=app.config['DEGRADATION_MODE'] != 'off'
+)
 
-# Try to initialize predictor
-initialize_predictor()
+def degrade_options(options, predictor):
+    """Apply the current degradation level to a request's prediction options"""
+    return degradation_policy.apply(
+        options, queue_depth=scheduler.queue_depth(), cascade=predictor.model_type == 'cascade'
+    )
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
@@ -79,18 +368,202 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_uploaded_image(file):
+def uploaded_size(file):
+    """Size in bytes of an uploaded file, measured on its spooled stream rather than trusted from headers"""
+    position = file.stream.tell()
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(position)
+    return size
+
+class UploadProcessingError(Exception):
+    """Raised when an upload can't be decoded into an image"""
+
+def model_cache_tag(predictor):
+    """Identify the serving model in prediction cache keys"""
+    info = predictor.get_model_info()
+    return f"{info['model_type']}:{info['model_path']}:{info['model_version']}:{info['engine']}:{info.get('quantization')}"
+
+def parse_tta_option(value, default='adaptive'):
+    """
+    Parse the use_tta form field
+    
+    Args:
+        value (str): Raw form value ('true', 'false' or 'adaptive')
+        default (str): Value to use when the field is missing
+        
+    Returns:
+        bool or str: True, False or 'adaptive'
+    """
+    value = (value or default).lower()
+    if value == 'adaptive':
+        return 'adaptive'
+    return value == 'true'
+
+def parse_count_option(value, default, maximum):
+    """
+    Parse a positive count form field (top_n, k)
+    
+    Args:
+        value (str): Raw form value, or None when the field is missing
+        default (int): Value to use when the field is missing
+        maximum (int): Largest value served; larger requests are capped
+        
+    Returns:
+        int: Count between 1 and maximum
+        
+    Raises:
+        ValueError: If the value isn't an integer of at least 1
+    """
+    count = default if value is None else int(value)
+    if count < 1:
+        raise ValueError(f"must be at least 1, got {count}")
+    return min(count, maximum)
+
+class PixelBudget:
+    """Thread-safe cap on the pixels decoded for one request"""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+    
+    def consume(self, pixels):
+        """Reserve pixels for an image, raising ValueError once the request is over budget"""
+        with self._lock:
+            if self.used + pixels > self.limit:
+                raise ValueError('Too many image pixels in this request')
+            self.used += pixels
+
+class ServiceSaturated(Exception):
+    """Raised when a bounded stage is full and the request should be retried later"""
+
+class AdmissionGate:
+    """Bounded concurrency for an expensive stage that rejects work instead of queueing it"""
+    
+    def __init__(self, name, limit, wait_seconds=0.05):
+        self.name = name
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+    
+    def __enter__(self):
+        if not self._semaphore.acquire(timeout=self.wait_seconds):
+            with self._lock:
+                self.rejected += 1
+            raise ServiceSaturated(f'Too many concurrent {self.name} operations')
+        with self._lock:
+            self.in_use += 1
+            self.admitted += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+    
+    def get_stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'in_use': self.in_use, 'admitted': self.admitted, 'rejected': self.rejected}
+
+def saturated_response(error):
+    """429 response asking the client to back off"""
+    response = jsonify({
+        'success': False,
+        'error': f'Service is busy, please retry shortly ({error})'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(app.config['BACKPRESSURE_RETRY_AFTER'])
+    return response
+
+# Bound the work a burst can pile up: concurrent decodes and batch calls beyond these limits get a 429
+decode_gate = AdmissionGate('decode', app.config['MAX_CONCURRENT_DECODES'])
+batch_gate = AdmissionGate('batch', app.config['MAX_CONCURRENT_BATCHES'])
+
+def extract_exif_thumbnail(exif_bytes):
+    """
+    Extract the JPEG preview embedded in EXIF IFD1, if there is one
+    
+    Args:
+        exif_bytes (bytes): Raw EXIF block from image.info['exif']
+        
+    Returns:
+        bytes: Embedded JPEG thumbnail, or None
+    """
+    try:
+        if exif_bytes.startswith(b'Exif\x00\x00'):
+            exif_bytes = exif_bytes[6:]
+        
+        byte_order = {b'II': '<', b'MM': '>'}.get(exif_bytes[:2])
+        if byte_order is None:
+            return None
+        
+        # Skip IFD0 to find the offset of IFD1, which describes the thumbnail
+        ifd0_offset = struct.unpack(byte_order + 'I', exif_bytes[4:8])[0]
+        ifd0_entries = struct.unpack(byte_order + 'H', exif_bytes[ifd0_offset:ifd0_offset + 2])[0]
+        next_ifd = ifd0_offset + 2 + ifd0_entries * 12
+        ifd1_offset = struct.unpack(byte_order + 'I', exif_bytes[next_ifd:next_ifd + 4])[0]
+        if not ifd1_offset:
+            return None
+        
+        thumbnail_offset = thumbnail_length = None
+        ifd1_entries = struct.unpack(byte_order + 'H', exif_bytes[ifd1_offset:ifd1_offset + 2])[0]
+        for i in range(ifd1_entries):
+            entry = ifd1_offset + 2 + i * 12
+            tag, _, _, value = struct.unpack(byte_order + 'HHII', exif_bytes[entry:entry + 12])
+            if tag == 0x0201:  # JPEGInterchangeFormat
+                thumbnail_offset = value
+            elif tag == 0x0202:  # JPEGInterchangeFormatLength
+                thumbnail_length = value
+        
+        if not thumbnail_offset or not thumbnail_length:
+            return None
+        thumbnail = exif_bytes[thumbnail_offset:thumbnail_offset + thumbnail_length]
+        return thumbnail if thumbnail.startswith(b'\xff\xd8') else None
+    
+    except struct.error:
+        return None
+
+def encode_thumbnail(image, exif_bytes=None):
+    """
+    Encode a small preview of an upload as a base64 data URL
+    
+    Uses the EXIF-embedded preview when the upload has one, otherwise
+    downsizes the (already draft-decoded) image.
+    """
+    thumbnail = extract_exif_thumbnail(exif_bytes) if exif_bytes else None
+    if thumbnail is None:
+        preview = image.copy()
+        preview.thumbnail((app.config['THUMBNAIL_SIZE'], app.config['THUMBNAIL_SIZE']))
+        img_buffer = io.BytesIO()
+        preview.save(img_buffer, format='JPEG', quality=80)
+        thumbnail = img_buffer.getvalue()
+    
+    return f"data:image/jpeg;base64,{base64.b64encode(thumbnail).decode()}"
+
+def process_uploaded_image(file, pixel_budget=None, include_image=False, predictor=None):
     """
     Process uploaded image and convert to format suitable for prediction
     
+    JPEGs are decoded in the DCT domain close to the model's input size
+    (Image.draft) and other formats are box-reduced right after decoding, so
+    full-resolution phone photos never go through the rest of the pipeline.
+    
     Args:
         file: Uploaded file object
+        pixel_budget (PixelBudget): Shared decoded-pixel budget for the request
+        include_image (bool): Whether to return a thumbnail of the upload
+        predictor: Predictor whose input size to decode for (defaults to the serving one)
         
     Returns:
-        tuple: (processed_image_array, original_image_base64, image_info)
+        tuple: (uint8_image_array, thumbnail_base64 or None, image_info)
     """
     try:
-        # Read image
+        # Read image header
         image = Image.open(file.stream)
         
         # Get image info
@@ -101,21 +574,32 @@ def process_uploaded_image(file):
             'filename': file.filename
         }
         
+        # Decode close to the model input size
+        predictor = predictor or get_predictor()
+        target_width, target_height = (predictor.IMG_WIDTH, predictor.IMG_HEIGHT) if predictor else (224, 224)
+        if image.format == 'JPEG':
+            image.draft('RGB', (target_width, target_height))
+        
+        decoded_pixels = image.size[0] * image.size[1]
+        if decoded_pixels > app.config['MAX_DECODED_PIXELS']:
+            raise ValueError(f'Image too large to decode ({image.size[0]}x{image.size[1]})')
+        if pixel_budget is not None:
+            pixel_budget.consume(decoded_pixels)
+        
         # Convert to RGB if necessary
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Save original image as base64 for display
-        img_buffer = io.BytesIO()
-        image.save(img_buffer, format='JPEG', quality=95)
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
-        original_image_b64 = f"data:image/jpeg;base64,{img_str}"
+        # Cheap integer box reduction for formats without draft support
+        factor = min(image.width // target_width, image.height // target_height)
+        if factor >= 2:
+            image = image.reduce(factor)
+        
+        # Thumbnail for display, only when the client asks for it
+        original_image_b64 = encode_thumbnail(image, image.info.get('exif')) if include_image else None
         
-        # Resize for prediction based on model type
-        target_size = (predictor.IMG_WIDTH, predictor.IMG_HEIGHT) if predictor else (224, 224)
-        resized_image = image.resize(target_size, Image.Resampling.LANCZOS)
-        image_array = np.array(resized_image)
-        image_array = image_array.astype('float32') / 255.0
+        # Rescaling, enhancement and resizing happen in the predictor's preprocessing graph
+        image_array = np.asarray(image, dtype=np.uint8)
         
         return image_array, original_image_b64, image_info
     
@@ -123,18 +607,68 @@ def process_uploaded_image(file):
         print(f"❌ Error processing image: {e}")
         raise
 
+def needs_full_pass(predictor, options, first_pass):
+    """Check whether the requested options need more than the un-augmented first pass"""
+    if predictor.model_type == 'cascade':
+        return options.get('escalate', True) and first_pass['confidence'] < predictor.escalation_threshold
+    return bool(options['use_tta']) and predictor.model_type == 'advanced'
+
+def predict_or_reuse_near_duplicate(image_array, predictor, options, model_tag, content_hash):
+    """
+    Predict an upload, answering near-identical re-uploads from their earlier result
+    
+    The un-augmented pass runs first and also returns the embedding. A close
+    enough earlier upload served with the same options answers the request,
+    so recropped or recompressed re-uploads never pay for TTA views or cascade
+    escalation; on a miss the full prediction runs only if the options need it.
+    
+    Args:
+        image_array (np.array): Decoded uint8 upload
+        predictor: Serving predictor the request started with
+        options (dict): Prediction options after degradation
+        model_tag (str): Serving model, from model_cache_tag
+        content_hash (str): SHA-256 of the upload
+        
+    Returns:
+        dict: Prediction results, with 'near_duplicate' set when reused
+    """
+    first_options = dict(options, use_tta=False, return_embeddings=True)
+    if predictor.model_type == 'cascade':
+        first_options['escalate'] = False  # Cascade embeddings come from the basic stage
+    results = scheduler.predict(image_array, predictor=predictor, **first_options)
+    embedding = results.pop('embedding')
+    
+    options_tag = (model_tag, tuple(sorted(options.items())))
+    match = near_duplicate_index.find_near_duplicate(
+        embedding, accept=lambda payload: payload['options'] == options_tag
+    )
+    if match is not None:
+        similarity, payload = match
+        results = copy.deepcopy(payload['results'])
+        results['near_duplicate'] = {'similarity': similarity, 'content_hash': payload['content_hash']}
+        return results
+    
+    if needs_full_pass(predictor, options, results):
+        results = scheduler.predict(image_array, predictor=predictor, **options)
+    near_duplicate_index.add(embedding, {
+        'options': options_tag,
+        'content_hash': content_hash,
+        'results': copy.deepcopy(results)
+    })
+    return results
+
 @app.route('/')
 def index():
     """Enhanced home page"""
     try:
-        logger.info(f"Index route accessed. Predictor status: {predictor is not None}")
+        predictor = get_predictor()
+        status = predictor_manager.get_status()
+        logger.info(f"Index route accessed. Predictor state: {status['state']}")
         
         if predictor is None:
-            logger.error("Predictor is None - attempting to reinitialize")
-            if not initialize_predictor():
-                model_info = {'model_type': 'unavailable', 'error': 'Failed to initialize predictor'}
-            else:
-                model_info = predictor.get_model_info()
+            if status['state'] == FAILED:
+                predictor_manager.start()
+            model_info = {'model_type': status['state'], 'error': status['error']}
         else:
             model_info = predictor.get_model_info()
             
@@ -144,20 +678,27 @@ def index():
     except Exception as e:
         logger.error(f"Error in index route: {e}")
         logger.error(traceback.format_exc())
-        return f"<h1>Error Loading Page</h1><p>{str(e)}</p><p>Predictor Status: {predictor is not None}</p>", 500
+        return f"<h1>Error Loading Page</h1><p>{str(e)}</p><p>Predictor State: {predictor_manager.state}</p>", 500
 
 @app.route('/predict', methods=['POST'])
 def predict():
     """Handle image upload and advanced prediction"""
     try:
-        # Check if predictor is available
-        if not predictor:
-            logger.error("Predictor not available - attempting to reinitialize")
-            if not initialize_predictor():
-                return jsonify({
-                    'success': False,
-                    'error': 'Prediction service unavailable. Model not loaded.'
-                }), 503
+        # Answer fast while the model is still loading or warming up
+        predictor = get_predictor()
+        if predictor is None:
+            return unavailable_response()
+        
+        # Shed load before the upload is parsed when the inference queue is already full
+        if scheduler.is_saturated():
+            return saturated_response('inference queue is full')
+        
+        # Check request size against the single-image limit
+        if request.content_length and request.content_length > app.config['MAX_FILE_SIZE']:
+            return jsonify({
+                'success': False,
+                'error': f"File too large. Maximum size is {app.config['MAX_FILE_SIZE'] // (1024 * 1024)}MB."
+            }), 413
         
         # Check if file was uploaded
         if 'file' not in request.files:
@@ -182,50 +723,100 @@ def predict():
                 'error': 'Invalid file type. Please upload PNG, JPG, JPEG, GIF, BMP, TIFF, or WebP files.'
             }), 400
         
+        # Check the received file too; chunked uploads carry no Content-Length
+        if uploaded_size(file) > app.config['MAX_FILE_SIZE']:
+            return jsonify({
+                'success': False,
+                'error': f"File too large. Maximum size is {app.config['MAX_FILE_SIZE'] // (1024 * 1024)}MB."
+            }), 413
+        
         # Get prediction options from form
-        use_tta = request.form.get('use_tta', 'true').lower() == 'true'
+        use_tta = parse_tta_option(request.form.get('use_tta'))
         enhance_image = request.form.get('enhance_image', 'true').lower() == 'true'
-        top_n = min(int(request.form.get('top_n', 5)), 10)  # Max 10 predictions
-        
-        # Process image
         try:
-            image_array, original_image_b64, image_info = process_uploaded_image(file)
-        except Exception as e:
-            logger.error(f"Error processing image: {e}")
+            top_n = parse_count_option(request.form.get('top_n'), 5, 10)  # Max 10 predictions
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': f'Error processing image: {str(e)}'
+                'error': f'Invalid top_n: {str(e)}'
             }), 400
+        include_image = request.form.get('include_image', 'false').lower() == 'true'
         
-        # Make prediction
-        try:
-            results = predictor.predict_image_from_array(
-                image_array, 
-                top_n=top_n, 
-                use_tta=use_tta
-            )
+        # Under load, serve with cheaper options than requested
+        options, degraded = degrade_options(
+            {'use_tta': use_tta, 'enhance_image': enhance_image, 'top_n': top_n}, predictor
+        )
+        
+        # Identical uploads with identical options share one cached (or in-flight) result
+        content_hash = hash_stream(file.stream)
+        model_tag = model_cache_tag(predictor)
+        cache_key = prediction_cache.make_key(
+            content_hash,
+            model=model_tag,
+            include_image=include_image,
+            **options
+        )
+        
+        def run_prediction():
+            # Process image, with a bounded number of decodes in flight
+            with decode_gate:
+                try:
+                    image_array, original_image_b64, image_info = process_uploaded_image(file, include_image=include_image, predictor=predictor)
+                except Exception as e:
+                    raise UploadProcessingError(str(e)) from e
             
-            # Add image and processing info to results
-            results['original_image'] = original_image_b64
-            results['image_info'] = image_info
-            results['processing_options'] = {
-                'use_tta': use_tta,
-                'enhance_image': enhance_image,
-                'top_n': top_n
-            }
+            # Make prediction (on the model this request started with, even if a swap happens meanwhile)
+            started_at = time.monotonic()
+            if near_duplicate_index is not None and predictor.supports_embeddings():
+                results = predict_or_reuse_near_duplicate(image_array, predictor, options, model_tag, content_hash)
+            else:
+                results = scheduler.predict(image_array, predictor=predictor, **options)
+            degradation_policy.observe_latency((time.monotonic() - started_at) * 1000.0)
             
+            # Add image info to results
+            if original_image_b64:
+                results['original_image'] = original_image_b64
+            results['image_info'] = image_info
+            return results
+        
+        try:
+            results, cache_source = prediction_cache.get_or_compute(cache_key, run_prediction)
+        except UploadProcessingError as e:
+            logger.error(f"Error processing image: {e}")
             return jsonify({
-                'success': True,
-                'results': results
-            })
-            
+                'success': False,
+                'error': f'Error processing image: {str(e)}'
+            }), 400
+        except (ServiceSaturated, QueueFullError) as e:
+            logger.warning(f"Rejecting prediction under load: {e}")
+            return saturated_response(e)
         except Exception as e:
             logger.error(f"Error making prediction: {e}")
             return jsonify({
                 'success': False,
                 'error': f'Error making prediction: {str(e)}'
             }), 500
+        
+        logger.info(f"TTA views evaluated: {results['tta_views']} (use_tta={options['use_tta']}, cache={cache_source})")
+        
+        # Add request-specific info to results
+        results['image_info']['filename'] = file.filename
+        results['cache'] = cache_source
+        results['degraded'] = degraded
+        results['processing_options'] = {
+            'use_tta': options['use_tta'],
+            'enhance_image': options['enhance_image'],
+            'top_n': options['top_n'],
+            'include_image': include_image
+        }
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        })
     
+    except RequestEntityTooLarge as e:
+        return handle_request_too_large(e)
     except Exception as e:
         logger.error(f"Unexpected error in predict: {e}")
         return jsonify({
@@ -237,69 +828,280 @@ def predict():
 def batch_predict():
     """Handle batch prediction for multiple images"""
     try:
-        if not predictor:
-            return jsonify({'error': 'Prediction service unavailable'}), 503
+        predictor = get_predictor()
+        if predictor is None:
+            return unavailable_response()
         
         files = request.files.getlist('files')
         if not files or len(files) == 0:
             return jsonify({'error': 'No files uploaded'}), 400
         
-        if len(files) > 10:  # Limit batch size
-            return jsonify({'error': 'Maximum 10 files allowed in batch mode'}), 400
+        max_files = app.config['MAX_BATCH_FILES']
+        if len(files) > max_files:  # Limit batch size
+            return jsonify({'error': f'Maximum {max_files} files allowed in batch mode'}), 400
         
-        results = []
-        use_tta = request.form.get('use_tta', 'false').lower() == 'true'  # Disabled by default for batch
+        use_tta = parse_tta_option(request.form.get('use_tta'), default='false')  # Disabled by default for batch
+        enhance_image = request.form.get('enhance_image', 'false').lower() == 'true'
+        include_image = request.form.get('include_image', 'false').lower() == 'true'
+        priority = BACKGROUND if request.form.get('priority') == BACKGROUND else BATCH  # Bulk jobs can yield further
+        files = [file for file in files if file.filename != '' and allowed_file(file.filename)]
+        options, degraded = degrade_options({'use_tta': use_tta, 'enhance_image': enhance_image, 'top_n': 3}, predictor)
         
-        for file in files:
-            if file.filename == '' or not allowed_file(file.filename):
-                continue
-            
+        # Only a few batch calls decode and predict at once; the rest are told to retry
+        with batch_gate:
+            # Hash, check the cache, then decode the misses in parallel
+            pixel_budget = PixelBudget(app.config['MAX_REQUEST_PIXELS'])
+            model_tag = model_cache_tag(predictor)
+            def decode(file):
+                item = {'cache_key': None, 'cached': None, 'cache_source': None, 'processed': None, 'error': None}
+                try:
+                    if uploaded_size(file) > app.config['MAX_FILE_SIZE']:
+                        raise ValueError(f"File too large. Maximum size is {app.config['MAX_FILE_SIZE'] // (1024 * 1024)}MB.")
+                    item['cache_key'] = prediction_cache.make_key(
+                        hash_stream(file.stream), model=model_tag, include_image=include_image, **options
+                    )
+                    item['cached'], item['cache_source'] = prediction_cache.get(item['cache_key'])
+                    if item['cached'] is None:
+                        # Batch files count against the same decode limit as /predict uploads
+                        with decode_gate:
+                            item['processed'] = process_uploaded_image(file, pixel_budget, include_image, predictor)
+                except ServiceSaturated:
+                    raise
+                except Exception as e:
+                    item['error'] = e
+                return item
+            pending = [decode_executor.submit(decode, file) for file in files]
             try:
-                image_array, original_image_b64, image_info = process_uploaded_image(file)
-                prediction = predictor.predict_image_from_array(image_array, top_n=3, use_tta=use_tta)
-                
-                prediction['original_image'] = original_image_b64
-                prediction['image_info'] = image_info
+                decoded = [future.result() for future in pending]
+            except ServiceSaturated:
+                for future in pending:  # Don't decode the rest of a batch that is being rejected
+                    future.cancel()
+                raise
+        
+            # Queue the decoded images behind interactive /predict requests; the scheduler
+            # dispatches them in chunks so single-image requests can run in between
+            valid = [i for i, item in enumerate(decoded) if item['processed'] is not None]
+            predictions = []
+            if valid:
+                futures = scheduler.submit_many(
+                    [decoded[i]['processed'][0] for i in valid], priority, predictor=predictor, **options
+                )
+                try:
+                    predictions = [future.result() for future in futures]
+                except Exception as e:
+                    logger.error(f"Error making batch prediction: {e}")
+                    return jsonify({'error': f'Batch prediction failed: {str(e)}'}), 500
+            predictions = dict(zip(valid, predictions))
+        
+            results = []
+            for i, (file, item) in enumerate(zip(files, decoded)):
+                if item['error'] is not None:
+                    results.append({
+                        'error': f'Failed to process {file.filename}: {str(item["error"])}',
+                        'filename': file.filename
+                    })
+                    continue
+            
+                if item['cached'] is not None:
+                    prediction = item['cached']
+                    prediction['cache'] = item['cache_source']
+                else:
+                    _, original_image_b64, image_info = item['processed']
+                    prediction = predictions[i]
+                    if original_image_b64:
+                        prediction['original_image'] = original_image_b64
+                    prediction['image_info'] = image_info
+                    prediction_cache.put(item['cache_key'], prediction)
+                    prediction['cache'] = 'computed'
+            
+                prediction['image_info']['filename'] = file.filename
+                prediction['degraded'] = degraded
                 results.append(prediction)
-                
-            except Exception as e:
-                results.append({
-                    'error': f'Failed to process {file.filename}: {str(e)}',
-                    'filename': file.filename
-                })
         
-        return jsonify({
-            'success': True,
-            'results': results,
-            'processed_count': len(results)
-        })
+            return jsonify({
+                'success': True,
+                'results': results,
+                'processed_count': len(results)
+            })
         
+    except RequestEntityTooLarge as e:
+        return handle_request_too_large(e)
+    except (ServiceSaturated, QueueFullError) as e:
+        return saturated_response(e)
     except Exception as e:
         return jsonify({'error': f'Batch prediction failed: {str(e)}'}), 500
 
+@app.route('/similar', methods=['POST'])
+def similar_cases():
+    """Find past uploads that look like the given image"""
+    predictor = get_predictor()
+    if predictor is None:
+        return unavailable_response()
+    if near_duplicate_index is None or not predictor.supports_embeddings():
+        return jsonify({'success': False, 'error': 'Similarity search is not enabled'}), 404
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'No valid image uploaded'}), 400
+    
+    try:
+        k = parse_count_option(request.form.get('k'), 5, 50)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid k: {str(e)}'}), 400
+    
+    try:
+        image_array, _, _ = process_uploaded_image(file, predictor=predictor)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error processing image: {str(e)}'}), 400
+    
+    # The embedding is computed by a scheduled batch like any other prediction
+    options = {'top_n': 1, 'use_tta': False, 'enhance_image': False, 'return_embeddings': True}
+    if predictor.model_type == 'cascade':
+        options['escalate'] = False  # Cascade embeddings come from the basic stage
+    try:
+        embedding = scheduler.predict(image_array, predictor=predictor, **options)['embedding']
+    except QueueFullError as e:
+        return saturated_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error computing embedding: {str(e)}'}), 500
+    
+    matches = [{
+        'similarity': similarity,
+        'content_hash': payload['content_hash'],
+        'top_prediction': payload['results']['top_prediction'],
+        'confidence': payload['results']['confidence'],
+        'plant': payload['results']['plant'],
+        'disease': payload['results']['disease']
+    } for similarity, payload in near_duplicate_index.search(embedding, k=k)]
+    
+    return jsonify({'success': True, 'matches': matches})
+
 @app.route('/model_info')
 def model_info():
     """Get detailed model information"""
-    if not predictor:
-        return jsonify({'error': 'Predictor not available'}), 503
+    predictor = get_predictor()
+    if predictor is None:
+        return unavailable_response()
     
     info = predictor.get_model_info()
     info['classes'] = predictor.class_names[:10]  # First 10 classes
     info['total_classes'] = len(predictor.class_names)
+    info['swap'] = predictor_manager.get_status()['swap']
     
     return jsonify(info)
 
+def admin_authorized():
+    """Check the admin token for model management routes (disabled when no token is configured)"""
+    token = app.config['MODEL_ADMIN_TOKEN']
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+@app.route('/model/versions')
+def model_versions():
+    """List the model registry and the serving version"""
+    registry = model_registry.list_versions()
+    registry['serving'] = predictor_manager.version
+    return jsonify(registry)
+
+@app.route('/model/swap', methods=['POST'])
+def swap_model():
+    """
+    Hot-swap the serving model
+    
+    JSON body: {"version": "<registry version>"} or {"model_path": ..., "class_names_path": ...,
+    "version": "<label>"}; an empty body swaps to the registry's active version.
+    The new model is loaded and warmed up in the background; poll /model_info for the result.
+    """
+    if not admin_authorized():
+        return jsonify({'success': False, 'error': 'Not authorized'}), 403
+    
+    body = request.get_json(silent=True) or {}
+    try:
+        if body.get('model_path'):
+            entry = {
+                'model_path': body['model_path'],
+                'class_names_path': body.get('class_names_path', 'class_names.txt'),
+                'version': body.get('version') or os.path.basename(body['model_path'])
+            }
+        elif body.get('version'):
+            entry = model_registry.get(body['version'])
+        else:
+            entry = model_registry.active()
+            if entry is None:
+                return jsonify({'success': False, 'error': 'No active version in the model registry'}), 400
+    except KeyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    
+    # A gzip copy, or a TFLite/ONNX conversion the configured engine serves, is enough;
+    # inference workers load their own model, so there is nothing to check here
+    if not app.config['INFERENCE_WORKERS'] and not model_available(
+            entry['model_path'], app.config['INFERENCE_ENGINE'], app.config['TFLITE_QUANTIZATION']):
+        return jsonify({
+            'success': False,
+            'error': f"No model files for {app.config['INFERENCE_ENGINE']} found at {entry['model_path']}"
+        }), 400
+    
+    if not predictor_manager.swap(registry_factory(entry), entry['version']):
+        return jsonify({'success': False, 'error': 'A model load or swap is already in progress'}), 409
+    
+    logger.info(f"Model swap to {entry['version']} ({entry['model_path']}) started")
+    return jsonify({
+        'success': True,
+        'version': entry['version'],
+        'serving_version': predictor_manager.version
+    }), 202
+
+@app.route('/metrics')
+def metrics():
+    """Get model loading, inference scheduler and prediction cache metrics"""
+    predictor = get_predictor()
+    return jsonify({
+        'timestamp': datetime.now().isoformat(),
+        'predictor': predictor_manager.get_status(),
+        'predictor_pool': predictor.get_stats() if isinstance(predictor, PredictorPool) else None,
+        'scheduler': scheduler.get_stats(),
+        'admission': {'decode': decode_gate.get_stats(), 'batch': batch_gate.get_stats()},
+        'degradation': degradation_policy.get_stats(),
+        'cache': prediction_cache.get_stats(),
+        'near_duplicate_index': near_duplicate_index.get_stats() if near_duplicate_index is not None else None
+    })
+
+@app.route('/health/live')
+def liveness_check():
+    """Liveness probe: the process is up and serving HTTP, whatever the model state"""
+    return jsonify({
+        'status': 'alive',
+        'timestamp': datetime.now().isoformat(),
+        'model_state': predictor_manager.state
+    })
+
+@app.route('/health/ready')
+def readiness_check():
+    """Readiness probe: only 200 once the model is loaded and warmed up"""
+    status = predictor_manager.get_status()
+    status['ready'] = status['state'] == READY
+    status['timestamp'] = datetime.now().isoformat()
+    
+    if not status['ready']:
+        response = jsonify(status)
+        response.status_code = 503
+        response.headers['Retry-After'] = retry_after_header(status)
+        return response
+    return jsonify(status)
+
 @app.route('/health')
 def health_check():
     """Enhanced health check endpoint"""
+    predictor = get_predictor()
     health_status = {
         'status': 'healthy' if predictor else 'degraded',
+        'model_state': predictor_manager.state,
         'timestamp': datetime.now().isoformat(),
         'predictor_available': predictor is not None,
-        'model_loaded': predictor.model is not None if predictor else False,
+        'model_loaded': predictor.has_model() if predictor else False,
+        'engine': predictor.engine if predictor else 'none',
         'classes_loaded': len(predictor.class_names) if predictor else 0,
         'model_type': predictor.model_type if predictor else 'none',
-        'supports_tta': predictor.model_type == 'advanced' if predictor else False
+        'supports_tta': predictor.get_model_info()['supports_tta'] if predictor else False
     }
     
     status_code = 200 if predictor else 503
@@ -310,30 +1112,17 @@ def health_check():
 if __name__ == '__main__':
     print("🚀 Starting KrishiVannai AI Plant Disease Prediction App...")
     
-    # Decompress model if needed
-    if os.path.exists('model_phase1.h5.gz') and not os.path.exists('model_phase1.h5'):
-        print("📦 Decompressing model file...")
-        try:
-            import gzip
-            import shutil
-            with gzip.open('model_phase1.h5.gz', 'rb') as f_in:
-                with open('model_phase1.h5', 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            print("✅ Model decompressed successfully")
-            # Reinitialize predictor after decompression
-            initialize_predictor()
-        except Exception as e:
-            print(f"❌ Failed to decompress model: {e}")
-    
+    predictor = get_predictor()
     if predictor:
         model_info = predictor.get_model_info()
         print(f"📊 Model Type: {model_info['model_type']}")
-        print(f"🧠 Model Path: {model_info['model_path']}")
+        print(f"🧠 Model Path: {model_info['model_path']} (version {model_info['model_version']})")
         print(f"📐 Input Size: {model_info['input_size']}")
         print(f"🎯 Classes: {model_info['num_classes']}")
         print(f"🔬 TTA Support: {model_info['supports_tta']}")
+        print(f"⏱️ Load Phases: {predictor_manager.timings.get('phases')}")
     else:
-        print("⚠️ Predictor not available - check model files")
+        print(f"⏳ Predictor is {predictor_manager.state} - /health/ready reports when it can serve")
     
     print(f"🌐 Starting server on port 5000")
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
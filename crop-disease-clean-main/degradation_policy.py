@@ -0,0 +1,154 @@
+"""
+Load-aware quality degradation for plant disease predictions
+Sheds optional work (TTA views, enhancement, cascade escalation, long top-N
+lists) as the inference queue deepens or latency exceeds its SLO, and
+restores full quality as load falls
+"""
+
+import threading
+import time
+
+from predict_advanced import TTA_VIEWS
+
+# Option overrides per degradation level; level 0 serves requests as asked
+DEGRADATION_LEVELS = (
+    {},
+    {'tta_views': 3, 'enhance_image': False},
+    {'use_tta': False, 'enhance_image': False, 'top_n': 3},
+    {'use_tta': False, 'enhance_image': False, 'top_n': 1, 'escalate': False},
+)
+
+class DegradationPolicy:
+    def __init__(self, mode='queue_depth', queue_thresholds=(8, 24, 48), latency_slo_ms=1000.0,
+                 latency_thresholds=(0.8, 1.0, 1.5), recovery_seconds=5.0, ewma_alpha=0.2, enabled=True):
+        """
+        Initialize the degradation policy
+
+        Args:
+            mode (str): 'queue_depth' or 'latency', the load signal that picks the level
+            queue_thresholds (tuple): Queue depths at which levels 1, 2 and 3 start
+            latency_slo_ms (float): Latency target in latency mode
+            latency_thresholds (tuple): Fractions of the SLO at which levels 1, 2 and 3 start
+            recovery_seconds (float): Time load must stay lower before stepping back up one level
+            ewma_alpha (float): Smoothing of observed latencies
+            enabled (bool): False always serves full quality
+        """
+        if mode not in ('queue_depth', 'latency'):
+            raise ValueError(f"Unknown degradation mode: {mode}")
+        self.mode = mode
+        self.queue_thresholds = tuple(queue_thresholds)
+        self.latency_slo_ms = latency_slo_ms
+        self.latency_thresholds = tuple(latency_thresholds)
+        self.recovery_seconds = recovery_seconds
+        self.ewma_alpha = ewma_alpha
+        self.enabled = enabled
+
+        self.level = 0
+        self._latency_ewma = 0.0
+        self._lower_since = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._degraded_requests = 0
+        self._level_changes = 0
+
+    def observe_latency(self, latency_ms):
+        """Record the latency of a served prediction"""
+        with self._lock:
+            self._latency_ewma += self.ewma_alpha * (latency_ms - self._latency_ewma)
+
+    def _target_level(self, queue_depth):
+        """Level the current load calls for"""
+        if self.mode == 'latency':
+            ratio = self._latency_ewma / self.latency_slo_ms
+            return sum(ratio >= threshold for threshold in self.latency_thresholds)
+        return sum(queue_depth >= threshold for threshold in self.queue_thresholds)
+
+    def update(self, queue_depth=0):
+        """
+        Move to the level the load calls for
+
+        Degrades immediately, but only restores quality one level at a time
+        once load has stayed lower for recovery_seconds, so the level doesn't
+        flap around a threshold.
+
+        Returns:
+            int: Current degradation level
+        """
+        if not self.enabled:
+            return 0
+
+        with self._lock:
+            target = min(self._target_level(queue_depth), len(DEGRADATION_LEVELS) - 1)
+            now = time.monotonic()
+
+            if target > self.level:
+                self.level = target
+                self._lower_since = None
+                self._level_changes += 1
+            elif target < self.level:
+                if self._lower_since is None:
+                    self._lower_since = now
+                elif now - self._lower_since >= self.recovery_seconds:
+                    self.level -= 1
+                    self._lower_since = now
+                    self._level_changes += 1
+            else:
+                self._lower_since = None
+            return self.level
+
+    def apply(self, options, queue_depth=0, cascade=False):
+        """
+        Degrade a request's prediction options for the current load
+
+        Args:
+            options (dict): Requested options (use_tta, enhance_image, top_n, tta_views)
+            queue_depth (int): Current inference queue depth
+            cascade (bool): Whether the predictor is a cascade (supports skipping escalation)
+
+        Returns:
+            tuple: (options to serve with, dict describing what was degraded or None)
+        """
+        level = self.update(queue_depth)
+        served = dict(options)
+        changes = {}
+
+        for option, value in DEGRADATION_LEVELS[level].items():
+            requested = options.get(option)
+            if option == 'escalate':
+                if cascade:
+                    served['escalate'] = False
+                    changes['escalate'] = {'requested': True, 'served': False}
+            elif option == 'tta_views':
+                requested = options.get('tta_views', TTA_VIEWS)
+                if options.get('use_tta') and requested > value:
+                    served['tta_views'] = value
+                    changes['tta_views'] = {'requested': requested, 'served': value}
+            elif option == 'top_n':
+                if requested is not None and requested > value:
+                    served['top_n'] = value
+                    changes['top_n'] = {'requested': requested, 'served': value}
+            elif requested:
+                served[option] = value
+                changes[option] = {'requested': requested, 'served': value}
+
+        if not changes:
+            return served, None
+
+        with self._lock:
+            self._degraded_requests += 1
+        return served, {'level': level, 'changes': changes}
+
+    def get_stats(self):
+        """Get the current level and load signal"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'mode': self.mode,
+                'level': self.level,
+                'latency_ewma_ms': self._latency_ewma,
+                'latency_slo_ms': self.latency_slo_ms,
+                'queue_thresholds': self.queue_thresholds,
+                'degraded_requests': self._degraded_requests,
+                'level_changes': self._level_changes
+            }
@@ -0,0 +1,165 @@
+"""
+In-process vector index over recent upload embeddings
+Brute-force cosine search with NumPy, switching to an IVF (partitioned)
+search once the index grows past a size threshold
+"""
+
+import threading
+import numpy as np
+
+KMEANS_SAMPLE_SIZE = 4096
+KMEANS_ITERATIONS = 8
+
+class EmbeddingIndex:
+    def __init__(self, max_items=20000, similarity_threshold=0.97, ivf_min_items=4096, nprobe=4, seed=0):
+        """
+        Initialize the embedding index
+
+        Args:
+            max_items (int): Capacity; the oldest embeddings are replaced once full
+            similarity_threshold (float): Cosine similarity at which an upload counts as a near duplicate
+            ivf_min_items (int): Index size at which searches switch to IVF partitions
+            nprobe (int): Number of partitions searched in IVF mode
+            seed (int): Seed for k-means initialization
+        """
+        self.max_items = max_items
+        self.similarity_threshold = similarity_threshold
+        self.ivf_min_items = ivf_min_items
+        self.nprobe = nprobe
+        self.seed = seed
+
+        self._vectors = None  # (max_items, dim) float32, L2-normalized
+        self._payloads = [None] * max_items
+        self._size = 0
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+        # IVF state
+        self._centroids = None
+        self._assignments = np.full(max_items, -1, dtype=np.int32)
+        self._trained_at_size = 0
+
+        # Metrics
+        self._lookups = 0
+        self._near_duplicates = 0
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+    def add(self, embedding, payload):
+        """
+        Add one embedding with the payload returned by later searches
+
+        Args:
+            embedding (np.array): 1-D embedding vector
+            payload: Anything to associate with the embedding (e.g. a prediction result)
+        """
+        vector = self._normalize(embedding).ravel()
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_items, vector.shape[0]), dtype=np.float32)
+
+            slot = self._next_slot
+            self._vectors[slot] = vector
+            self._payloads[slot] = payload
+            self._next_slot = (slot + 1) % self.max_items
+            self._size = min(self._size + 1, self.max_items)
+
+            if self._centroids is not None:
+                self._assignments[slot] = int(np.argmax(self._centroids @ vector))
+
+            # (Re)train partitions when the index crosses the threshold or doubles since training
+            if self._size >= self.ivf_min_items and self._size >= 2 * self._trained_at_size:
+                self._train_partitions()
+
+    def _train_partitions(self):
+        """Spherical k-means over the stored vectors (lock held)"""
+        vectors = self._vectors[:self._size]
+        num_partitions = max(2, int(np.sqrt(self._size)))
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample so retraining stays cheap as the index grows
+        sample = vectors[rng.choice(self._size, min(self._size, KMEANS_SAMPLE_SIZE), replace=False)]
+        centroids = sample[rng.choice(len(sample), num_partitions, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for p in range(num_partitions):
+                members = sample[assignments == p]
+                if len(members):
+                    centroids[p] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+
+        self._centroids = centroids
+        self._assignments[:self._size] = np.argmax(vectors @ centroids.T, axis=1)
+        self._trained_at_size = self._size
+
+    def search(self, embedding, k=5):
+        """
+        Find the most similar stored embeddings
+
+        Returns:
+            list: (cosine similarity, payload) pairs, most similar first
+        """
+        query = self._normalize(embedding).ravel()
+
+        with self._lock:
+            if self._size == 0:
+                return []
+
+            if self._centroids is not None:
+                probe = np.argsort(self._centroids @ query)[-self.nprobe:]
+                candidates = np.flatnonzero(np.isin(self._assignments[:self._size], probe))
+            else:
+                candidates = np.arange(self._size)
+            if len(candidates) == 0:
+                return []
+
+            similarities = self._vectors[candidates] @ query
+            k = min(k, len(candidates))
+            top = np.argpartition(similarities, -k)[-k:]
+            top = top[np.argsort(similarities[top])[::-1]]
+            return [(float(similarities[i]), self._payloads[candidates[i]]) for i in top]
+
+    def find_near_duplicate(self, embedding, accept=None, k=5):
+        """
+        Return the closest stored neighbour above the similarity threshold
+
+        Args:
+            embedding (np.array): Query embedding
+            accept (callable): Optional filter on payloads (e.g. matching prediction options)
+            k (int): Number of neighbours considered
+
+        Returns:
+            tuple: (similarity, payload), or None
+        """
+        match = None
+        for similarity, payload in self.search(embedding, k=k):
+            if similarity < self.similarity_threshold:
+                break
+            if accept is None or accept(payload):
+                match = (similarity, payload)
+                break
+
+        with self._lock:
+            self._lookups += 1
+            if match is not None:
+                self._near_duplicates += 1
+        return match
+
+    def get_stats(self):
+        """Get index size, search mode and near-duplicate rate"""
+        with self._lock:
+            return {
+                'size': self._size,
+                'capacity': self.max_items,
+                'mode': 'ivf' if self._centroids is not None else 'brute_force',
+                'partitions': 0 if self._centroids is None else len(self._centroids),
+                'similarity_threshold': self.similarity_threshold,
+                'lookups': self._lookups,
+                'near_duplicates': self._near_duplicates,
+                'near_duplicate_rate': self._near_duplicates / self._lookups if self._lookups else 0.0
+            }
@@ -0,0 +1,222 @@
+"""
+Accuracy and latency parity harness for plant disease inference engines
+Runs the same images through the reference model.predict path and each
+alternate engine, and reports probability deltas, top-1 agreement, top-5
+overlap and per-image latency in one table. Each engine is checked on PIL-
+preprocessed float input and on raw uint8 uploads served the way the web
+app serves them (predict_batch_from_arrays with in-graph preprocessing).
+
+Usage:
+    python engine_parity.py --images test --engines compiled tflite-float16 onnx
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+from predict_advanced import AdvancedPlantDiseasePredictor
+
+# Predictor settings for each engine that can be compared against the reference
+ENGINE_CONFIGS = {
+    'compiled': {'engine': 'tensorflow', 'use_compiled': True},
+    'xla': {'engine': 'tensorflow', 'use_compiled': True, 'jit_compile': True},
+    'tflite-float16': {'engine': 'tflite', 'quantization': 'float16'},
+    'tflite-int8': {'engine': 'tflite', 'quantization': 'int8'},
+    'onnx': {'engine': 'onnx'},
+}
+
+# Reference path: stock model.predict, no compilation
+REFERENCE_CONFIG = {'engine': 'tensorflow', 'use_compiled': False}
+
+# Input paths: PIL-preprocessed float batches, or raw uint8 uploads as served by the web app
+INPUT_PATHS = ('float', 'uint8')
+
+def parse_tta(value):
+    """Parse the --tta option into the predictor's use_tta value"""
+    value = value.lower()
+    return 'adaptive' if value == 'adaptive' else value == 'true'
+
+def list_images(image_dir, limit):
+    """Sorted image files of the corpus"""
+    image_files = sorted(
+        f for f in os.listdir(image_dir)
+        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )[:limit]
+    if not image_files:
+        raise FileNotFoundError(f"No images found in {image_dir}")
+    return image_files
+
+def load_images(predictor, image_dir, image_files):
+    """Load and preprocess the image corpus at the predictor's input size"""
+    return [predictor.preprocess_image(os.path.join(image_dir, f), enhance=False) for f in image_files]
+
+def load_uint8_images(predictor, image_dir, image_files):
+    """Decode the image corpus to raw uint8 arrays the way the web app decodes uploads"""
+    images = []
+    for f in image_files:
+        image = Image.open(os.path.join(image_dir, f))
+        if image.format == 'JPEG':
+            image.draft('RGB', (predictor.IMG_WIDTH, predictor.IMG_HEIGHT))
+        image = image.convert('RGB')
+        factor = min(image.width // predictor.IMG_WIDTH, image.height // predictor.IMG_HEIGHT)
+        if factor >= 2:
+            image = image.reduce(factor)
+        images.append(np.asarray(image, dtype=np.uint8))
+    return images
+
+def run_engine(predictor, images, use_tta):
+    """
+    Run every image through a predictor one at a time
+
+    Returns:
+        tuple: (probabilities of shape (N, num_classes), per-image latencies in ms)
+    """
+    # Untimed first call so one-off setup isn't counted as latency
+    predictor._predict_probabilities(images[0], use_tta)
+
+    probabilities = []
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        prediction, _ = predictor._predict_probabilities(image, use_tta)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        probabilities.append(prediction)
+
+    return np.array(probabilities, dtype=np.float32), np.array(latencies)
+
+def probabilities_from_result(predictor, result):
+    """Rebuild the class probability vector from a result formatted with every class"""
+    probabilities = np.zeros(len(predictor.class_names), dtype=np.float32)
+    for prediction in result['all_predictions']:
+        probabilities[predictor.class_index[prediction['full_name']]] = prediction['confidence']
+    return probabilities
+
+def run_engine_uint8(predictor, images, use_tta):
+    """
+    Run every raw uint8 image through the serving path one at a time
+
+    Returns:
+        tuple: (probabilities of shape (N, num_classes), per-image latencies in ms)
+    """
+    num_classes = len(predictor.class_names)
+    predictor.predict_batch_from_arrays([images[0]], top_n=num_classes, use_tta=use_tta)
+
+    probabilities = []
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        result = predictor.predict_batch_from_arrays([image], top_n=num_classes, use_tta=use_tta)[0]
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        probabilities.append(probabilities_from_result(predictor, result))
+
+    return np.array(probabilities, dtype=np.float32), np.array(latencies)
+
+def compare(reference_probs, probs, top_k=5):
+    """Compare an engine's probabilities against the reference"""
+    deltas = np.abs(probs - reference_probs)
+    reference_top = np.argsort(reference_probs, axis=1)[:, -top_k:]
+    engine_top = np.argsort(probs, axis=1)[:, -top_k:]
+    overlap = [len(set(r) & set(e)) / top_k for r, e in zip(reference_top, engine_top)]
+
+    return {
+        'max_delta': float(deltas.max()),
+        'mean_delta': float(deltas.mean()),
+        'top1_agreement': float(np.mean(reference_top[:, -1] == engine_top[:, -1])),
+        'top5_overlap': float(np.mean(overlap)),
+    }
+
+def print_table(rows):
+    """Print the parity results as an aligned table"""
+    header = ('engine', 'max_delta', 'mean_delta', 'top1_agree', 'top5_overlap', 'mean_ms', 'p95_ms')
+    print(' | '.join([f"{header[0]:>22}"] + [f"{h:>14}" for h in header[1:]]))
+    print('-' * (17 * len(header) + 8))
+    for row in rows:
+        print(' | '.join([
+            f"{row['engine']:>22}",
+            f"{row['max_delta']:>14.6f}",
+            f"{row['mean_delta']:>14.6f}",
+            f"{row['top1_agreement'] * 100:>13.2f}%",
+            f"{row['top5_overlap'] * 100:>13.2f}%",
+            f"{row['mean_ms']:>14.2f}",
+            f"{row['p95_ms']:>14.2f}",
+        ]))
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that alternate inference engines match the reference model')
+    parser.add_argument('--images', default='test', help='Directory of sample images')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of images to use')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINE_CONFIGS), choices=list(ENGINE_CONFIGS))
+    parser.add_argument('--tta', default='false', help="TTA mode for every engine: 'true', 'false' or 'adaptive'")
+    parser.add_argument('--inputs', nargs='+', default=list(INPUT_PATHS), choices=list(INPUT_PATHS),
+                        help='Input paths to check: PIL-preprocessed float batches and/or raw uint8 uploads')
+    parser.add_argument('--model', default='best_model.h5')
+    parser.add_argument('--class-names', default='class_names.txt')
+    parser.add_argument('--min-top1', type=float, default=0.99, help='Minimum top-1 agreement to pass')
+    parser.add_argument('--max-delta', type=float, default=0.05, help='Maximum probability delta to pass')
+    args = parser.parse_args()
+
+    use_tta = parse_tta(args.tta)
+    model_kwargs = {'model_path': args.model, 'class_names_path': args.class_names, 'fallback_model': args.model}
+
+    print("📐 Loading reference model (model.predict)...")
+    reference = AdvancedPlantDiseasePredictor(warmup=False, **model_kwargs, **REFERENCE_CONFIG)
+    image_files = list_images(args.images, args.limit)
+    images = {
+        'float': load_images(reference, args.images, image_files),
+        'uint8': load_uint8_images(reference, args.images, image_files) if 'uint8' in args.inputs else None
+    }
+    print(f"🖼️ {len(image_files)} images from {args.images}")
+    runners = {'float': run_engine, 'uint8': run_engine_uint8}
+
+    # Every path is compared against model.predict on PIL-preprocessed input
+    reference_probs, reference_latency = run_engine(reference, images['float'], use_tta)
+    rows = [dict(engine='reference', **compare(reference_probs, reference_probs),
+                 mean_ms=float(reference_latency.mean()), p95_ms=float(np.percentile(reference_latency, 95)))]
+
+    failures = []
+    def check(name, predictor, input_path):
+        label = name if input_path == 'float' else f"{name}:{input_path}"
+        probs, latency = runners[input_path](predictor, images[input_path], use_tta)
+        row = dict(engine=label, **compare(reference_probs, probs),
+                   mean_ms=float(latency.mean()), p95_ms=float(np.percentile(latency, 95)))
+        rows.append(row)
+
+        if row['top1_agreement'] < args.min_top1 or row['max_delta'] > args.max_delta:
+            failures.append(label)
+
+    if 'uint8' in args.inputs:
+        print("⚙️ Running reference on uint8 input...")
+        check('reference', reference, 'uint8')
+
+    for name in args.engines:
+        print(f"⚙️ Running {name}...")
+        try:
+            predictor = AdvancedPlantDiseasePredictor(**model_kwargs, **ENGINE_CONFIGS[name])
+        except Exception as e:
+            print(f"❌ Could not load {name}: {e}")
+            failures.append(name)
+            continue
+
+        if predictor.class_names != reference.class_names:
+            print(f"❌ {name} class names differ from the reference")
+            failures.append(name)
+            continue
+
+        for input_path in args.inputs:
+            check(name, predictor, input_path)
+
+    print()
+    print_table(rows)
+    print()
+
+    if failures:
+        print(f"❌ Parity check failed for: {', '.join(failures)}")
+        return 1
+
+    print("✅ All engines match the reference")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Alternate inference engines for the plant disease model
+Each engine wraps a converted copy of the Keras model and exposes
+predict(batch) -> class probabilities for a float32 (N, H, W, 3) batch
+
+TensorFlow is only imported for conversion, so serving from an already
+converted model doesn't need it (TFLite uses tflite_runtime when installed).
+"""
+
+import os
+import threading
+import numpy as np
+
+TFLITE_QUANTIZATIONS = ('float16', 'int8')
+
+# Batch sizes the TFLite engine pads to, so its interpreter is only resized when the bucket changes
+TFLITE_BATCH_BUCKETS = (1, 2, 4, 8, 16)
+
+# Converted models read into memory by a pre-fork master process; forked
+# workers build their interpreters on these pages, shared copy-on-write
+_preloaded_models = {}
+
+def tflite_model_path(source_path, quantization):
+    """Path of the cached TFLite conversion of a Keras model file"""
+    return f"{os.path.splitext(source_path)[0]}.{quantization}.tflite"
+
+def onnx_model_path(source_path):
+    """Path of the cached ONNX export of a Keras model file"""
+    return f"{os.path.splitext(source_path)[0]}.onnx"
+
+def preload_model_file(model_path):
+    """
+    Read a converted model file into memory before forking workers
+
+    Args:
+        model_path (str): Path to a .tflite file
+
+    Returns:
+        int: Number of bytes preloaded
+    """
+    with open(model_path, 'rb') as f:
+        content = f.read()
+    _preloaded_models[os.path.abspath(model_path)] = content
+    return len(content)
+
+def convert_to_tflite(model, quantization='float16', representative_images=None):
+    """
+    Convert a Keras model to a TFLite flatbuffer
+
+    Args:
+        model: Loaded Keras model
+        quantization (str): 'float16' or 'int8' post-training quantization
+        representative_images (iterable): float32 (H, W, 3) calibration images, required for int8
+
+    Returns:
+        bytes: Serialized TFLite model
+    """
+    if quantization not in TFLITE_QUANTIZATIONS:
+        raise ValueError(f"Unsupported TFLite quantization: {quantization}")
+
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        if not representative_images:
+            raise ValueError("int8 quantization needs calibration images")
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [np.expand_dims(image, axis=0).astype(np.float32)]
+
+        # Activations are calibrated to int8; input/output stay float so preprocessing is unchanged
+        converter.representative_dataset = representative_dataset
+
+    return converter.convert()
+
+def convert_to_onnx(model, output_path, opset=13):
+    """
+    Export a Keras model to ONNX
+
+    tf2onnx.convert.from_keras doesn't handle Keras 3 models, so the model is
+    traced as a tf.function with a fixed input signature and that concrete
+    function is converted instead.
+
+    Args:
+        model: Loaded Keras model
+        output_path (str): Where to write the .onnx file
+        opset (int): ONNX opset version
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    input_signature = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input'),)
+
+    @tf.function(input_signature=input_signature)
+    def serve(images):
+        return model(images, training=False)
+
+    tf2onnx.convert.from_function(serve, input_signature=input_signature, opset=opset, output_path=output_path)
+
+class TFLiteEngine:
+    def __init__(self, model_path, num_threads=None, batch_buckets=TFLITE_BATCH_BUCKETS):
+        """
+        Serve a converted model through the TFLite interpreter
+
+        Resizing the interpreter's input reallocates all of its tensors, so
+        batches are padded up to the nearest bucket and the input is only
+        resized when the bucket changes; larger batches are split into the
+        largest bucket. A single interpreter is kept, since each one holds its
+        own tensor arena and unpacked copy of the weights.
+
+        Args:
+            model_path (str): Path to the .tflite file
+            num_threads (int): Interpreter thread count (None lets TFLite decide)
+            batch_buckets (tuple): Batch sizes batches are padded to
+        """
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.batch_buckets = tuple(sorted(set(batch_buckets)))
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        # The interpreter maps the flatbuffer in place, so preloaded bytes stay shared across workers
+        content = _preloaded_models.get(os.path.abspath(model_path))
+        self.preloaded = content is not None
+        if self.preloaded:
+            self.interpreter = Interpreter(model_content=content, num_threads=num_threads)
+        else:
+            self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+
+        input_details = self.interpreter.get_input_details()[0]
+        self.input_shape = tuple(input_details['shape_signature'])
+        self._input_index = input_details['index']
+        self._lock = threading.Lock()  # The interpreter keeps per-invocation state, so calls are serialized
+        self.bucket = None
+        self.resizes = 0
+        self._resize(self.batch_buckets[0])
+
+    def _resize(self, bucket):
+        """Resize the input to a batch bucket and reallocate tensors (caller holds the lock)"""
+        input_details = self.interpreter.get_input_details()[0]
+        if int(input_details['shape'][0]) != bucket:
+            self.interpreter.resize_tensor_input(self._input_index, [bucket] + list(input_details['shape'][1:]))
+            self.resizes += 1
+        self.interpreter.allocate_tensors()
+        self._input_details = self.interpreter.get_input_details()[0]
+        self._output_details = self.interpreter.get_output_details()[0]
+        self.bucket = bucket
+
+    def predict(self, batch):
+        """Run a forward pass over a float32 (N, H, W, 3) batch"""
+        batch = np.asarray(batch, dtype=np.float32)
+        num_images = len(batch)
+
+        largest = self.batch_buckets[-1]
+        if num_images > largest:
+            return np.concatenate([self.predict(batch[i:i + largest]) for i in range(0, num_images, largest)])
+
+        bucket = next(size for size in self.batch_buckets if size >= num_images)
+        if bucket > num_images:
+            padding = np.zeros((bucket - num_images,) + batch.shape[1:], dtype=np.float32)
+            batch = np.concatenate([batch, padding])
+
+        with self._lock:
+            if bucket != self.bucket:
+                self._resize(bucket)
+            input_details, output_details = self._input_details, self._output_details
+
+            # Quantize the input if the model was converted with integer I/O
+            if input_details['dtype'] != np.float32:
+                scale, zero_point = input_details['quantization']
+                batch = np.round(batch / scale + zero_point).astype(input_details['dtype'])
+
+            self.interpreter.set_tensor(input_details['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(output_details['index'])[:num_images]
+
+        if output_details['dtype'] != np.float32:
+            scale, zero_point = output_details['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+
+        return np.array(output, dtype=np.float32)
+
+    def get_info(self):
+        """Get information about the engine"""
+        return {
+            'engine_model_path': self.model_path,
+            'engine_size_mb': round(os.path.getsize(self.model_path) / (1024 * 1024), 2),
+            'num_threads': self.num_threads,
+            'batch_buckets': list(self.batch_buckets),
+            'allocated_bucket': self.bucket,
+            'resizes': self.resizes,
+            'shared_model_memory': self.preloaded
+        }
+
+class OnnxRuntimeEngine:
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=1):
+        """
+        Serve an exported model through an ONNX Runtime CPU session
+
+        Args:
+            model_path (str): Path to the .onnx file
+            intra_op_threads (int): Threads used inside an operator (None lets ORT decide)
+            inter_op_threads (int): Threads used to run independent operators
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        self.input_shape = tuple(model_input.shape)
+
+    def predict(self, batch):
+        """Run a forward pass over a float32 (N, H, W, 3) batch"""
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+    def get_info(self):
+        """Get information about the engine"""
+        return {
+            'engine_model_path': self.model_path,
+            'engine_size_mb': round(os.path.getsize(self.model_path) / (1024 * 1024), 2),
+            'num_threads': self.intra_op_threads,
+            'inter_op_threads': self.inter_op_threads
+        }
@@ -0,0 +1,313 @@
+"""
+Dynamic micro-batching scheduler for plant disease inference
+Coalesces concurrent single-image requests into batched forward passes, and
+schedules separate priority classes (interactive, batch, background) with
+weighted fairness and starvation protection
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+
+InferenceRequest = namedtuple('InferenceRequest', ['image_array', 'options', 'future', 'enqueued_at'])
+
+# Priority classes, highest first
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+# Share of dispatches each class gets while all of them have work queued
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BATCH: 2, BACKGROUND: 1}
+
+# A class that has had work queued but no dispatch for this long is served next regardless of weights
+DEFAULT_STARVATION_MS = {INTERACTIVE: None, BATCH: 2000, BACKGROUND: 10000}
+
+class QueueFullError(Exception):
+    """Raised by submit when the queue is at its maximum depth"""
+
+class MicroBatchScheduler:
+    def __init__(self, predict_batch_fn, max_batch_size=16, batch_window_ms=10, num_workers=1, max_queue_depth=None,
+                 weights=None, starvation_ms=None):
+        """
+        Initialize the micro-batching scheduler
+
+        Args:
+            predict_batch_fn (callable): Called as predict_batch_fn(image_arrays, **options)
+                and returns one result dict per image
+            max_batch_size (int): Maximum number of requests coalesced into one forward pass
+            batch_window_ms (float): How long to wait for more interactive requests after the first one arrives
+            num_workers (int): Dispatcher threads, so that many batches can run at once
+                (e.g. one per predictor replica)
+            max_queue_depth (int): Queued interactive requests beyond which submit raises
+                QueueFullError (None for unbounded); batch and background work is bounded by its callers
+            weights (dict): Dispatch weight per priority class
+            starvation_ms (dict): Maximum wait per priority class before it is served out of turn
+        """
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.num_workers = num_workers
+        self.max_queue_depth = max_queue_depth
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.starvation_limits = {
+            priority: None if limit is None else limit / 1000.0
+            for priority, limit in dict(DEFAULT_STARVATION_MS, **(starvation_ms or {})).items()
+        }
+
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._credits = {priority: 0 for priority in PRIORITIES}
+        self._last_dispatch = {priority: 0.0 for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._batches_run = 0
+        self._requests_served = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._batch_size_histogram = {}
+        self._rejected = 0
+        self._class_stats = {
+            priority: {'served': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'starvation_promotions': 0}
+            for priority in PRIORITIES
+        }
+
+    def start(self):
+        """Start the dispatcher threads (called automatically on first submit)"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._dispatch_loop, name=f'micro-batch-scheduler-{i}', daemon=True)
+                for i in range(self.num_workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self):
+        """Stop the dispatcher threads after the queued requests are served"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, image_array, priority=INTERACTIVE, **options):
+        """
+        Queue a single image for prediction
+
+        Args:
+            image_array (np.array): Image to predict
+            priority (str): 'interactive', 'batch' or 'background'
+            **options: Prediction options (top_n, use_tta, ...); requests are only
+                coalesced with others that use the same options
+
+        Returns:
+            Future: Resolves to the prediction result dict for this image
+        """
+        return self.submit_many([image_array], priority, **options)[0]
+
+    def submit_many(self, image_arrays, priority=INTERACTIVE, **options):
+        """
+        Queue several images at once (e.g. a batch upload)
+
+        Images are dispatched at most max_batch_size at a time, so higher
+        priority work can run between the chunks of a large batch.
+
+        Returns:
+            list: One Future per image
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        if not self._running:
+            self.start()
+
+        futures = [Future() for _ in image_arrays]
+        with self._condition:
+            queue = self._queues[priority]
+            if (priority == INTERACTIVE and self.max_queue_depth is not None
+                    and len(queue) + len(futures) > self.max_queue_depth):
+                with self._stats_lock:
+                    self._rejected += len(futures)
+                raise QueueFullError(f"Inference queue is full ({self.max_queue_depth} requests)")
+
+            now = time.monotonic()
+            queue.extend(
+                InferenceRequest(image_array, options, future, now)
+                for image_array, future in zip(image_arrays, futures)
+            )
+            self._condition.notify_all()
+        return futures
+
+    def is_saturated(self):
+        """Check whether the next interactive submit would be rejected"""
+        with self._condition:
+            return self.max_queue_depth is not None and len(self._queues[INTERACTIVE]) >= self.max_queue_depth
+
+    def queue_depth(self, priority=INTERACTIVE):
+        """Number of requests queued in a priority class"""
+        with self._condition:
+            return len(self._queues[priority])
+
+    def predict(self, image_array, timeout=None, priority=INTERACTIVE, **options):
+        """Queue a single image and block until its result is ready"""
+        return self.submit(image_array, priority, **options).result(timeout=timeout)
+
+    def _pick_class(self):
+        """
+        Choose the priority class to serve next (condition held)
+
+        A class that has waited past its starvation limit (since its oldest
+        request arrived or it was last served, whichever is later) goes first;
+        otherwise classes with queued work share dispatches by weight (smooth
+        weighted round robin, ties going to the higher priority).
+        """
+        now = time.monotonic()
+        queued = [priority for priority in PRIORITIES if self._queues[priority]]
+
+        def waiting(priority):
+            return now - max(self._queues[priority][0].enqueued_at, self._last_dispatch[priority])
+
+        overdue = [
+            priority for priority in queued
+            if self.starvation_limits.get(priority) is not None
+            and waiting(priority) > self.starvation_limits[priority]
+        ]
+        if overdue:
+            priority = max(overdue, key=waiting)
+            with self._stats_lock:
+                self._class_stats[priority]['starvation_promotions'] += 1
+        else:
+            total = 0
+            for candidate in queued:
+                self._credits[candidate] += self.weights[candidate]
+                total += self.weights[candidate]
+            priority = max(queued, key=lambda p: self._credits[p])
+            self._credits[priority] -= total
+
+        self._last_dispatch[priority] = now
+        return priority
+
+    def _next_batch(self):
+        """
+        Take the next batch from the chosen priority class
+
+        Interactive requests wait for the batch window (or a full batch) so
+        concurrent ones are coalesced; batch and background work is already
+        queued in bulk and is taken immediately.
+
+        Returns:
+            tuple: (priority, list of requests), or (None, []) once stopped
+        """
+        with self._condition:
+            while True:
+                while self._running and not any(self._queues.values()):
+                    self._condition.wait()
+                if not any(self._queues.values()):
+                    return None, []
+
+                priority = self._pick_class()
+                queue = self._queues[priority]
+
+                if priority == INTERACTIVE:
+                    # Keep collecting until the window of the oldest request closes
+                    deadline = queue[0].enqueued_at + self.batch_window
+                    while self._running and len(queue) < self.max_batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+
+                # Another dispatcher may have taken the requests while this one waited
+                batch = []
+                while queue and len(batch) < self.max_batch_size:
+                    batch.append(queue.popleft())
+                if batch:
+                    return priority, batch
+
+    def _dispatch_loop(self):
+        """Dispatcher thread: coalesce queued requests and run them"""
+        while True:
+            priority, batch = self._next_batch()
+            if not batch:
+                return
+            self._run_batch(priority, batch)
+
+    def _run_batch(self, priority, batch):
+        """Run one coalesced batch, grouped by prediction options"""
+        started_at = time.monotonic()
+        self._record_batch(priority, batch, started_at)
+
+        groups = {}
+        for item in batch:
+            groups.setdefault(tuple(sorted(item.options.items())), []).append(item)
+
+        for options, items in groups.items():
+            try:
+                results = self.predict_batch_fn([item.image_array for item in items], **dict(options))
+                for item, result in zip(items, results):
+                    item.future.set_result(result)
+            except Exception as e:
+                for item in items:
+                    item.future.set_exception(e)
+
+    def _record_batch(self, priority, batch, started_at):
+        """Update batching metrics for a batch about to run"""
+        waits = [started_at - item.enqueued_at for item in batch]
+        with self._stats_lock:
+            self._batches_run += 1
+            self._requests_served += len(batch)
+            self._last_batch_size = len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._total_wait += sum(waits)
+            self._max_wait = max(self._max_wait, max(waits))
+            self._batch_size_histogram[len(batch)] = self._batch_size_histogram.get(len(batch), 0) + 1
+
+            class_stats = self._class_stats[priority]
+            class_stats['served'] += len(batch)
+            class_stats['total_wait'] += sum(waits)
+            class_stats['max_wait'] = max(class_stats['max_wait'], max(waits))
+
+    def get_stats(self):
+        """Get queue depth, realized batch size and wait time metrics, overall and per priority class"""
+        with self._condition:
+            queue_depths = {priority: len(queue) for priority, queue in self._queues.items()}
+
+        with self._stats_lock:
+            batches = self._batches_run
+            served = self._requests_served
+            return {
+                'queue_depth': sum(queue_depths.values()),
+                'max_queue_depth': self.max_queue_depth,
+                'rejected': self._rejected,
+                'max_batch_size': self.max_batch_size,
+                'workers': self.num_workers,
+                'batch_window_ms': self.batch_window * 1000.0,
+                'batches_run': batches,
+                'requests_served': served,
+                'last_batch_size': self._last_batch_size,
+                'mean_batch_size': served / batches if batches else 0.0,
+                'max_batch_size_seen': self._max_batch_seen,
+                'mean_wait_ms': self._total_wait / served * 1000.0 if served else 0.0,
+                'max_wait_ms': self._max_wait * 1000.0,
+                'batch_size_histogram': dict(sorted(self._batch_size_histogram.items())),
+                'classes': {
+                    priority: {
+                        'queue_depth': queue_depths[priority],
+                        'weight': self.weights[priority],
+                        'served': stats['served'],
+                        'mean_wait_ms': stats['total_wait'] / stats['served'] * 1000.0 if stats['served'] else 0.0,
+                        'max_wait_ms': stats['max_wait'] * 1000.0,
+                        'starvation_promotions': stats['starvation_promotions']
+                    }
+                    for priority, stats in self._class_stats.items()
+                }
+            }
@@ -0,0 +1,475 @@
+"""
+Out-of-process inference for the plant disease service
+A dedicated inference process owns the model (an AdvancedPlantDiseasePredictor)
+and batches requests from every web worker through a micro-batching scheduler.
+Web workers hand over decoded uint8 images through a shared-memory ring buffer
+and only exchange small control messages over a socket, so they never import
+TensorFlow or pickle image arrays.
+
+Usage:
+    INFERENCE_AUTHKEY=secret python inference_worker.py --address 127.0.0.1:6000 --engine tflite
+    INFERENCE_WORKERS=127.0.0.1:6000 INFERENCE_AUTHKEY=secret python app_advanced.py
+"""
+
+import argparse
+import itertools
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+import numpy as np
+from PIL import Image
+from concurrent.futures import Future
+from multiprocessing import connection, resource_tracker, shared_memory
+from inference_scheduler import MicroBatchScheduler
+from predict_advanced import TTA_VIEWS
+
+DEFAULT_SLOTS = 32
+DEFAULT_SLOT_BYTES = 4 * 1024 * 1024  # Fits a 1150x1150 RGB image
+RECONNECT_INTERVAL = 5.0  # Seconds between reconnect attempts to a dead worker
+
+def parse_address(address):
+    """Parse 'host:port' into a socket address"""
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def attach_shared_memory(name):
+    """Attach to a block created by another process without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attached blocks are registered with (and unlinked by) the resource tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def read_slot(shm, slot_bytes, slot, shape):
+    """Zero-copy view of the image stored in a ring slot"""
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+
+def fit_to_slot(image, slot_bytes):
+    """Box-reduce an image by the smallest integer factor that makes it fit in one ring slot"""
+    image = np.ascontiguousarray(image)
+    if image.dtype != np.uint8:
+        raise ValueError("Remote inference takes raw uint8 images")
+    if image.nbytes <= slot_bytes:
+        return image
+
+    # Reducing by f divides the byte count by about f squared; rounding the
+    # reduced size up can leave it just over, so try the next factor then
+    factor = max(2, math.ceil(math.sqrt(image.nbytes / slot_bytes)))
+    reduced = np.asarray(Image.fromarray(image).reduce(factor))
+    while reduced.nbytes > slot_bytes:
+        factor += 1
+        reduced = np.asarray(Image.fromarray(image).reduce(factor))
+    return reduced
+
+class SharedImageRing:
+    def __init__(self, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES):
+        """
+        Fixed-size slots of shared memory owned by one web worker
+
+        Args:
+            slots (int): Number of images that can be in flight at once
+            slot_bytes (int): Size of one slot (largest uint8 image it can hold)
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = list(range(slots))
+        self._condition = threading.Condition()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, count, timeout=None):
+        """Reserve slots for one request, all at once so concurrent requests can't deadlock"""
+        if count > self.slots:
+            raise ValueError(f"Request needs {count} slots but the ring has {self.slots}")
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self._free) >= count, timeout):
+                raise TimeoutError("No free shared-memory slots")
+            taken, self._free = self._free[:count], self._free[count:]
+            return taken
+
+    def release(self, slots):
+        with self._condition:
+            self._free.extend(slots)
+            self._condition.notify_all()
+
+    def write(self, slot, image):
+        read_slot(self.shm, self.slot_bytes, slot, image.shape)[...] = image
+
+    def free_slots(self):
+        with self._condition:
+            return len(self._free)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+class WorkerConnection:
+    def __init__(self, address, authkey, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES):
+        """
+        Connection from a web worker to one inference process
+
+        Args:
+            address (str): 'host:port' of the inference process
+            authkey (bytes): Shared secret for the connection handshake
+            slots (int): Ring buffer slots for this connection
+            slot_bytes (int): Size of one ring buffer slot
+        """
+        self.address = address
+        self.ring = SharedImageRing(slots, slot_bytes)
+        try:
+            self.conn = connection.Client(parse_address(address), authkey=authkey)
+            self.conn.send(('attach', self.ring.name, slots, slot_bytes))
+            status, self.info = self.conn.recv()
+        except Exception:
+            self.ring.close()
+            raise
+        if status != 'ok':
+            self.ring.close()
+            raise RuntimeError(f"Inference worker {address} refused the connection: {self.info}")
+
+        self.alive = True
+        self._pending = {}  # request_id -> (future, slots)
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._reader = threading.Thread(target=self._read_loop, name=f'inference-reader-{address}', daemon=True)
+        self._reader.start()
+
+    def submit(self, image_arrays, options, timeout=None):
+        """
+        Write images into the ring and send one predict request
+
+        Returns:
+            Future: Resolves to one result dict per image
+        """
+        images = [fit_to_slot(image, self.ring.slot_bytes) for image in image_arrays]
+        slots = self.ring.acquire(len(images), timeout)
+        for slot, image in zip(slots, images):
+            self.ring.write(slot, image)
+
+        future = Future()
+        with self._lock:
+            if not self.alive:
+                self.ring.release(slots)
+                raise ConnectionError(f"Inference worker {self.address} is disconnected")
+            request_id = next(self._ids)
+            try:
+                self.conn.send(('predict', request_id, [(slot, image.shape) for slot, image in zip(slots, images)], options))
+            except OSError as e:
+                self.alive = False
+                self.ring.release(slots)
+                raise ConnectionError(f"Inference worker {self.address} is disconnected") from e
+            self._pending[request_id] = (future, slots)
+        return future
+
+    def _read_loop(self):
+        """Reader thread: resolve futures as results come back and free their slots"""
+        try:
+            while True:
+                request_id, ok, payload = self.conn.recv()
+                with self._lock:
+                    future, slots = self._pending.pop(request_id)
+                self.ring.release(slots)
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+        except (EOFError, OSError):
+            with self._lock:
+                self.alive = False
+                pending, self._pending = self._pending, {}
+            for future, _ in pending.values():
+                future.set_exception(ConnectionError(f"Inference worker {self.address} disconnected"))
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        self.alive = False
+        self.conn.close()
+        self.ring.close()
+
+class RemotePredictor:
+    def __init__(self, addresses, authkey, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES, timeout=60.0):
+        """
+        Predictor that forwards to one or more inference processes
+
+        Exposes the predictor API used by the web app. Preprocessing
+        (rescale, enhancement, resize) runs in the inference process, so
+        uploads travel as the raw uint8 pixels the web tier decoded.
+
+        Args:
+            addresses (list): 'host:port' of each inference process
+            authkey (bytes): Shared secret for the connection handshake
+            slots (int): Ring buffer slots per inference process
+            slot_bytes (int): Size of one ring buffer slot
+            timeout (float): Seconds to wait for slots and for results
+        """
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+
+        self._connections = [WorkerConnection(address, authkey, slots, slot_bytes) for address in self.addresses]
+        self._last_reconnect = {}
+        self._assigning = {}  # connection -> picked requests not yet submitted
+        self._lock = threading.Lock()
+
+        info = self._connections[0].info
+        for worker in self._connections[1:]:
+            if worker.info['class_names'] != info['class_names']:
+                raise ValueError(f"Inference worker {worker.address} serves different class names")
+
+        # Read-only attributes shared with the in-process predictor
+        model_info = info['model_info']
+        self.class_names = info['class_names']
+        self.disease_info = {}
+        self.model_type = model_info['model_type']
+        self.engine = model_info['engine']
+        self.model_version = model_info.get('model_version')
+        self.IMG_HEIGHT, self.IMG_WIDTH = info['input_size']
+
+    def warmup(self):
+        """Inference processes warm up before they start accepting connections"""
+
+    def has_model(self):
+        return any(worker.alive for worker in self._connections)
+
+    def supports_embeddings(self):
+        return False
+
+    def get_embeddings(self, image_array):
+        raise NotImplementedError("Embeddings aren't served by remote inference workers")
+
+    def prepare_image_array(self, image_array, enhance=False):
+        """Keep uploads as raw uint8; the inference process preprocesses them (with enhancement if asked)"""
+        image_array = np.asarray(image_array)
+        if image_array.ndim == 3:
+            image_array = image_array[np.newaxis]
+        return image_array
+
+    def _pick_worker(self):
+        """
+        Least-loaded live connection, reconnecting dead ones at most every RECONNECT_INTERVAL
+
+        The pick counts as load until _submit_to hands the request over, so
+        concurrent dispatchers spread over the workers instead of racing to
+        the same idle one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for i, worker in enumerate(self._connections):
+                if worker.alive or now - self._last_reconnect.get(i, 0.0) < RECONNECT_INTERVAL:
+                    continue
+                self._last_reconnect[i] = now
+                try:
+                    worker.ring.close()
+                    self._connections[i] = WorkerConnection(worker.address, self.authkey, self.slots, self.slot_bytes)
+                except Exception as e:
+                    print(f"⚠️ Reconnect to inference worker {worker.address} failed: {e}")
+
+            live = [worker for worker in self._connections if worker.alive]
+            if not live:
+                raise ConnectionError("No inference workers available")
+            worker = min(live, key=lambda worker: worker.in_flight() + self._assigning.get(worker, 0))
+            self._assigning[worker] = self._assigning.get(worker, 0) + 1
+        return worker
+
+    def _submit_to(self, image_arrays, options):
+        """Send one chunk of images to the least-loaded inference process"""
+        worker = self._pick_worker()
+        try:
+            return worker.submit(image_arrays, options, self.timeout)
+        finally:
+            with self._lock:
+                self._assigning[worker] -= 1
+                if not self._assigning[worker]:
+                    del self._assigning[worker]
+
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False, tta_views=TTA_VIEWS,
+                                  **model_options):
+        """
+        Make predictions for several uint8 images in the inference processes
+
+        Args:
+            **model_options: Passed through to the served predictor (e.g. escalate for a cascade)
+
+        Returns:
+            list: Comprehensive prediction results, one dict per image
+        """
+        image_arrays = list(image_arrays)
+        options = dict(model_options, top_n=top_n, use_tta=use_tta, enhance_image=enhance_image, tta_views=tta_views)
+
+        futures = [
+            self._submit_to(image_arrays[start:start + self.slots], options)
+            for start in range(0, len(image_arrays), self.slots)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result(timeout=self.timeout))
+        return results
+
+    def predict_image_from_array(self, image_array, top_n=5, use_tta=True, enhance_image=False):
+        return self.predict_batch_from_arrays(
+            self.prepare_image_array(image_array), top_n=top_n, use_tta=use_tta, enhance_image=enhance_image
+        )[0]
+
+    def get_model_info(self):
+        """Model information reported by the inference processes"""
+        info = dict(self._connections[0].info['model_info'])
+        info['remote'] = {
+            'workers': [{
+                'address': worker.address,
+                'alive': worker.alive,
+                'in_flight': worker.in_flight(),
+                'free_slots': worker.ring.free_slots()
+            } for worker in self._connections],
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes
+        }
+        return info
+
+    def close(self):
+        for worker in self._connections:
+            worker.close()
+
+class InferenceServer:
+    def __init__(self, predictor, address, authkey, max_batch_size=16, batch_window_ms=10):
+        """
+        Serve a predictor to web workers over shared memory
+
+        Args:
+            predictor: Loaded and warmed-up AdvancedPlantDiseasePredictor
+            address (str): 'host:port' to listen on
+            authkey (bytes): Shared secret for the connection handshake
+            max_batch_size (int): Maximum images per forward pass across all web workers
+            batch_window_ms (float): Micro-batching window
+        """
+        self.predictor = predictor
+        self.address = address
+        self.authkey = authkey
+        self.scheduler = MicroBatchScheduler(
+            predictor.predict_batch_from_arrays,
+            max_batch_size=max_batch_size,
+            batch_window_ms=batch_window_ms
+        )
+
+    def serve_forever(self):
+        """Accept web worker connections, one handler thread each"""
+        listener = connection.Listener(parse_address(self.address), authkey=self.authkey)
+        print(f"🧠 Inference worker listening on {self.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (connection.AuthenticationError, OSError) as e:
+                print(f"⚠️ Rejected connection: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        """Handler thread: read requests from one web worker and queue their images"""
+        shm = None
+        send_lock = threading.Lock()
+        try:
+            kind, shm_name, _, slot_bytes = conn.recv()
+            if kind != 'attach':
+                conn.send(('error', f"Expected attach, got {kind}"))
+                return
+            shm = attach_shared_memory(shm_name)
+            conn.send(('ok', {
+                'class_names': self.predictor.class_names,
+                'input_size': (self.predictor.IMG_HEIGHT, self.predictor.IMG_WIDTH),
+                'model_info': self.predictor.get_model_info()
+            }))
+
+            while True:
+                _, request_id, items, options = conn.recv()
+                futures = [
+                    self.scheduler.submit(read_slot(shm, slot_bytes, slot, shape), **options)
+                    for slot, shape in items
+                ]
+                self._reply_when_done(conn, send_lock, request_id, futures)
+
+        except EOFError:
+            pass
+        except Exception as e:
+            print(f"❌ Inference connection failed: {e}")
+            traceback.print_exc()
+        finally:
+            conn.close()
+            if shm is not None:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass  # Views are still held by queued requests; released with the process
+
+    @staticmethod
+    def _reply_when_done(conn, send_lock, request_id, futures):
+        """Send the results of one request once all of its images are predicted"""
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def on_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                message = (request_id, True, [future.result() for future in futures])
+            except Exception as e:
+                message = (request_id, False, str(e))
+            with send_lock:
+                try:
+                    conn.send(message)
+                except OSError:
+                    pass
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+def main():
+    parser = argparse.ArgumentParser(description='Dedicated inference process for the plant disease app')
+    parser.add_argument('--address', default='127.0.0.1:6000', help='host:port to listen on')
+    parser.add_argument('--model', default='best_model.h5')
+    parser.add_argument('--class-names', default='class_names.txt')
+    parser.add_argument('--engine', default=os.environ.get('INFERENCE_ENGINE', 'tensorflow'))
+    parser.add_argument('--quantization', default=os.environ.get('TFLITE_QUANTIZATION', 'float16'))
+    parser.add_argument('--threads', type=int, default=None, help='TFLite / ONNX Runtime threads')
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--batch-window-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    authkey = os.environ.get('INFERENCE_AUTHKEY')
+    if not authkey:
+        print("❌ Set INFERENCE_AUTHKEY to the secret shared with the web workers")
+        return 1
+
+    from predict_advanced import AdvancedPlantDiseasePredictor
+    predictor = AdvancedPlantDiseasePredictor(
+        model_path=args.model,
+        class_names_path=args.class_names,
+        fallback_model=args.model,
+        engine=args.engine,
+        quantization=args.quantization,
+        num_threads=args.threads
+    )
+
+    server = InferenceServer(
+        predictor, args.address, authkey.encode(),
+        max_batch_size=args.max_batch_size,
+        batch_window_ms=args.batch_window_ms
+    )
+    server.serve_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
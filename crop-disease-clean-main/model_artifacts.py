@@ -0,0 +1,284 @@
+"""
+Cache of pre-converted model artifacts for fast cold starts
+A Keras model file is converted once into an architecture JSON plus a single
+weights blob, so later starts skip parsing HDF5: the blob is memory-mapped and
+handed to set_weights, which still copies every weight into the model's
+variables. Artifacts are keyed by the source file's SHA-256, so retraining (or
+replacing) the model invalidates them; gzip-compressed sources are decompressed
+into the cache the same way.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are only serialized within the process
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join('models', 'cache')
+WEIGHT_ALIGNMENT = 64  # Bytes; keeps every memory-mapped weight array aligned
+
+@contextmanager
+def timed_phase(timings, phase):
+    """Record the seconds spent in the with-block as timings[phase]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - start, 3)
+
+def find_model_source(path):
+    """
+    Locate a model file, accepting a gzip-compressed copy next to it
+
+    Returns:
+        str: path, or path + '.gz' when only the compressed file exists, or None
+    """
+    if os.path.exists(path):
+        return path
+    if os.path.exists(path + '.gz'):
+        return path + '.gz'
+    return None
+
+class ModelArtifactCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Initialize the artifact cache
+
+        Args:
+            cache_dir (str): Directory holding converted artifacts and the checksum index
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'checksums.json')
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _index_lock(self):
+        """
+        Serialize checksum-index updates across threads and processes
+
+        serve_production forks workers that share the cache directory, so a
+        thread lock alone would let two processes read the same index and the
+        later write drop the other's entry. An flock on a sidecar file covers
+        the processes; it is released when the file is closed.
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.index_path + '.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                yield
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, data):
+        """Write a JSON file atomically"""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+
+    def source_checksum(self, source_path):
+        """
+        SHA-256 of a model file
+
+        Hashing a large model takes a while, so the digest is remembered
+        together with the file's size and modification time and only
+        recomputed when either changes.
+        """
+        stat = os.stat(source_path)
+        key = os.path.abspath(source_path)
+        entry = self._read_index().get(key)  # The index is only ever replaced whole, so reads need no lock
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        checksum = digest.hexdigest()
+
+        with self._index_lock():
+            index = self._read_index()
+            index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': checksum}
+            self._write_json(self.index_path, index)
+        return checksum
+
+    def _publish(self, build, name):
+        """Build an artifact in a temporary path, then move it into place atomically"""
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target):
+            return target
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.building-')
+        try:
+            built = build(temp_dir)
+            try:
+                os.replace(built, target)
+            except OSError:
+                if not os.path.exists(target):  # Otherwise another process published it first
+                    raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return target
+
+    def decompressed_path(self, source_path, checksum):
+        """
+        Path of the decompressed copy of a gzip model file, creating it on first use
+
+        Args:
+            source_path (str): Path to a .gz model file
+            checksum (str): SHA-256 of the compressed file
+
+        Returns:
+            str: Path of the decompressed model in the cache
+        """
+        filename = os.path.basename(source_path)[:-len('.gz')]
+
+        def build(temp_dir):
+            output_path = os.path.join(temp_dir, filename)
+            with gzip.open(source_path, 'rb') as f_in, open(output_path, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            return output_path
+
+        return self._publish(build, f"{checksum[:16]}-{filename}")
+
+    def keras_artifact_path(self, checksum):
+        """Directory of the converted Keras artifact for a source checksum"""
+        return os.path.join(self.cache_dir, f"{checksum[:16]}.keras-artifact")
+
+    def load_keras_model(self, keras, source_path, timings=None):
+        """
+        Load a Keras model through the cache
+
+        The first load of a given source reads the model file and writes the
+        artifact; later loads rebuild the model from its architecture and
+        set the weights from the memory-mapped blob, skipping HDF5 parsing
+        (the weights are still copied into the model). Those loads report
+        artifact_load_seconds next to the source_load_seconds recorded at
+        conversion (as converted_source_load_seconds) so the saving shows
+        up in the load timings. Models whose architecture can't be
+        serialized to JSON (e.g. unregistered custom layers) fall back to
+        loading the source file every time.
+
+        Args:
+            keras: The keras module (tf.keras)
+            source_path (str): Keras model file (.h5, optionally .h5.gz)
+            timings (dict): Receives the seconds spent in each load phase
+
+        Returns:
+            Loaded Keras model
+        """
+        timings = timings if timings is not None else {}
+
+        with timed_phase(timings, 'checksum_seconds'):
+            checksum = self.source_checksum(source_path)
+        if source_path.endswith('.gz'):
+            with timed_phase(timings, 'decompress_seconds'):
+                source_path = self.decompressed_path(source_path, checksum)
+
+        artifact_path = self.keras_artifact_path(checksum)
+        if os.path.exists(artifact_path):
+            try:
+                with timed_phase(timings, 'artifact_load_seconds'):
+                    model = load_keras_artifact(keras, artifact_path, timings)
+                timings['source'] = 'artifact'
+                return model
+            except Exception as e:
+                print(f"⚠️ Cached artifact {artifact_path} unusable ({e}) - loading {source_path}")
+
+        with timed_phase(timings, 'source_load_seconds'):
+            model = keras.models.load_model(source_path, compile=False)
+        timings['source'] = 'model_file'
+
+        try:
+            with timed_phase(timings, 'artifact_write_seconds'):
+                self._publish(lambda temp_dir: save_keras_artifact(
+                    model, os.path.join(temp_dir, 'artifact'), timings['source_load_seconds']
+                ), os.path.basename(artifact_path))
+            print(f"💾 Cached {source_path} as {artifact_path}")
+        except Exception as e:
+            print(f"⚠️ Could not cache {source_path} ({e}) - it will be loaded from the model file")
+        return model
+
+def save_keras_artifact(model, artifact_path, source_load_seconds=None):
+    """
+    Write a Keras model as architecture JSON plus one aligned weights blob
+
+    Args:
+        source_load_seconds (float): Time the source file took to load, kept
+            in the manifest to compare artifact loads against
+
+    Returns:
+        str: artifact_path
+    """
+    os.makedirs(artifact_path)
+    weights = model.get_weights()
+
+    manifest = []
+    offset = 0
+    with open(os.path.join(artifact_path, 'weights.bin'), 'wb') as f:
+        for weight in weights:
+            weight = np.ascontiguousarray(weight)
+            padding = -offset % WEIGHT_ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            manifest.append({'dtype': weight.dtype.str, 'shape': list(weight.shape), 'offset': offset})
+            f.write(weight.tobytes())
+            offset += weight.nbytes
+
+    with open(os.path.join(artifact_path, 'architecture.json'), 'w') as f:
+        f.write(model.to_json())
+    with open(os.path.join(artifact_path, 'manifest.json'), 'w') as f:
+        json.dump({'weights': manifest, 'total_bytes': offset, 'source_load_seconds': source_load_seconds}, f)
+    return artifact_path
+
+def load_keras_artifact(keras, artifact_path, timings=None):
+    """
+    Rebuild a Keras model from a saved artifact
+
+    The weights are read through a memory map, but set_weights copies them
+    into the model's variables, so the model still holds its own copy.
+
+    Args:
+        keras: The keras module (tf.keras)
+        artifact_path (str): Directory written by save_keras_artifact
+        timings (dict): Receives converted_source_load_seconds, the source
+            file's load time recorded at conversion
+
+    Returns:
+        Loaded Keras model
+    """
+    with open(os.path.join(artifact_path, 'architecture.json'), 'r') as f:
+        model = keras.models.model_from_json(f.read())
+    with open(os.path.join(artifact_path, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    if timings is not None and manifest.get('source_load_seconds') is not None:
+        timings['converted_source_load_seconds'] = manifest['source_load_seconds']
+
+    if not manifest['weights']:
+        return model
+
+    blob = np.memmap(os.path.join(artifact_path, 'weights.bin'), dtype=np.uint8, mode='r')
+    weights = []
+    for entry in manifest['weights']:
+        dtype = np.dtype(entry['dtype'])
+        nbytes = int(np.prod(entry['shape'], dtype=np.int64)) * dtype.itemsize
+        weights.append(blob[entry['offset']:entry['offset'] + nbytes].view(dtype).reshape(entry['shape']))
+    model.set_weights(weights)
+    return model
@@ -0,0 +1,154 @@
+"""
+Small on-disk model registry for the plant disease service
+Keeps versioned model entries and the active version in one JSON file so
+a running server can be pointed at a new model without a restart.
+
+Usage:
+    python model_registry.py register v2 models/best_model_v2.h5 --activate
+    python model_registry.py list
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from inference_engines import tflite_model_path, onnx_model_path, TFLITE_QUANTIZATIONS
+from model_artifacts import find_model_source
+
+DEFAULT_REGISTRY_PATH = os.path.join('models', 'registry.json')
+
+def model_files_exist(model_path):
+    """Check for a model file, its gzip copy, or a TFLite/ONNX conversion an engine can serve without it"""
+    if find_model_source(model_path):
+        return True
+    if os.path.exists(onnx_model_path(model_path)):
+        return True
+    return any(os.path.exists(tflite_model_path(model_path, quantization)) for quantization in TFLITE_QUANTIZATIONS)
+
+class ModelRegistry:
+    def __init__(self, registry_path=DEFAULT_REGISTRY_PATH):
+        """
+        Initialize the model registry
+
+        Args:
+            registry_path (str): Path of the registry JSON file (created on first write)
+        """
+        self.registry_path = registry_path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.registry_path):
+            return {'active': None, 'versions': {}}
+        with open(self.registry_path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, data):
+        """Write the registry atomically so readers never see a partial file"""
+        directory = os.path.dirname(self.registry_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def list_versions(self):
+        """
+        List the registered versions
+
+        Returns:
+            dict: {'active': version or None, 'versions': {version: entry}}
+        """
+        with self._lock:
+            return self._read()
+
+    def get(self, version):
+        """
+        Look up a registered version
+
+        Returns:
+            dict: Entry with 'version', 'model_path' and 'class_names_path'
+        """
+        with self._lock:
+            entry = self._read()['versions'].get(version)
+        if entry is None:
+            raise KeyError(f"Unknown model version: {version}")
+        return dict(entry, version=version)
+
+    def active(self):
+        """Get the active entry, or None if nothing is registered"""
+        with self._lock:
+            data = self._read()
+        if data['active'] is None:
+            return None
+        return dict(data['versions'][data['active']], version=data['active'])
+
+    def register(self, version, model_path, class_names_path='class_names.txt', activate=False):
+        """
+        Register a model version
+
+        Args:
+            version (str): Version label
+            model_path (str): Path to the Keras model file (a version shipped only as a gzip,
+                TFLite or ONNX copy is registered under the Keras path it was converted from)
+            class_names_path (str): Path to the class names file for this model
+            activate (bool): Whether to make this the active version
+        """
+        if not model_files_exist(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        with self._lock:
+            data = self._read()
+            data['versions'][version] = {
+                'model_path': model_path,
+                'class_names_path': class_names_path,
+                'registered_at': datetime.now().isoformat()
+            }
+            if activate or data['active'] is None:
+                data['active'] = version
+            self._write(data)
+
+    def set_active(self, version):
+        """Mark a registered version as active"""
+        with self._lock:
+            data = self._read()
+            if version not in data['versions']:
+                raise KeyError(f"Unknown model version: {version}")
+            data['active'] = version
+            self._write(data)
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk model registry')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY', DEFAULT_REGISTRY_PATH))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    register = commands.add_parser('register', help='Register a model version')
+    register.add_argument('version')
+    register.add_argument('model_path')
+    register.add_argument('--class-names', default='class_names.txt')
+    register.add_argument('--activate', action='store_true')
+
+    activate = commands.add_parser('activate', help='Make a registered version active')
+    activate.add_argument('version')
+
+    commands.add_parser('list', help='List registered versions')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'register':
+        registry.register(args.version, args.model_path, args.class_names, activate=args.activate)
+        print(f"✅ Registered {args.version} ({args.model_path})")
+    elif args.command == 'activate':
+        registry.set_active(args.version)
+        print(f"✅ {args.version} is now active")
+
+    data = registry.list_versions()
+    for version, entry in sorted(data['versions'].items()):
+        marker = '*' if version == data['active'] else ' '
+        print(f"{marker} {version:<16} {entry['model_path']:<40} {entry['registered_at']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
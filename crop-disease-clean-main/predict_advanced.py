@@ -1,12 +1,121 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 import os
 import json
+import time
+import threading
 from datetime import datetime
+from inference_engines import (
+    TFLiteEngine, OnnxRuntimeEngine, convert_to_tflite, convert_to_onnx, tflite_model_path, onnx_model_path,
+    TFLITE_QUANTIZATIONS
+)
+from model_artifacts import ModelArtifactCache, DEFAULT_CACHE_DIR, find_model_source, timed_phase
+
+# TensorFlow is imported on first use so engines serving a converted model
+# (TFLite, ONNX Runtime) can run in processes that never load it
+tf = None
+
+# Thread pool sizes applied when TensorFlow is imported (None keeps TensorFlow's defaults)
+TF_THREADING = {'intra_op': None, 'inter_op': None}
+
+def configure_tensorflow_threads(intra_op=None, inter_op=None):
+    """
+    Set TensorFlow's intra-op and inter-op thread pool sizes for this process
+    
+    Must be called before TensorFlow is first used (e.g. in a freshly forked
+    worker), since the pools can't be resized once the runtime has started.
+    """
+    if tf is not None:
+        raise RuntimeError("TensorFlow is already initialized in this process")
+    TF_THREADING['intra_op'] = intra_op
+    TF_THREADING['inter_op'] = inter_op
+
+def model_available(path, engine='tensorflow', quantization='float16'):
+    """
+    Check for a model file, or for an exported copy the engine can serve without it
+    
+    Args:
+        path (str): Keras model path (a gzip-compressed copy also counts)
+        engine (str): Inference engine that will serve it
+        quantization (str): TFLite quantization
+    """
+    if find_model_source(path):
+        return True
+    if engine == 'tflite':
+        return os.path.exists(tflite_model_path(path, quantization))
+    return engine == 'onnx' and os.path.exists(onnx_model_path(path))
+
+def _import_tensorflow():
+    """Import TensorFlow on first use"""
+    global tf
+    if tf is None:
+        import tensorflow
+        if TF_THREADING['intra_op']:
+            tensorflow.config.threading.set_intra_op_parallelism_threads(TF_THREADING['intra_op'])
+        if TF_THREADING['inter_op']:
+            tensorflow.config.threading.set_inter_op_parallelism_threads(TF_THREADING['inter_op'])
+        tf = tensorflow
+    return tf
+
+# Fixed test-time augmentation policy: (brightness factor, horizontal flip)
+# applied to every view after the original one
+TTA_POLICY = (
+    (0.9, False),
+    (1.1, True),
+    (0.95, True),
+    (1.05, False),
+    (1.0, True),
+    (0.92, True),
+    (1.08, False),
+)
+TTA_NOISE_STD = 0.01
+TTA_VIEWS = 5
+
+# Batch sizes traced and warmed up at load time by the compiled inference path
+WARMUP_BATCH_SIZES = (1, TTA_VIEWS, 16)
+
+INFERENCE_ENGINES = ('tensorflow', 'tflite', 'onnx')
+
+# Enhancement factors shared by the PIL and in-graph preprocessing paths
+CONTRAST_FACTOR = 1.1
+SHARPNESS_FACTOR = 1.05
+CALIBRATION_IMAGES = 100  # Max images used to calibrate int8 quantization
+
+# Reported for classes missing from the disease information database
+DEFAULT_DISEASE_INFO = {
+    'severity': 'Unknown',
+    'description': 'Information not available',
+    'treatment': 'Consult agricultural expert',
+    'prevention': 'Follow general plant care guidelines'
+}
+
+def top_k(predictions, k):
+    """
+    Select the k highest-scoring classes for every row of a batch
+    
+    argpartition finds the k entries in linear time and only those are sorted,
+    instead of sorting every class of every row.
+    
+    Args:
+        predictions (np.array): Class probabilities of shape (N, num_classes)
+        k (int): Number of classes to keep per row
+        
+    Returns:
+        tuple: (class indices, float64 scores), both (N, k) and highest first
+    """
+    k = min(k, predictions.shape[1])
+    indices = np.argpartition(-predictions, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(predictions, indices, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    indices = np.take_along_axis(indices, order, axis=1)
+    return indices, np.take_along_axis(scores, order, axis=1).astype(np.float64)
 
 class AdvancedPlantDiseasePredictor:
-    def __init__(self, model_path='best_model_advanced.h5', class_names_path='class_names_advanced.txt', fallback_model='best_model.h5'):
+    def __init__(self, model_path='best_model_advanced.h5', class_names_path='class_names_advanced.txt', fallback_model='best_model.h5',
+                 tta_seed=0, adaptive_tta_margin=0.3, adaptive_tta_entropy=0.35, batch_memory_budget_mb=32,
+                 use_compiled=True, jit_compile=False, warmup_batch_sizes=WARMUP_BATCH_SIZES, warmup=True,
+                 engine='tensorflow', quantization='float16', calibration_dir='test', num_threads=None,
+                 model_version=None, artifact_cache_dir=DEFAULT_CACHE_DIR):
         """
         Initialize the advanced plant disease predictor with fallback support
         
@@ -14,7 +123,32 @@ class AdvancedPlantDiseasePredictor:
             model_path (str): Path to the advanced trained model
             class_names_path (str): Path to the class names file
             fallback_model (str): Fallback model if advanced model not available
+            tta_seed (int): Seed for the test-time augmentation noise
+            adaptive_tta_margin (float): Minimum top-1/top-2 probability margin for
+                adaptive TTA to accept the un-augmented prediction
+            adaptive_tta_entropy (float): Maximum normalized entropy (0-1) for
+                adaptive TTA to accept the un-augmented prediction
+            batch_memory_budget_mb (float): Input tensor budget for one forward pass in
+                batch prediction; larger batches are split into chunks
+            use_compiled (bool): Serve predictions through a tf.function with a fixed
+                input signature instead of model.predict
+            jit_compile (bool): XLA-compile the inference function; batches are then
+                padded to the nearest warmup batch size to avoid recompilation
+            warmup_batch_sizes (tuple): Batch sizes traced and run once at load time
+            warmup (bool): Whether to warm up the inference path in the constructor
+            engine (str): Inference engine, 'tensorflow', 'tflite' or 'onnx'
+            quantization (str): TFLite quantization, 'float16' or 'int8'
+            calibration_dir (str): Directory of sample images used to calibrate int8 quantization
+            num_threads (int): Thread count for the TFLite interpreter or ONNX Runtime session
+            model_version (str): Version label reported by get_model_info (e.g. a registry version)
+            artifact_cache_dir (str): Directory of fast-loading converted copies of Keras
+                models, keyed by checksum (None always loads the model file)
         """
+        if engine not in INFERENCE_ENGINES:
+            raise ValueError(f"Unknown inference engine: {engine}")
+        if engine == 'tflite' and quantization not in TFLITE_QUANTIZATIONS:
+            raise ValueError(f"Unsupported TFLite quantization: {quantization}")
+        
         self.model_path = model_path
         self.class_names_path = class_names_path
         self.fallback_model = fallback_model
@@ -23,13 +157,39 @@ class AdvancedPlantDiseasePredictor:
         self.model_type = 'unknown'
         self.IMG_HEIGHT = 300  # Default for advanced model
         self.IMG_WIDTH = 300
+        self.tta_seed = tta_seed
+        self.adaptive_tta_margin = adaptive_tta_margin
+        self.adaptive_tta_entropy = adaptive_tta_entropy
+        self.batch_memory_budget = batch_memory_budget_mb * 1024 * 1024
+        self.use_compiled = use_compiled
+        self.jit_compile = jit_compile
+        self.warmup_batch_sizes = tuple(sorted(set(warmup_batch_sizes)))
+        self._infer_fn = None
+        self._preprocess_fn = None
+        self._features_fn = None
+        self.is_warm = False
+        self.engine = engine
+        self.quantization = quantization if engine == 'tflite' else None
+        self.calibration_dir = calibration_dir
+        self.num_threads = num_threads
+        self.engine_backend = None
+        self.loaded_model_path = None
+        self.model_version = model_version
+        self.artifact_cache = ModelArtifactCache(artifact_cache_dir) if artifact_cache_dir else None
+        self.load_timings = {}
         
         # Disease information database
         self.disease_info = self._load_disease_info()
         
         # Load model and class names
         self.load_model()
-        self.load_class_names()
+        with timed_phase(self.load_timings, 'class_names_seconds'):
+            self.load_class_names()
+        print(f"⏱️ Load phases: {self.load_timings}")
+        
+        # Trace the inference path for the common batch sizes
+        if warmup:
+            self.warmup()
     
     def _load_disease_info(self):
         """Load disease information database"""
@@ -76,35 +236,251 @@ class AdvancedPlantDiseasePredictor:
     def load_model(self):
         """Load the trained model with fallback support"""
         try:
-            if os.path.exists(self.model_path):
-                self.model = tf.keras.models.load_model(self.model_path, compile=False)
-                
-                # Check the actual input shape to determine model type
-                input_shape = self.model.input_shape
-                if input_shape[1] == 300 and input_shape[2] == 300:
-                    self.model_type = 'advanced'
-                    self.IMG_HEIGHT = 300
-                    self.IMG_WIDTH = 300
-                    print(f"✅ Advanced model loaded from {self.model_path} (300x300)")
-                else:
-                    self.model_type = 'basic'
-                    self.IMG_HEIGHT = 224
-                    self.IMG_WIDTH = 224
-                    print(f"✅ Basic model loaded from {self.model_path} (224x224)")
-                    
-            elif os.path.exists(self.fallback_model):
-                self.model = tf.keras.models.load_model(self.fallback_model, compile=False)
-                self.model_type = 'basic'
-                self.IMG_HEIGHT = 224
-                self.IMG_WIDTH = 224
-                print(f"⚠️ Using fallback model from {self.fallback_model}")
+            if model_available(self.model_path, self.engine, self.quantization):
+                source_path = self.model_path
+            elif model_available(self.fallback_model, self.engine, self.quantization):
+                source_path = self.fallback_model
             else:
                 raise FileNotFoundError("No model file found")
+            self.loaded_model_path = source_path
+            
+            if self.engine == 'tflite':
+                self._load_tflite_engine(source_path)
+                return
+            if self.engine == 'onnx':
+                self._load_onnx_engine(source_path)
+                return
+            
+            self.model = self._load_keras_model(source_path)
+            self._set_model_type(self.model.input_shape, source_path)
+            with timed_phase(self.load_timings, 'graph_build_seconds'):
+                self._build_preprocess_fn()
+                self._build_features_fn()
+                
+                if self.use_compiled:
+                    self._build_inference_fn()
                 
         except Exception as e:
             print(f"❌ Error loading model: {e}")
             raise
     
+    def _load_keras_model(self, source_path):
+        """
+        Load a Keras model file, from its cached artifact when one exists
+        
+        Args:
+            source_path (str): Model path; a gzip-compressed copy (path + '.gz') is also accepted
+            
+        Returns:
+            Loaded Keras model
+        """
+        if tf is None:
+            with timed_phase(self.load_timings, 'tensorflow_import_seconds'):
+                _import_tensorflow()
+        
+        source_file = find_model_source(source_path)
+        if self.artifact_cache is not None:
+            return self.artifact_cache.load_keras_model(tf.keras, source_file, self.load_timings)
+        
+        if source_file.endswith('.gz'):
+            raise ValueError(f"{source_file} is compressed; loading it needs the artifact cache")
+        with timed_phase(self.load_timings, 'source_load_seconds'):
+            return tf.keras.models.load_model(source_file, compile=False)
+    
+    def _set_model_type(self, input_shape, source_path):
+        """Set the model type and input size from the model's input shape"""
+        if source_path != self.model_path:
+            self.model_type = 'basic'
+            self.IMG_HEIGHT = 224
+            self.IMG_WIDTH = 224
+            print(f"⚠️ Using fallback model from {self.fallback_model}")
+        
+        # Check the actual input shape to determine model type
+        elif input_shape[1] == 300 and input_shape[2] == 300:
+            self.model_type = 'advanced'
+            self.IMG_HEIGHT = 300
+            self.IMG_WIDTH = 300
+            print(f"✅ Advanced model loaded from {self.model_path} (300x300)")
+        else:
+            self.model_type = 'basic'
+            self.IMG_HEIGHT = 224
+            self.IMG_WIDTH = 224
+            print(f"✅ Basic model loaded from {self.model_path} (224x224)")
+    
+    def _load_tflite_engine(self, source_path):
+        """
+        Convert the Keras model to TFLite (once, cached next to it) and load the interpreter
+        
+        An existing conversion is served as is when the Keras model isn't present.
+        """
+        tflite_path = tflite_model_path(source_path, self.quantization)
+        source_file = find_model_source(source_path)
+        
+        if source_file and (not os.path.exists(tflite_path) or os.path.getmtime(tflite_path) < os.path.getmtime(source_file)):
+            print(f"🔄 Converting {source_path} to TFLite ({self.quantization})...")
+            self.model = self._load_keras_model(source_path)
+            self._set_model_type(self.model.input_shape, source_path)
+            
+            with timed_phase(self.load_timings, 'conversion_seconds'):
+                calibration_images = self._load_calibration_images() if self.quantization == 'int8' else None
+                tflite_model = convert_to_tflite(self.model, self.quantization, calibration_images)
+                with open(tflite_path, 'wb') as f:
+                    f.write(tflite_model)
+            
+            # The interpreter serves predictions, so the Keras copy isn't kept around
+            self.model = None
+        
+        with timed_phase(self.load_timings, 'engine_load_seconds'):
+            self.engine_backend = TFLiteEngine(tflite_path, num_threads=self.num_threads)
+        self._set_model_type(self.engine_backend.input_shape, source_path)
+        print(f"⚡ TFLite engine ready from {tflite_path}")
+    
+    def _load_onnx_engine(self, source_path):
+        """
+        Export the Keras model to ONNX (once, cached next to it) and open an ONNX Runtime session
+        
+        An existing export is served as is when the Keras model isn't present,
+        so inference processes can ship with just the .onnx file.
+        """
+        onnx_path = onnx_model_path(source_path)
+        source_file = find_model_source(source_path)
+        
+        if source_file and (not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(source_file)):
+            print(f"🔄 Exporting {source_path} to ONNX (experimental - check it with engine_parity.py)...")
+            self.model = self._load_keras_model(source_path)
+            with timed_phase(self.load_timings, 'conversion_seconds'):
+                convert_to_onnx(self.model, onnx_path)
+            self.model = None
+        
+        with timed_phase(self.load_timings, 'engine_load_seconds'):
+            self.engine_backend = OnnxRuntimeEngine(onnx_path, intra_op_threads=self.num_threads)
+        self._set_model_type(self.engine_backend.input_shape, source_path)
+        print(f"⚡ ONNX Runtime engine ready from {onnx_path}")
+    
+    def _load_calibration_images(self):
+        """Load preprocessed sample images for int8 calibration"""
+        if not self.calibration_dir or not os.path.isdir(self.calibration_dir):
+            raise FileNotFoundError(f"Calibration directory not found: {self.calibration_dir}")
+        
+        image_files = sorted(
+            f for f in os.listdir(self.calibration_dir)
+            if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+        )[:CALIBRATION_IMAGES]
+        if not image_files:
+            raise FileNotFoundError(f"No calibration images in {self.calibration_dir}")
+        
+        print(f"📏 Calibrating int8 quantization on {len(image_files)} images")
+        return [
+            self.preprocess_image(os.path.join(self.calibration_dir, f), enhance=False)[0]
+            for f in image_files
+        ]
+    
+    def _build_inference_fn(self):
+        """Wrap the model in a tf.function with a fixed input signature"""
+        model = self.model
+        
+        @tf.function(
+            input_signature=[tf.TensorSpec(shape=[None, self.IMG_HEIGHT, self.IMG_WIDTH, 3], dtype=tf.float32)],
+            jit_compile=self.jit_compile
+        )
+        def infer(batch):
+            return model(batch, training=False)
+        
+        self._infer_fn = infer
+    
+    def _build_features_fn(self):
+        """Wrap the model in a tf.function returning class probabilities and penultimate-layer embeddings from one pass"""
+        features_model = tf.keras.Model(
+            inputs=self.model.inputs, outputs=[self.model.output, self.model.layers[-2].output]
+        )
+        
+        @tf.function(
+            input_signature=[tf.TensorSpec(shape=[None, self.IMG_HEIGHT, self.IMG_WIDTH, 3], dtype=tf.float32)]
+        )
+        def features(batch):
+            return features_model(batch, training=False)
+        
+        self._features_fn = features
+    
+    def _build_preprocess_fn(self):
+        """
+        Build the in-graph preprocessing for raw uint8 (N, h, w, 3) images
+        
+        Rescaling, resizing and the optional contrast/sharpness enhancement run
+        as batched TensorFlow ops instead of PIL and NumPy copies. Enhancement is
+        applied after resizing, at the model's input resolution.
+        """
+        height, width = self.IMG_HEIGHT, self.IMG_WIDTH
+        
+        # PIL's SMOOTH filter, applied per channel, is the baseline for sharpness
+        smooth = tf.constant([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=tf.float32) / 13.0
+        smooth_kernel = tf.tile(smooth[:, :, None, None], [1, 1, 3, 1])
+        luma_weights = tf.constant([0.299, 0.587, 0.114], dtype=tf.float32)
+        
+        def enhance(images):
+            # Contrast: blend with the mean grey level, like ImageEnhance.Contrast
+            mean = tf.reduce_mean(tf.tensordot(images, luma_weights, axes=1), axis=[1, 2], keepdims=True)
+            mean = mean[..., None]
+            images = tf.clip_by_value(mean + CONTRAST_FACTOR * (images - mean), 0.0, 1.0)
+            
+            # Sharpness: blend with the smoothed image, like ImageEnhance.Sharpness
+            smoothed = tf.nn.depthwise_conv2d(images, smooth_kernel, strides=[1, 1, 1, 1], padding='SAME')
+            return smoothed + SHARPNESS_FACTOR * (images - smoothed)
+        
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=[None, None, None, 3], dtype=tf.uint8),
+            tf.TensorSpec(shape=[], dtype=tf.bool)
+        ])
+        def preprocess(images, apply_enhancement):
+            images = tf.image.convert_image_dtype(images, tf.float32)
+            images = tf.image.resize(images, (height, width), method='lanczos3', antialias=True)
+            images = tf.cond(apply_enhancement, lambda: enhance(images), lambda: images)
+            return tf.clip_by_value(images, 0.0, 1.0)
+        
+        self._preprocess_fn = preprocess
+    
+    def export_serving_model(self, export_dir):
+        """
+        Export a SavedModel that takes raw uint8 images and returns class probabilities
+        
+        The serving signature runs the in-graph preprocessing and the model as one
+        graph: serve(images=uint8 (N, h, w, 3), enhance=bool) -> (N, num_classes).
+        
+        Args:
+            export_dir (str): Directory to write the SavedModel to
+        """
+        if self.model is None or self._preprocess_fn is None:
+            raise RuntimeError("Serving export needs the TensorFlow engine")
+        
+        module = tf.Module()
+        module.model = self.model
+        preprocess = self._preprocess_fn
+        
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=[None, None, None, 3], dtype=tf.uint8, name='images'),
+            tf.TensorSpec(shape=[], dtype=tf.bool, name='enhance')
+        ])
+        def serve(images, enhance):
+            return module.model(preprocess(images, enhance), training=False)
+        
+        module.serve = serve
+        tf.saved_model.save(module, export_dir, signatures={'serving_default': serve})
+        print(f"📦 Serving model exported to {export_dir}")
+    
+    def warmup(self):
+        """Run the inference path once per warmup batch size so the first request doesn't pay for tracing"""
+        start = time.perf_counter()
+        if self._preprocess_fn is not None:
+            self.preprocess_uint8(np.zeros((1, self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.uint8), enhance=True)
+        for batch_size in self.warmup_batch_sizes:
+            self._run_model(np.zeros((batch_size, self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32))
+        if self._features_fn is not None:
+            self._run_model(np.zeros((1, self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32), return_embeddings=True)
+        
+        self.is_warm = True
+        self.load_timings['warmup_seconds'] = round(time.perf_counter() - start, 3)
+        print(f"🔥 Warmed up batch sizes {list(self.warmup_batch_sizes)} in {time.perf_counter() - start:.2f}s")
+    
     def load_class_names(self):
         """Load class names from file with fallback support"""
         try:
@@ -118,11 +494,47 @@ class AdvancedPlantDiseasePredictor:
                     self.class_names = [line.strip() for line in f.readlines()]
             
             print(f"✅ Loaded {len(self.class_names)} class names")
+            self._build_class_table()
             
         except Exception as e:
             print(f"❌ Error loading class names: {e}")
             raise
     
+    def _build_class_table(self):
+        """Precompute per-class metadata so formatting a prediction is array indexing"""
+        parts = [class_name.split('___') for class_name in self.class_names]
+        self.class_index = {class_name: i for i, class_name in enumerate(self.class_names)}
+        self.class_plants = np.array([p[0] for p in parts], dtype=object)
+        self.class_diseases = np.array([p[1] if len(p) > 1 else 'Unknown' for p in parts], dtype=object)
+        self.class_is_healthy = np.array(['healthy' in disease.lower() for disease in self.class_diseases], dtype=bool)
+        self.class_disease_info = [
+            self.disease_info.get(class_name, DEFAULT_DISEASE_INFO) for class_name in self.class_names
+        ]
+    
+    def has_model(self):
+        """Check whether a model or inference engine is loaded"""
+        return self.model is not None or self.engine_backend is not None
+    
+    def supports_embeddings(self):
+        """Check whether penultimate-layer embeddings are available (TensorFlow engine only)"""
+        return self._features_fn is not None
+    
+    def get_embeddings(self, image_array):
+        """
+        Extract L2-normalized penultimate-layer embeddings
+        
+        Args:
+            image_array (np.array): Preprocessed (N, H, W, 3) float batch, or any
+                single image accepted by prepare_image_array
+            
+        Returns:
+            np.array: float32 embeddings of shape (N, embedding_dim)
+        """
+        if image_array.ndim != 4 or image_array.dtype != np.float32 or image_array.shape[1:3] != (self.IMG_HEIGHT, self.IMG_WIDTH):
+            image_array = self.prepare_image_array(image_array)
+        
+        return self._run_model(image_array, return_embeddings=True)[1]
+    
     def enhance_image(self, image):
         """Apply image enhancement techniques"""
         # Convert to PIL if it's not already
@@ -131,10 +543,10 @@ class AdvancedPlantDiseasePredictor:
         
         # Apply subtle enhancements
         enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.1)
+        image = enhancer.enhance(CONTRAST_FACTOR)
         
         enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.05)
+        image = enhancer.enhance(SHARPNESS_FACTOR)
         
         return image
     
@@ -174,44 +586,175 @@ class AdvancedPlantDiseasePredictor:
             print(f"❌ Error preprocessing image: {e}")
             raise
     
-    def test_time_augmentation(self, image_array, num_augmentations=5):
-        """Apply test-time augmentation for better predictions"""
-        predictions = []
+    def _run_model(self, batch, return_embeddings=False):
+        """
+        Run a single forward pass over a preprocessed float32 batch
+        
+        Args:
+            batch (np.array): Preprocessed batch of shape (N, H, W, 3)
+            return_embeddings (bool): Also return the L2-normalized penultimate-layer
+                embeddings from the same pass (TensorFlow engine only)
+            
+        Returns:
+            np.array: Class probabilities, or (probabilities, embeddings) with return_embeddings
+        """
+        if return_embeddings:
+            if self._features_fn is None:
+                raise RuntimeError("Embeddings need the TensorFlow engine")
+            predictions, embeddings = self._features_fn(tf.constant(np.asarray(batch, dtype=np.float32)))
+            embeddings = embeddings.numpy().reshape(len(batch), -1)
+            return predictions.numpy(), embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
         
-        # Original image
-        pred = self.model.predict(image_array, verbose=0)
-        predictions.append(pred)
+        if self.engine_backend is not None:
+            return self.engine_backend.predict(batch)
         
-        # Create augmented versions
-        original_image = image_array[0]
+        if self._infer_fn is None:
+            return self.model.predict(batch, verbose=0)
         
-        for _ in range(num_augmentations - 1):
-            # Random transformations
-            augmented = original_image.copy()
+        batch = np.asarray(batch, dtype=np.float32)
+        num_images = len(batch)
+        
+        if self.jit_compile:
+            # Pad to a warmed batch size so XLA never sees a new shape
+            largest = self.warmup_batch_sizes[-1]
+            if num_images > largest:
+                return np.concatenate([self._run_model(batch[i:i + largest]) for i in range(0, num_images, largest)])
             
-            # Random brightness adjustment
-            brightness_factor = np.random.uniform(0.9, 1.1)
-            augmented = np.clip(augmented * brightness_factor, 0, 1)
+            bucket = next(size for size in self.warmup_batch_sizes if size >= num_images)
+            if bucket > num_images:
+                padding = np.zeros((bucket - num_images,) + batch.shape[1:], dtype=np.float32)
+                batch = np.concatenate([batch, padding])
+        
+        return self._infer_fn(tf.constant(batch)).numpy()[:num_images]
+    
+    def build_tta_batch(self, image, num_augmentations=TTA_VIEWS):
+        """
+        Build every test-time augmentation view of an image as one batch
+        
+        The views follow the fixed TTA_POLICY and the noise is drawn from a
+        generator seeded with ``tta_seed``, so the same image always produces
+        the same batch (and therefore the same prediction).
+        
+        Args:
+            image (np.array): Preprocessed image of shape (H, W, 3) in [0, 1]
+            num_augmentations (int): Total number of views, including the original
             
-            # Random rotation (small angles)
-            if np.random.random() > 0.5:
-                # Simple flip augmentation
-                if np.random.random() > 0.5:
-                    augmented = np.fliplr(augmented)
+        Returns:
+            np.array: float32 batch of shape (num_augmentations, H, W, 3)
+        """
+        image = np.asarray(image, dtype=np.float32)
+        batch = np.empty((num_augmentations,) + image.shape, dtype=np.float32)
+        batch[0] = image
+        
+        rng = np.random.default_rng(self.tta_seed)
+        for i in range(1, num_augmentations):
+            brightness_factor, flip = TTA_POLICY[(i - 1) % len(TTA_POLICY)]
+            view = batch[i]
             
-            # Add noise
-            noise = np.random.normal(0, 0.01, augmented.shape)
-            augmented = np.clip(augmented + noise, 0, 1)
+            # Brightness adjustment (and optional horizontal flip) written in place
+            np.multiply(image[:, ::-1] if flip else image, brightness_factor, out=view)
             
-            # Predict on augmented image
-            augmented_batch = np.expand_dims(augmented, axis=0)
-            pred = self.model.predict(augmented_batch, verbose=0)
-            predictions.append(pred)
+            # Add noise without leaving float32
+            view += rng.standard_normal(image.shape, dtype=np.float32) * TTA_NOISE_STD
+            np.clip(view, 0.0, 1.0, out=view)
+        
+        return batch
+    
+    def test_time_augmentation(self, image_array, num_augmentations=TTA_VIEWS):
+        """Apply test-time augmentation for better predictions"""
+        # Run all views through the model in a single forward pass
+        batch = self.build_tta_batch(image_array[0], num_augmentations)
+        predictions = self._run_model(batch)
         
         # Average all predictions
-        final_prediction = np.mean(predictions, axis=0)
+        final_prediction = np.mean(predictions, axis=0, keepdims=True)
         return final_prediction
     
+    def is_confident(self, prediction):
+        """
+        Check whether a single prediction is clear-cut enough to skip TTA
+        
+        Args:
+            prediction (np.array): Class probabilities for one image
+            
+        Returns:
+            bool: True if the top-1 margin and entropy are inside the configured band
+        """
+        top_two = np.partition(prediction, -2)[-2:]
+        margin = float(top_two[1] - top_two[0])
+        
+        # Entropy normalized by log(num_classes) so the threshold is in [0, 1]
+        probs = np.clip(prediction, 1e-12, 1.0)
+        entropy = float(-np.sum(probs * np.log(probs)) / np.log(len(probs)))
+        
+        return margin >= self.adaptive_tta_margin and entropy <= self.adaptive_tta_entropy
+    
+    def _predict_batch_probabilities(self, batch, use_tta, tta_views=TTA_VIEWS, return_embeddings=False):
+        """
+        Run the model on a preprocessed batch of images
+        
+        All augmented views needed by the batch are stacked so each stage is a
+        single forward pass. In adaptive mode the plain images run first and
+        only the uncertain ones get the remaining TTA views.
+        
+        Args:
+            batch (np.array): Preprocessed batch of shape (N, H, W, 3)
+            use_tta (bool or str): True, False or 'adaptive'
+            tta_views (int): Views per image when TTA is used, including the original
+            return_embeddings (bool): Also return each image's embedding, taken from
+                its unaugmented view in the same forward pass
+            
+        Returns:
+            tuple: (class probabilities of shape (N, num_classes), views evaluated per image),
+                plus the (N, embedding_dim) embeddings with return_embeddings
+        """
+        num_images = len(batch)
+        
+        def run(images):
+            if return_embeddings:
+                return self._run_model(images, return_embeddings=True)
+            return self._run_model(images), None
+        
+        if not use_tta or tta_views <= 1 or self.model_type != 'advanced':
+            predictions, embeddings = run(batch)
+            views_evaluated = [1] * num_images
+        elif use_tta != 'adaptive':
+            views = np.concatenate([self.build_tta_batch(image, tta_views) for image in batch])
+            predictions, embeddings = run(views)
+            predictions = predictions.reshape(num_images, tta_views, -1).mean(axis=1)
+            if embeddings is not None:
+                embeddings = embeddings[::tta_views]  # View 0 of each image is the original
+            views_evaluated = [tta_views] * num_images
+        else:
+            predictions, embeddings = run(batch)
+            uncertain = [i for i in range(num_images) if not self.is_confident(predictions[i])]
+            views_evaluated = [1] * num_images
+            if uncertain:
+                # Evaluate the remaining views in one pass and average with the originals
+                augmented = np.concatenate([self.build_tta_batch(batch[i], tta_views)[1:] for i in uncertain])
+                augmented = self._run_model(augmented).reshape(len(uncertain), tta_views - 1, -1)
+                for row, i in enumerate(uncertain):
+                    predictions[i] = (predictions[i] + augmented[row].sum(axis=0)) / tta_views
+                    views_evaluated[i] = tta_views
+        
+        if return_embeddings:
+            return predictions, views_evaluated, embeddings
+        return predictions, views_evaluated
+    
+    def _predict_probabilities(self, image_array, use_tta):
+        """
+        Run the model on a preprocessed single-image batch
+        
+        Args:
+            image_array (np.array): Preprocessed batch of shape (1, H, W, 3)
+            use_tta (bool or str): True, False or 'adaptive'
+            
+        Returns:
+            tuple: (class probabilities for the image, number of views evaluated)
+        """
+        predictions, views = self._predict_batch_probabilities(image_array, use_tta)
+        return predictions[0], views[0]  # Remove batch dimension
+    
     def predict(self, image_path, top_n=5, use_tta=True, enhance_image=True):
         """
         Make advanced prediction on an image
@@ -219,7 +762,8 @@ class AdvancedPlantDiseasePredictor:
         Args:
             image_path (str): Path to the image file
             top_n (int): Number of top predictions to return
-            use_tta (bool): Whether to use test-time augmentation
+            use_tta (bool or str): Whether to use test-time augmentation, or 'adaptive'
+                to only add augmented views when the plain prediction is uncertain
             enhance_image (bool): Whether to enhance the image
             
         Returns:
@@ -230,86 +774,195 @@ class AdvancedPlantDiseasePredictor:
             processed_image = self.preprocess_image(image_path, enhance=enhance_image)
             
             # Make prediction (with or without TTA)
-            if use_tta and self.model_type == 'advanced':
-                predictions = self.test_time_augmentation(processed_image)
-                predictions = predictions[0]  # Remove batch dimension
-            else:
-                predictions = self.model.predict(processed_image, verbose=0)
-                predictions = predictions[0]  # Remove batch dimension
+            predictions, tta_views = self._predict_batch_probabilities(processed_image, use_tta)
             
-            # Get top N predictions
-            top_indices = np.argsort(predictions)[-top_n:][::-1]
-            
-            results = []
-            for idx in top_indices:
-                class_name = self.class_names[idx]
-                confidence = float(predictions[idx])
-                results.append((class_name, confidence))
-            
-            # Format comprehensive results
-            formatted_results = self.format_comprehensive_results(results, use_tta, enhance_image)
-            
-            return formatted_results
+            # Select the top N predictions and format comprehensive results
+            return self.format_batch_results(predictions, top_n, tta_views, enhance_image)[0]
             
         except Exception as e:
             print(f"❌ Error making prediction: {e}")
             raise
     
-    def predict_image_from_array(self, image_array, top_n=5, use_tta=True):
+    def preprocess_uint8(self, images, enhance=False):
+        """
+        Rescale, optionally enhance and resize raw uint8 images
+        
+        Args:
+            images (np.array): uint8 batch of shape (N, h, w, 3) at any resolution
+            enhance (bool): Whether to apply contrast/sharpness enhancement
+            
+        Returns:
+            np.array: float32 batch of shape (N, H, W, 3) at the model input size
+        """
+        if self._preprocess_fn is not None:
+            return self._preprocess_fn(tf.constant(images), tf.constant(bool(enhance))).numpy()
+        
+        # PIL fallback for engines that run without TensorFlow
+        batch = np.empty((len(images), self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32)
+        for i, image in enumerate(images):
+            img = Image.fromarray(image)
+            if enhance:
+                img = self.enhance_image(img)
+            img = img.resize((self.IMG_WIDTH, self.IMG_HEIGHT), Image.Resampling.LANCZOS)
+            np.multiply(np.asarray(img), 1.0 / 255.0, out=batch[i], casting='unsafe')
+        return batch
+    
+    def prepare_image_array(self, image_array, enhance=False):
+        """
+        Bring a web-upload image array to the model's (1, H, W, 3) float input
+        
+        Args:
+            image_array (np.array): Raw uint8 image at any size, or a float image in [0, 1],
+                with or without batch dimension
+            enhance (bool): Whether to enhance uint8 images during preprocessing
+            
+        Returns:
+            np.array: Preprocessed single-image batch
+        """
+        # Ensure proper shape
+        if len(image_array.shape) == 3:
+            image_array = np.expand_dims(image_array, axis=0)
+        
+        # Raw pixels go through the batched preprocessing path
+        if image_array.dtype == np.uint8:
+            return self.preprocess_uint8(image_array, enhance=enhance)
+        
+        image_array = image_array.astype(np.float32, copy=False)
+        
+        # Resize if needed
+        if image_array.shape[1] != self.IMG_HEIGHT or image_array.shape[2] != self.IMG_WIDTH:
+            # Convert to PIL Image for resizing
+            img = Image.fromarray((image_array[0] * 255).astype(np.uint8))
+            img = img.resize((self.IMG_WIDTH, self.IMG_HEIGHT), Image.Resampling.LANCZOS)
+            image_array = np.expand_dims(np.array(img).astype('float32') / 255.0, axis=0)
+        
+        return image_array
+    
+    def prepare_batch(self, image_arrays, enhance=False):
+        """
+        Preprocess several images into one model input batch
+        
+        Raw uint8 images of the same size go through the preprocessing graph in
+        a single call, so a coalesced batch costs one call per distinct upload
+        size instead of one per image.
+        
+        Args:
+            image_arrays (list or np.array): Images as accepted by prepare_image_array,
+                or an already stacked (N, H, W, 3) float32 batch at the model input size
+            enhance (bool): Whether to enhance uint8 images during preprocessing
+            
+        Returns:
+            np.array: float32 batch of shape (N, H, W, 3)
+        """
+        if (isinstance(image_arrays, np.ndarray) and image_arrays.ndim == 4
+                and image_arrays.dtype == np.float32
+                and image_arrays.shape[1:3] == (self.IMG_HEIGHT, self.IMG_WIDTH)):
+            return image_arrays
+        
+        images = [image if image.ndim == 4 else image[np.newaxis] for image in image_arrays]
+        offsets = np.cumsum([0] + [len(image) for image in images])
+        batch = np.empty((offsets[-1], self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32)
+        
+        same_size = {}
+        for i, image in enumerate(images):
+            if image.dtype == np.uint8:
+                same_size.setdefault(image.shape[1:], []).append(i)
+            else:
+                batch[offsets[i]:offsets[i + 1]] = self.prepare_image_array(image, enhance=enhance)
+        
+        for indices in same_size.values():
+            prepared = self.preprocess_uint8(np.concatenate([images[i] for i in indices]), enhance=enhance)
+            row = 0
+            for i in indices:
+                batch[offsets[i]:offsets[i + 1]] = prepared[row:row + len(images[i])]
+                row += len(images[i])
+        
+        return batch
+    
+    def predict_image_from_array(self, image_array, top_n=5, use_tta=True, enhance_image=False):
         """
         Make prediction on an image array (for web uploads)
         
         Args:
-            image_array (np.array): Image array
+            image_array (np.array): Raw uint8 image, or a float image in [0, 1]
             top_n (int): Number of top predictions to return
-            use_tta (bool): Whether to use test-time augmentation
+            use_tta (bool or str): Whether to use test-time augmentation, or 'adaptive'
+                to only add augmented views when the plain prediction is uncertain
+            enhance_image (bool): Whether to enhance a uint8 image during preprocessing
             
         Returns:
             dict: Comprehensive prediction results
         """
         try:
-            # Ensure proper shape and type
-            if len(image_array.shape) == 3:
-                image_array = np.expand_dims(image_array, axis=0)
+            image_array = self.prepare_image_array(image_array, enhance=enhance_image)
             
-            # Normalize if needed
-            if image_array.max() > 1.0:
-                image_array = image_array.astype('float32') / 255.0
+            # Make prediction
+            predictions, tta_views = self._predict_batch_probabilities(image_array, use_tta)
             
-            # Resize if needed
-            if image_array.shape[1] != self.IMG_HEIGHT or image_array.shape[2] != self.IMG_WIDTH:
-                # Convert to PIL Image for resizing
-                img = Image.fromarray((image_array[0] * 255).astype(np.uint8))
-                img = img.resize((self.IMG_WIDTH, self.IMG_HEIGHT), Image.Resampling.LANCZOS)
-                image_array = np.expand_dims(np.array(img).astype('float32') / 255.0, axis=0)
+            # Select the top N predictions and format comprehensive results
+            return self.format_batch_results(predictions, top_n, tta_views, enhance_image)[0]
             
-            # Make prediction
-            if use_tta and self.model_type == 'advanced':
-                predictions = self.test_time_augmentation(image_array)
-                predictions = predictions[0]
-            else:
-                predictions = self.model.predict(image_array, verbose=0)
-                predictions = predictions[0]
+        except Exception as e:
+            print(f"❌ Error making prediction: {e}")
+            raise
+    
+    def max_images_per_pass(self, use_tta=False, tta_views=TTA_VIEWS):
+        """
+        Number of images that fit in one forward pass under the memory budget
+        
+        Args:
+            use_tta (bool or str): TTA mode, which multiplies the views per image
+            tta_views (int): Views per image when TTA is used
             
-            # Get top N predictions
-            top_indices = np.argsort(predictions)[-top_n:][::-1]
+        Returns:
+            int: Chunk size for batch prediction (at least 1)
+        """
+        views = tta_views if use_tta and self.model_type == 'advanced' else 1
+        bytes_per_image = self.IMG_HEIGHT * self.IMG_WIDTH * 3 * 4 * views  # float32 input
+        return max(1, int(self.batch_memory_budget // bytes_per_image))
+    
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False, tta_views=TTA_VIEWS,
+                                  return_embeddings=False):
+        """
+        Make predictions for several image arrays with batched forward passes
+        
+        Args:
+            image_arrays (list or np.array): Image arrays as accepted by predict_image_from_array,
+                or an already stacked (N, H, W, 3) float32 batch at the model input size
+            top_n (int): Number of top predictions to return per image
+            use_tta (bool or str): Whether to use test-time augmentation, or 'adaptive'
+            enhance_image (bool): Whether uint8 images are enhanced during preprocessing;
+                reported as given for inputs that were already preprocessed
+            tta_views (int): Views per image when TTA is used (fewer is cheaper)
+            return_embeddings (bool): Also attach each image's L2-normalized embedding as
+                result['embedding'], computed in the same forward pass (TensorFlow engine only)
             
-            results = []
-            for idx in top_indices:
-                class_name = self.class_names[idx]
-                confidence = float(predictions[idx])
-                results.append((class_name, confidence))
+        Returns:
+            list: Comprehensive prediction results, one dict per image
+        """
+        try:
+            batch = self.prepare_batch(image_arrays, enhance=enhance_image)
             
-            # Format comprehensive results
-            formatted_results = self.format_comprehensive_results(results, use_tta, False)
+            # Split into chunks that fit the memory budget
+            chunk_size = self.max_images_per_pass(use_tta, tta_views)
+            formatted_results = []
+            for start in range(0, len(batch), chunk_size):
+                outputs = self._predict_batch_probabilities(
+                    batch[start:start + chunk_size], use_tta, tta_views, return_embeddings
+                )
+                chunk_results = self.format_batch_results(outputs[0], top_n, outputs[1], enhance_image)
+                if return_embeddings:
+                    for result, embedding in zip(chunk_results, outputs[2]):
+                        result['embedding'] = embedding
+                formatted_results.extend(chunk_results)
             
             return formatted_results
             
         except Exception as e:
-            print(f"❌ Error making prediction: {e}")
+            print(f"❌ Error making batch prediction: {e}")
             raise
     
-    def format_comprehensive_results(self, results, used_tta=False, enhanced_image=False):
+    def format_comprehensive_results(self, results, used_tta=False, enhanced_image=False, tta_views=1):
         """
         Format prediction results with comprehensive information
         
@@ -317,6 +970,7 @@ class AdvancedPlantDiseasePredictor:
             results (list): List of tuples (class_name, confidence)
             used_tta (bool): Whether TTA was used
             enhanced_image (bool): Whether image was enhanced
+            tta_views (int): Number of views evaluated by the model
             
         Returns:
             dict: Comprehensive formatted results
@@ -324,69 +978,311 @@ class AdvancedPlantDiseasePredictor:
         if not results:
             return {'error': 'No predictions available'}
         
-        top_prediction = results[0]
-        top_class = top_prediction[0]
-        top_confidence = top_prediction[1]
-        
-        # Parse class name
-        parts = top_class.split('___')
-        plant = parts[0] if len(parts) > 0 else 'Unknown'
-        disease = parts[1] if len(parts) > 1 else 'Unknown'
-        
-        # Get disease information
-        disease_data = self.disease_info.get(top_class, {
-            'severity': 'Unknown',
-            'description': 'Information not available',
-            'treatment': 'Consult agricultural expert',
-            'prevention': 'Follow general plant care guidelines'
-        })
-        
-        # Determine confidence level
-        confidence_level = 'High' if top_confidence > 0.8 else 'Medium' if top_confidence > 0.5 else 'Low'
-        
-        formatted_results = {
-            'top_prediction': top_class,
-            'confidence': top_confidence,
-            'confidence_percentage': f"{top_confidence * 100:.2f}%",
-            'confidence_level': confidence_level,
-            'plant': plant,
-            'disease': disease,
-            'is_healthy': 'healthy' in disease.lower(),
-            'model_type': self.model_type,
-            'used_tta': used_tta,
-            'enhanced_image': enhanced_image,
-            'timestamp': datetime.now().isoformat(),
-            'disease_info': disease_data,
-            'all_predictions': []
-        }
+        indices = np.array([[self.class_index[class_name] for class_name, _ in results]])
+        confidences = np.array([[confidence for _, confidence in results]], dtype=np.float64)
+        return self._format_top_k(indices, confidences, [tta_views], enhanced_image, [used_tta])[0]
+    
+    def format_batch_results(self, predictions, top_n, views_evaluated, enhanced_image=False):
+        """
+        Select the top N classes and format comprehensive results for a whole batch
         
-        # Add all predictions with detailed info
-        for class_name, confidence in results:
-            parts = class_name.split('___')
-            pred_plant = parts[0] if len(parts) > 0 else 'Unknown'
-            pred_disease = parts[1] if len(parts) > 1 else 'Unknown'
-            
-            pred_info = {
-                'plant': pred_plant,
-                'disease': pred_disease,
-                'full_name': class_name,
-                'confidence': confidence,
-                'confidence_percentage': f"{confidence * 100:.2f}%",
-                'is_healthy': 'healthy' in pred_disease.lower()
-            }
+        Args:
+            predictions (np.array): Class probabilities of shape (N, num_classes)
+            top_n (int): Number of top predictions to return per image; values below 1
+                still return the top prediction, so every result has the same fields
+            views_evaluated (list): Number of views evaluated by the model, per image
+            enhanced_image (bool): Whether the images were enhanced
+            
+        Returns:
+            list: Comprehensive formatted results, one dict per image
+        """
+        indices, confidences = top_k(predictions, max(1, top_n))
+        return self._format_top_k(indices, confidences, views_evaluated, enhanced_image)
+    
+    def _format_top_k(self, indices, confidences, views_evaluated, enhanced_image, used_tta=None):
+        """
+        Build result dicts from top-k class indices using the precomputed class table
+        
+        Args:
+            indices (np.array): Class indices of shape (N, k), highest confidence first
+            confidences (np.array): float64 confidences of shape (N, k)
+            views_evaluated (list): Number of views evaluated by the model, per image
+            enhanced_image (bool): Whether the images were enhanced
+            used_tta (list): Whether TTA was used, per image (default: more than one view)
             
-            formatted_results['all_predictions'].append(pred_info)
+        Returns:
+            list: Comprehensive formatted results, one dict per image
+        """
+        # Everything per class or per confidence is computed for the whole batch at once
+        class_names = np.array(self.class_names, dtype=object)[indices].tolist()
+        plants = self.class_plants[indices].tolist()
+        diseases = self.class_diseases[indices].tolist()
+        is_healthy = self.class_is_healthy[indices].tolist()
+        percentages = np.char.mod('%.2f%%', confidences * 100).tolist()
+        top_confidences = confidences[:, 0]
+        confidence_levels = np.where(
+            top_confidences > 0.8, 'High', np.where(top_confidences > 0.5, 'Medium', 'Low')
+        ).tolist()
+        top_indices = indices[:, 0].tolist()
+        confidences = confidences.tolist()
+        views_evaluated = [int(views) for views in views_evaluated]
+        if used_tta is None:
+            used_tta = [views > 1 for views in views_evaluated]
+        timestamp = datetime.now().isoformat()
+        
+        formatted_results = []
+        for row in range(len(class_names)):
+            formatted_results.append({
+                'top_prediction': class_names[row][0],
+                'confidence': confidences[row][0],
+                'confidence_percentage': percentages[row][0],
+                'confidence_level': confidence_levels[row],
+                'plant': plants[row][0],
+                'disease': diseases[row][0],
+                'is_healthy': is_healthy[row][0],
+                'model_type': self.model_type,
+                'used_tta': used_tta[row],
+                'tta_views': views_evaluated[row],
+                'enhanced_image': enhanced_image,
+                'timestamp': timestamp,
+                'disease_info': self.class_disease_info[top_indices[row]],
+                'all_predictions': [
+                    {
+                        'plant': plant,
+                        'disease': disease,
+                        'full_name': class_name,
+                        'confidence': confidence,
+                        'confidence_percentage': percentage,
+                        'is_healthy': healthy
+                    }
+                    for class_name, plant, disease, confidence, percentage, healthy in zip(
+                        class_names[row], plants[row], diseases[row], confidences[row], percentages[row], is_healthy[row]
+                    )
+                ]
+            })
         
         return formatted_results
     
     def get_model_info(self):
         """Get information about the loaded model"""
-        return {
+        info = {
             'model_type': self.model_type,
-            'model_path': self.model_path if self.model_type == 'advanced' else self.fallback_model,
+            'model_path': self.loaded_model_path,
+            'model_version': self.model_version,
             'input_size': f"{self.IMG_WIDTH}x{self.IMG_HEIGHT}",
             'num_classes': len(self.class_names),
-            'supports_tta': self.model_type == 'advanced'
+            'supports_tta': self.model_type == 'advanced',
+            'engine': self.engine,
+            'quantization': self.quantization,
+            'compiled': self._infer_fn is not None,
+            'jit_compile': self.jit_compile,
+            'warm': self.is_warm,
+            'load_timings': dict(self.load_timings)
+        }
+        if self.engine_backend is not None:
+            info.update(self.engine_backend.get_info())
+        return info
+
+class CascadePlantDiseasePredictor:
+    def __init__(self, basic_model_path='best_model.h5', advanced_model_path='best_model_advanced.h5',
+                 class_names_path='class_names.txt', escalation_threshold=0.85, **predictor_kwargs):
+        """
+        Two-stage predictor: answer from the cheap 224px model when it is confident
+        and escalate to the 300px advanced model (optionally with TTA) otherwise
+        
+        Args:
+            basic_model_path (str): Path to the basic (224x224) model
+            advanced_model_path (str): Path to the advanced (300x300) model
+            class_names_path (str): Path to the class names file shared by both models
+            escalation_threshold (float): Basic-model confidence below which the
+                advanced model is used
+            **predictor_kwargs: Passed to both AdvancedPlantDiseasePredictor stages
+        """
+        self.escalation_threshold = escalation_threshold
+        self.basic = AdvancedPlantDiseasePredictor(
+            model_path=basic_model_path, class_names_path=class_names_path,
+            fallback_model=basic_model_path, **predictor_kwargs
+        )
+        self.advanced = AdvancedPlantDiseasePredictor(
+            model_path=advanced_model_path, class_names_path=class_names_path,
+            fallback_model=advanced_model_path, **predictor_kwargs
+        )
+        
+        if self.basic.class_names != self.advanced.class_names:
+            raise ValueError("Basic and advanced models must share the same class names")
+        if self.advanced.model_type != 'advanced':
+            print(f"⚠️ Escalation model {advanced_model_path} is not a 300x300 model")
+        
+        # Read-only attributes shared with the single-model predictor
+        self.model_type = 'cascade'
+        self.class_names = self.basic.class_names
+        self.disease_info = self.basic.disease_info
+        self.engine = self.advanced.engine
+        self.IMG_HEIGHT = self.advanced.IMG_HEIGHT
+        self.IMG_WIDTH = self.advanced.IMG_WIDTH
+        self.model_version = self.advanced.model_version
+        
+        self._stats_lock = threading.Lock()
+        self.stage_counts = {'basic': 0, 'advanced': 0}
+        
+        print(f"✅ Cascade ready: escalating below {escalation_threshold:.0%} basic confidence")
+    
+    def has_model(self):
+        """Check whether both stages are loaded"""
+        return self.basic.has_model() and self.advanced.has_model()
+    
+    def warmup(self):
+        """Warm up both stages"""
+        self.basic.warmup()
+        self.advanced.warmup()
+    
+    def _count(self, stage, count=1):
+        """Record how many predictions each stage answered"""
+        with self._stats_lock:
+            self.stage_counts[stage] += count
+    
+    def _basic_results(self, predictions, top_n, enhanced_image=False):
+        """Format basic-stage predictions for a batch"""
+        results = self.basic.format_batch_results(predictions, top_n, [1] * len(predictions), enhanced_image)
+        for result in results:
+            result['cascade_stage'] = 'basic'
+        return results
+    
+    def predict(self, image_path, top_n=5, use_tta=True, enhance_image=True):
+        """
+        Make a cascaded prediction on an image file
+        
+        Args:
+            image_path (str): Path to the image file
+            top_n (int): Number of top predictions to return
+            use_tta (bool or str): TTA mode for the advanced stage
+            enhance_image (bool): Whether to enhance the image
+            
+        Returns:
+            dict: Comprehensive prediction results with the answering 'cascade_stage'
+        """
+        processed_image = self.basic.preprocess_image(image_path, enhance=enhance_image)
+        prediction, _ = self.basic._predict_probabilities(processed_image, False)
+        
+        if prediction.max() >= self.escalation_threshold:
+            self._count('basic')
+            return self._basic_results(prediction[np.newaxis], top_n, enhance_image)[0]
+        
+        self._count('advanced')
+        results = self.advanced.predict(image_path, top_n=top_n, use_tta=use_tta, enhance_image=enhance_image)
+        results['cascade_stage'] = 'advanced'
+        results['basic_confidence'] = float(prediction.max())
+        return results
+    
+    def supports_embeddings(self):
+        """Embeddings come from the basic stage, which runs on every image"""
+        return self.basic.supports_embeddings()
+    
+    def get_embeddings(self, image_array):
+        """Extract embeddings with the basic stage's model"""
+        return self.basic.get_embeddings(image_array)
+    
+    def prepare_image_array(self, image_array, enhance=False):
+        """
+        Keep raw uint8 images as they are, so each stage preprocesses the original pixels
+        
+        Resizing to the advanced stage's input here would make the basic stage
+        resample an already resampled (and requantized) image. Enhancement is
+        applied by each stage at its own input size during prediction.
+        
+        Args:
+            image_array (np.array): Raw uint8 image, or a float image in [0, 1]
+            enhance (bool): Only used for float images, which are prepared for the advanced stage
+            
+        Returns:
+            np.array: Single-image batch; uint8 input is returned unchanged
+        """
+        if image_array.dtype == np.uint8:
+            return image_array[np.newaxis] if image_array.ndim == 3 else image_array
+        return self.advanced.prepare_image_array(image_array, enhance=enhance)
+    
+    def predict_image_from_array(self, image_array, top_n=5, use_tta=True, enhance_image=False):
+        """Make a cascaded prediction on an image array (for web uploads)"""
+        return self.predict_batch_from_arrays([image_array], top_n=top_n, use_tta=use_tta, enhance_image=enhance_image)[0]
+    
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False, tta_views=TTA_VIEWS,
+                                  escalate=True, return_embeddings=False):
+        """
+        Make cascaded predictions for several image arrays
+        
+        The whole batch runs through the basic model; only the low-confidence
+        images are batched again through the advanced model. Both stages
+        preprocess (and enhance) the original uint8 images at their own input size.
+        
+        Args:
+            tta_views (int): Views per image when the advanced stage uses TTA
+            escalate (bool): Whether low-confidence images go to the advanced stage;
+                False answers everything from the basic model (e.g. under load)
+            return_embeddings (bool): Also attach each image's basic-stage embedding as result['embedding']
+        
+        Returns:
+            list: Comprehensive prediction results, one dict per image
+        """
+        batch = self.basic.prepare_batch(image_arrays, enhance=enhance_image)
+        
+        chunk_size = self.basic.max_images_per_pass(False)
+        outputs = [
+            self.basic._predict_batch_probabilities(batch[start:start + chunk_size], False,
+                                                    return_embeddings=return_embeddings)
+            for start in range(0, len(batch), chunk_size)
+        ]
+        predictions = np.concatenate([output[0] for output in outputs])
+        confidences = predictions.max(axis=1)
+        threshold = self.escalation_threshold if escalate else 0.0
+        to_escalate = np.flatnonzero(confidences < threshold)
+        
+        results = [None] * len(batch)
+        answered = np.flatnonzero(confidences >= threshold)
+        for i, result in zip(answered, self._basic_results(predictions[answered], top_n, enhance_image)):
+            results[i] = result
+        
+        if len(to_escalate):
+            escalated = self.advanced.predict_batch_from_arrays(
+                [image_arrays[i] for i in to_escalate], top_n=top_n, use_tta=use_tta, enhance_image=enhance_image,
+                tta_views=tta_views
+            )
+            for i, result in zip(to_escalate, escalated):
+                result['cascade_stage'] = 'advanced'
+                result['basic_confidence'] = float(confidences[i])
+                results[i] = result
+        
+        if return_embeddings:
+            for result, embedding in zip(results, np.concatenate([output[2] for output in outputs])):
+                result['embedding'] = embedding
+        
+        self._count('basic', len(batch) - len(to_escalate))
+        self._count('advanced', len(to_escalate))
+        return results
+    
+    def get_model_info(self):
+        """Get information about both stages of the cascade"""
+        with self._stats_lock:
+            stage_counts = dict(self.stage_counts)
+        
+        advanced_info = self.advanced.get_model_info()
+        return {
+            'model_type': self.model_type,
+            'model_path': advanced_info['model_path'],
+            'model_version': self.model_version,
+            'input_size': advanced_info['input_size'],
+            'num_classes': len(self.class_names),
+            'supports_tta': advanced_info['supports_tta'],
+            'engine': self.engine,
+            'escalation_threshold': self.escalation_threshold,
+            'stage_counts': stage_counts,
+            'load_timings': {
+                'basic': dict(self.basic.load_timings),
+                'advanced': dict(self.advanced.load_timings)
+            },
+            'stages': {
+                'basic': self.basic.get_model_info(),
+                'advanced': advanced_info
+            }
         }
 
 # Test function for the advanced predictor
@@ -0,0 +1,223 @@
+"""
+Content-addressed prediction cache for plant disease inference
+In-memory LRU tier, optional SQLite tier that survives restarts, and
+coalescing of identical in-flight requests
+"""
+
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+def hash_stream(stream, chunk_size=1024 * 1024):
+    """
+    Hash an upload stream with SHA-256 and rewind it
+
+    Args:
+        stream: Seekable binary stream
+        chunk_size (int): Bytes read per step
+
+    Returns:
+        str: Hex digest of the stream contents
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600, sqlite_path=None, max_disk_entries=100000):
+        """
+        Initialize the prediction cache
+
+        Args:
+            max_entries (int): Maximum results kept in the in-memory LRU tier
+            ttl_seconds (float): How long a cached result stays valid
+            sqlite_path (str): Path of the on-disk SQLite tier (None disables it)
+            max_disk_entries (int): Maximum results kept in the SQLite tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()  # key -> (stored_at, result)
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._puts_since_prune = 0
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, result TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed_at)')
+            self._db.commit()
+
+        # Metrics
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'memory_evictions': 0,
+            'expired': 0
+        }
+
+    @staticmethod
+    def make_key(content_hash, **options):
+        """Build a cache key from the image content hash and the prediction options"""
+        options_json = json.dumps(options, sort_keys=True, default=str)
+        return hashlib.sha256(f"{content_hash}:{options_json}".encode()).hexdigest()
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        """
+        Look up a cached result
+
+        Returns:
+            tuple: (result dict or None, 'memory' / 'disk' / None)
+        """
+        result, source = self._lookup(key)
+        if result is None:
+            self._count('misses')
+        return result, source
+
+    def _lookup(self, key):
+        """Look up a result in the memory tier, then the SQLite tier, without counting a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return copy.deepcopy(result), 'memory'
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT result, stored_at FROM predictions WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._db.execute('UPDATE predictions SET accessed_at = ? WHERE key = ?', (now, key))
+                    self._db.commit()
+                    result = json.loads(row[0])
+                    self._store_memory(key, result, row[1])
+                    self._count('disk_hits')
+                    return copy.deepcopy(result), 'disk'
+
+        return None, None
+
+    def _store_memory(self, key, result, stored_at):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        with self._lock:
+            self._memory[key] = (stored_at, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats['memory_evictions'] += 1
+
+    def put(self, key, result):
+        """Store a result in every tier"""
+        now = time.time()
+        result = copy.deepcopy(result)
+        self._store_memory(key, result, now)
+
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO predictions (key, result, stored_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(result, default=str), now, now)
+                )
+                self._db.commit()
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= 100:
+                    self._prune_disk(now)
+
+    def _prune_disk(self, now):
+        """Drop expired rows and trim the SQLite tier to max_disk_entries (db lock held)"""
+        self._puts_since_prune = 0
+        self._db.execute('DELETE FROM predictions WHERE stored_at < ?', (now - self.ttl,))
+        self._db.execute(
+            'DELETE FROM predictions WHERE key IN ('
+            'SELECT key FROM predictions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_entries,)
+        )
+        self._db.commit()
+
+    def get_or_compute(self, key, compute_fn):
+        """
+        Return a cached result, or compute it once even if many callers ask at the same time
+
+        Args:
+            key (str): Cache key from make_key
+            compute_fn (callable): Produces the result dict on a miss
+
+        Returns:
+            tuple: (result dict, 'memory' / 'disk' / 'coalesced' / 'computed')
+        """
+        result, source = self.get(key)
+        if result is not None:
+            return result, source
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._stats['coalesced'] += 1
+
+        if not owner:
+            return copy.deepcopy(future.result()), 'coalesced'
+
+        try:
+            # A leader that finished after the lookup above has already stored its result
+            # (in this process, or in the SQLite tier by another one)
+            result, source = self._lookup(key)
+            if result is not None:
+                future.set_result(copy.deepcopy(result))
+                return result, source
+
+            result = compute_fn()
+            self.put(key, result)
+            future.set_result(copy.deepcopy(result))
+            return result, 'computed'
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get_stats(self):
+        """Get hit-rate and size metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['in_flight'] = len(self._in_flight)
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+
+        if self._db is not None:
+            with self._db_lock:
+                stats['disk_entries'] = self._db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        return stats
@@ -0,0 +1,267 @@
+"""
+Background model loading with readiness states for the disease service
+Keeps TensorFlow import, model loading and warmup off the request and
+worker-boot paths, puts a circuit breaker with exponential backoff
+around failed loads, and hot-swaps a new model in without a restart
+"""
+
+import logging
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle states
+IDLE = 'idle'
+LOADING = 'loading'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+def load_timings(predictor, start, loaded_at, warmed_at):
+    """Overall load and warmup times, with the predictor's own per-phase breakdown"""
+    return {
+        'load_seconds': round(loaded_at - start, 3),
+        'warmup_seconds': round(warmed_at - loaded_at, 3),
+        'phases': predictor.get_model_info().get('load_timings')
+    }
+
+class PredictorManager:
+    def __init__(self, factory, version=None, retry_backoff=5.0, max_retry_backoff=300.0, retire_after=60.0):
+        """
+        Initialize the predictor manager
+
+        Args:
+            factory (callable): Builds an unwarmed predictor (constructed with warmup=False)
+            version (str): Version label of the model the factory builds
+            retry_backoff (float): Seconds the circuit stays open after the first failed load
+            max_retry_backoff (float): Cap on the backoff, which doubles with each consecutive failure
+            retire_after (float): Seconds a swapped-out predictor keeps serving the requests
+                that already hold it before it is closed (predictors with a close method only)
+        """
+        self.factory = factory
+        self.version = version
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.retire_after = retire_after
+        self.predictor = None
+        self.state = IDLE
+        self.error = None
+        self.timings = {}
+        self.state_since = time.time()
+
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+        # Circuit breaker
+        self.consecutive_failures = 0
+        self.next_retry_at = 0.0
+
+        # Hot swap
+        self._swap_thread = None
+        self.swap_status = {'state': IDLE, 'version': None, 'error': None}
+
+        # Metrics
+        self._stats = {
+            'load_attempts': 0,
+            'load_failures': 0,
+            'rejected_retries': 0,
+            'swaps': 0,
+            'swap_failures': 0
+        }
+
+    def _set_state(self, state):
+        self.state = state
+        self.state_since = time.time()
+        logger.info(f"Predictor state: {state}")
+
+    def start(self, force=False):
+        """
+        Start loading the model in a background thread
+
+        Only one load runs at a time. After a failure the circuit stays open
+        until the backoff expires, so callers can ask for a retry on every
+        request without each one paying for a model load.
+
+        Args:
+            force (bool): Retry even if the circuit is open
+
+        Returns:
+            bool: True if a load was started, False if one is already running, done or backing off
+        """
+        with self._lock:
+            if self.state in (LOADING, WARMING, READY):
+                return False
+            if self.state == FAILED and not force and time.monotonic() < self.next_retry_at:
+                self._stats['rejected_retries'] += 1
+                return False
+            self._stats['load_attempts'] += 1
+            self._set_state(LOADING)
+            self._thread = threading.Thread(target=self._load, name='predictor-loader', daemon=True)
+            self._thread.start()
+            return True
+
+    def _load(self):
+        """Loader thread: build the predictor, warm it up, then publish it"""
+        try:
+            start = time.perf_counter()
+            predictor = self.factory()
+            loaded_at = time.perf_counter()
+
+            with self._lock:
+                self._set_state(WARMING)
+            predictor.warmup()
+            warmed_at = time.perf_counter()
+
+            with self._lock:
+                self.timings = load_timings(predictor, start, loaded_at, warmed_at)
+                self.predictor = predictor
+                self.error = None
+                self.consecutive_failures = 0
+                self._set_state(READY)
+            self._ready.set()
+            logger.info(f"✅ Predictor ready (load {self.timings['load_seconds']}s, warmup {self.timings['warmup_seconds']}s)")
+            logger.info(f"⏱️ Load phases: {self.timings['phases']}")
+
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize predictor: {e}")
+            logger.error(traceback.format_exc())
+            with self._lock:
+                self.error = str(e)
+                self.consecutive_failures += 1
+                self._stats['load_failures'] += 1
+                self.next_retry_at = time.monotonic() + self.retry_after()
+                self._set_state(FAILED)
+            logger.info(f"Circuit open: next load attempt in {self.retry_after():.0f}s")
+
+    def swap(self, factory, version):
+        """
+        Load and warm a replacement predictor in the background, then swap it in
+
+        The serving predictor keeps answering until the replacement is warm
+        and its class list has been checked against it. The swap is a single
+        reference assignment, so requests that already hold the old predictor
+        finish on it. With no predictor serving, the replacement just becomes
+        the next load.
+
+        Args:
+            factory (callable): Builds the unwarmed replacement predictor
+            version (str): Version label of the replacement
+
+        Returns:
+            bool: True if the swap (or load) was started, False if a load or swap is already running
+        """
+        with self._lock:
+            if self.state in (LOADING, WARMING) or self.swap_status['state'] in (LOADING, WARMING):
+                return False
+            if self.state != READY:
+                self.factory = factory
+                self.version = version
+                load_instead = True
+            else:
+                load_instead = False
+                self.swap_status = {'state': LOADING, 'version': version, 'error': None, 'started_at': time.time()}
+                self._swap_thread = threading.Thread(
+                    target=self._load_replacement, args=(factory, version), name='predictor-swap', daemon=True
+                )
+                self._swap_thread.start()
+
+        if load_instead:
+            return self.start(force=True)
+        return True
+
+    def _load_replacement(self, factory, version):
+        """Swap thread: build and warm the replacement, check it, then publish it"""
+        predictor = None
+        try:
+            start = time.perf_counter()
+            predictor = factory()
+            loaded_at = time.perf_counter()
+
+            with self._lock:
+                self.swap_status['state'] = WARMING
+            predictor.warmup()
+            warmed_at = time.perf_counter()
+
+            if predictor.class_names != self.predictor.class_names:
+                raise ValueError(f"Class names of model {version} don't match the serving model")
+
+            with self._lock:
+                previous = self.version
+                retired = self.predictor
+                self.predictor = predictor
+                self.factory = factory
+                self.version = version
+                self.timings = load_timings(predictor, start, loaded_at, warmed_at)
+                self.swap_status.update(state=READY, previous_version=previous, finished_at=time.time())
+                self._stats['swaps'] += 1
+            logger.info(f"🔄 Swapped model {previous} -> {version}")
+            self._retire(retired, delay=self.retire_after)
+
+        except Exception as e:
+            logger.error(f"❌ Model swap to {version} failed: {e}")
+            logger.error(traceback.format_exc())
+            with self._lock:
+                self.swap_status.update(state=FAILED, error=str(e), finished_at=time.time())
+                self._stats['swap_failures'] += 1
+            self._retire(predictor)
+
+    def _retire(self, predictor, delay=0.0):
+        """
+        Release a predictor that no longer serves
+
+        Remote predictors hold shared-memory rings and worker connections, so
+        they are closed; requests that already hold the predictor get delay
+        seconds to finish first. In-process predictors are left to the
+        garbage collector.
+        """
+        close = getattr(predictor, 'close', None)
+        if close is None:
+            return
+        if delay <= 0:
+            close()
+            return
+        timer = threading.Timer(delay, close)
+        timer.daemon = True
+        timer.start()
+
+    def retry_after(self):
+        """Seconds until the next load attempt is allowed (the current backoff while loading)"""
+        if self.state == FAILED:
+            return max(0.0, self.next_retry_at - time.monotonic())
+        if self.consecutive_failures == 0:
+            return 0.0
+        return min(self.max_retry_backoff, self.retry_backoff * 2 ** (self.consecutive_failures - 1))
+
+    def is_ready(self):
+        """Check whether a warmed predictor is serving"""
+        return self.state == READY
+
+    def wait_ready(self, timeout=None):
+        """Block until the predictor is ready (or the timeout passes)"""
+        return self._ready.wait(timeout)
+
+    def circuit_state(self):
+        """'closed' when loads are allowed, 'open' while backing off, 'half_open' once a retry is due"""
+        if self.state != FAILED:
+            return 'closed'
+        return 'open' if time.monotonic() < self.next_retry_at else 'half_open'
+
+    def get_status(self):
+        """Get the lifecycle state, circuit breaker and load metrics for health checks"""
+        with self._lock:
+            status = {
+                'state': self.state,
+                'version': self.version,
+                'state_since': self.state_since,
+                'error': self.error,
+                'timings': dict(self.timings),
+                'circuit': self.circuit_state(),
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in_seconds': round(self.retry_after(), 1) if self.state == FAILED else 0.0,
+                'swap': dict(self.swap_status)
+            }
+            status.update(self._stats)
+            return status
@@ -0,0 +1,149 @@
+"""
+Pool of independent predictor replicas for concurrent request threads
+Each replica owns its model and inference functions; read-only assets
+(class names, disease info) are shared so extra replicas only cost the
+model weights.
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+def default_pool_size(engine='tensorflow', threads_per_replica=None):
+    """
+    Default number of replicas for an inference engine
+
+    TensorFlow already spreads one forward pass over every core and each Keras
+    replica holds a full copy of the weights, so it defaults to a single
+    replica; more are opt-in. TFLite and ONNX Runtime replicas get one group
+    of threads_per_replica cores each, at most 4.
+
+    Args:
+        engine (str): 'tensorflow', 'tflite' or 'onnx'
+        threads_per_replica (int): Inference threads per replica (None means 4)
+
+    Returns:
+        int: Number of replicas
+    """
+    if engine == 'tensorflow':
+        return 1
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    return max(1, min(4, cores // (threads_per_replica or 4)))
+
+class PredictorPool:
+    def __init__(self, factory, size=None, checkout_timeout=30.0):
+        """
+        Initialize the predictor pool
+
+        Args:
+            factory (callable): Builds one predictor replica
+            size (int): Number of replicas (None sizes the pool to the replicas' engine and the host)
+            checkout_timeout (float): Seconds to wait for a free replica before failing
+        """
+        self.checkout_timeout = checkout_timeout
+
+        primary = factory()
+        self.size = size or default_pool_size(primary.engine)
+        self.replicas = [primary] + [factory() for _ in range(self.size - 1)]
+        for replica in self.replicas[1:]:
+            if replica.class_names != primary.class_names:
+                raise ValueError("All replicas must share the same class names")
+            replica.class_names = primary.class_names
+            replica.disease_info = primary.disease_info
+
+        # Read-only attributes shared with the single predictor
+        self.model_type = primary.model_type
+        self.class_names = primary.class_names
+        self.disease_info = primary.disease_info
+        self.engine = primary.engine
+        self.model_version = primary.model_version
+        self.IMG_HEIGHT = primary.IMG_HEIGHT
+        self.IMG_WIDTH = primary.IMG_WIDTH
+
+        self._available = queue.Queue()
+        for replica in self.replicas:
+            self._available.put(replica)
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+
+    @contextmanager
+    def checkout(self):
+        """Borrow a replica for the duration of the with-block"""
+        start = time.monotonic()
+        try:
+            replica = self._available.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise TimeoutError(f"No predictor replica free after {self.checkout_timeout}s")
+
+        waited = time.monotonic() - start
+        with self._stats_lock:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            yield replica
+        finally:
+            self._available.put(replica)
+
+    def warmup(self):
+        """Warm up every replica"""
+        for replica in self.replicas:
+            replica.warmup()
+
+    def has_model(self):
+        """Check whether every replica has its model loaded"""
+        return all(replica.has_model() for replica in self.replicas)
+
+    def supports_embeddings(self):
+        return self.replicas[0].supports_embeddings()
+
+    def get_embeddings(self, image_array):
+        with self.checkout() as replica:
+            return replica.get_embeddings(image_array)
+
+    def prepare_image_array(self, image_array, enhance=False):
+        """Preprocessing runs in decode threads and holds no per-request state, so it skips checkout"""
+        return self.replicas[0].prepare_image_array(image_array, enhance=enhance)
+
+    def predict(self, image_path, top_n=5, use_tta=True, enhance_image=True):
+        with self.checkout() as replica:
+            return replica.predict(image_path, top_n=top_n, use_tta=use_tta, enhance_image=enhance_image)
+
+    def predict_image_from_array(self, image_array, **options):
+        with self.checkout() as replica:
+            return replica.predict_image_from_array(image_array, **options)
+
+    def predict_batch_from_arrays(self, image_arrays, **options):
+        with self.checkout() as replica:
+            return replica.predict_batch_from_arrays(image_arrays, **options)
+
+    def get_stats(self):
+        """Get replica availability and checkout wait metrics"""
+        with self._stats_lock:
+            return {
+                'replicas': self.size,
+                'available': self._available.qsize(),
+                'checkouts': self._checkouts,
+                'mean_wait_ms': self._total_wait / self._checkouts * 1000.0 if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000.0,
+                'timeouts': self._timeouts
+            }
+
+    def get_model_info(self):
+        """Get the replicas' model information with pool metrics"""
+        info = self.replicas[0].get_model_info()
+        info['pool'] = self.get_stats()
+        return info
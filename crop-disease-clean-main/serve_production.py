@@ -0,0 +1,191 @@
+"""
+Pre-fork production server for the KrishiVannai plant disease app
+The master process converts the model once and reads the converted model
+into memory, then hands over to gunicorn, which forks worker processes that
+share those pages copy-on-write. Each worker sizes TensorFlow's thread pools
+(and optionally pins itself to CPU cores) in gunicorn's post_fork hook so N
+workers together use the host's cores instead of oversubscribing them.
+gunicorn also drains in-flight requests on SIGTERM, replaces workers that die
+and rolls workers over on SIGHUP.
+
+The master never loads the model itself: a TensorFlow runtime started before
+fork is not usable in the children, so each worker loads the model after it
+is forked. With INFERENCE_ENGINE=tflite the interpreter builds on the
+preloaded flatbuffer, so the model file is shared by all workers while each
+interpreter unpacks its own weights. The Keras (tensorflow) and ONNX engines
+copy weights into their own runtime; only the conversion is done once.
+
+Usage:
+    INFERENCE_ENGINE=tflite python serve_production.py --workers 4 --port 5000
+"""
+
+import argparse
+import os
+import sys
+import traceback
+
+def available_cores():
+    """CPU cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def worker_cores(cores, worker_index, num_workers):
+    """Contiguous slice of cores for one worker"""
+    per_worker = max(1, len(cores) // num_workers)
+    start = (worker_index * per_worker) % len(cores)
+    return cores[start:start + per_worker]
+
+def serving_model_paths():
+    """Model files the app will load, following the same configuration as app_advanced"""
+    from model_registry import ModelRegistry, DEFAULT_REGISTRY_PATH
+
+    active = ModelRegistry(os.environ.get('MODEL_REGISTRY', DEFAULT_REGISTRY_PATH)).active()
+    paths = [active['model_path'] if active else 'best_model.h5']
+    if os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true':
+        paths.append(os.environ.get('CASCADE_ADVANCED_MODEL', 'best_model_advanced.h5'))
+    from predict_advanced import model_available
+
+    engine = os.environ.get('INFERENCE_ENGINE', 'tensorflow')
+    quantization = os.environ.get('TFLITE_QUANTIZATION', 'float16')
+    return [path for path in paths if model_available(path, engine, quantization)]
+
+def prepare_models_in_child(model_paths, engine, quantization):
+    """
+    Convert the models for the configured engine in a short-lived child process
+
+    The conversion needs TensorFlow, which must not be initialized in the
+    master before it forks workers; the child caches the converted files
+    (a TFLite or ONNX model, or the Keras artifact in the model artifact
+    cache) and exits, so workers start from the cache instead of each
+    converting the model.
+    """
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            from predict_advanced import AdvancedPlantDiseasePredictor
+            from model_artifacts import DEFAULT_CACHE_DIR
+            for path in model_paths:
+                AdvancedPlantDiseasePredictor(
+                    model_path=path, fallback_model=path, class_names_path='class_names.txt',
+                    engine=engine, quantization=quantization, warmup=False,
+                    artifact_cache_dir=os.environ.get('MODEL_ARTIFACT_CACHE', DEFAULT_CACHE_DIR) or None
+                )
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        os._exit(exit_code)
+
+    _, status = os.waitpid(pid, 0)
+    return os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+def preload_models(model_paths, engine, quantization):
+    """Read the converted models into the master's memory so forked workers share them"""
+    if engine != 'tflite':
+        return
+    from inference_engines import preload_model_file, tflite_model_path
+
+    for path in model_paths:
+        tflite_path = tflite_model_path(path, quantization)
+        if os.path.exists(tflite_path):
+            size = preload_model_file(tflite_path)
+            print(f"📦 Preloaded {tflite_path} ({size / (1024 * 1024):.1f}MB, shared by all workers)")
+
+def assign_core_slot(server, worker):
+    """gunicorn pre_fork hook: give the new worker the lowest core slot no live worker holds"""
+    taken = {getattr(other, 'core_slot', None) for other in server.WORKERS.values()}
+    worker.core_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+def make_post_fork(args, cores, num_workers):
+    """gunicorn post_fork hook: tune threading before the worker imports the app"""
+    def post_fork(server, worker):
+        cores_for_worker = worker_cores(cores, worker.core_slot, num_workers)
+        if args.pin_cores and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores_for_worker)
+
+        # Thread pools are sized before TensorFlow or the app (and its loader thread) start
+        from predict_advanced import configure_tensorflow_threads
+        threads = args.intra_op_threads or len(cores_for_worker)
+        configure_tensorflow_threads(intra_op=threads, inter_op=args.inter_op_threads)
+        os.environ.setdefault('INFERENCE_THREADS', str(threads))
+        os.environ.setdefault('PREDICTOR_REPLICAS', '1')  # Workers are the unit of parallelism here
+        print(f"👷 Worker {worker.core_slot} (pid {worker.pid}) serving on cores {cores_for_worker}")
+
+    return post_fork
+
+def run_gunicorn(options):
+    """Serve app_advanced under gunicorn with the given settings"""
+    from gunicorn.app.base import BaseApplication
+
+    class PlantDiseaseServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported in each worker: the app starts its model loader thread on import
+            from app_advanced import app
+            return app
+
+    PlantDiseaseServer().run()
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-fork production server for the plant disease app')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 0)),
+                        help='Worker processes (default: one per 4 cores)')
+    parser.add_argument('--intra-op-threads', type=int, default=None,
+                        help="Per-worker intra-op threads (default: the worker's share of the cores)")
+    parser.add_argument('--inter-op-threads', type=int, default=2, help='Per-worker inter-op threads')
+    parser.add_argument('--pin-cores', action='store_true', help="Pin each worker to its share of the cores")
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--timeout', type=int, default=120,
+                        help='Seconds a worker may miss its heartbeat before gunicorn restarts it')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds in-flight requests get to finish on SIGTERM or SIGHUP')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("❌ Pre-fork serving needs os.fork (Linux/macOS); use app_advanced.py on this platform")
+        return 1
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("❌ Pre-fork serving needs gunicorn: pip install gunicorn")
+        return 1
+
+    cores = available_cores()
+    num_workers = args.workers or max(1, len(cores) // 4)
+    threads_per_worker = args.intra_op_threads or max(1, len(cores) // num_workers)
+
+    # Keep NumPy's BLAS pools to the worker's share before anything imports NumPy
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, str(threads_per_worker))
+
+    engine = os.environ.get('INFERENCE_ENGINE', 'tensorflow')
+    quantization = os.environ.get('TFLITE_QUANTIZATION', 'float16')
+    model_paths = serving_model_paths()
+
+    print(f"🚀 Starting {num_workers} workers on {len(cores)} cores ({threads_per_worker} threads each, engine {engine})")
+    if model_paths:
+        if not prepare_models_in_child(model_paths, engine, quantization):
+            print("⚠️ Model conversion failed - workers will report the error on /health/ready")
+    preload_models(model_paths, engine, quantization)
+
+    run_gunicorn({
+        'bind': f"{args.host}:{args.port}",
+        'workers': num_workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'preload_app': False,
+        'pre_fork': assign_core_slot,
+        'post_fork': make_post_fork(args, cores, num_workers),
+    })
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
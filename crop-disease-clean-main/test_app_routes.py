@@ -0,0 +1,305 @@
+"""
+Tests for the Flask routes' request validation and error paths
+The serving predictor is replaced by a small fake, so no model is loaded.
+"""
+
+import gzip
+import io
+import json
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+import app_advanced
+from embedding_index import EmbeddingIndex
+from predictor_manager import PredictorManager
+
+class FakePredictor:
+    """Answers every image with the same ranked classes"""
+
+    model_type = 'advanced'
+    engine = 'tensorflow'
+    IMG_HEIGHT = IMG_WIDTH = 32
+    CLASSES = ['Tomato___Late_blight', 'Tomato___Early_blight', 'Tomato___healthy']
+
+    def __init__(self):
+        self.batches = []
+
+    def get_model_info(self):
+        return {'model_type': self.model_type, 'model_path': 'fake.h5', 'model_version': 'test', 'engine': self.engine,
+                'load_timings': {}}
+
+    def warmup(self):
+        pass
+
+    def supports_embeddings(self):
+        return False
+
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False, **options):
+        self.batches.append(list(image_arrays))
+        return [{
+            'top_prediction': self.CLASSES[0],
+            'confidence': 0.9,
+            'tta_views': 1,
+            'all_predictions': [{'full_name': name} for name in self.CLASSES[:top_n]]
+        } for _ in image_arrays]
+
+class EmbeddingPredictor(FakePredictor):
+    """Also returns embeddings, all of them identical, and records the options of each pass"""
+
+    def __init__(self):
+        super().__init__()
+        self.passes = []
+
+    def supports_embeddings(self):
+        return True
+
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False,
+                                  return_embeddings=False, **options):
+        self.passes.append({'use_tta': use_tta, 'return_embeddings': return_embeddings})
+        results = super().predict_batch_from_arrays(image_arrays, top_n, use_tta, enhance_image)
+        for result in results:
+            result['tta_views'] = 5 if use_tta else 1
+            if return_embeddings:
+                result['embedding'] = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+        return results
+
+@pytest.fixture
+def predictor(monkeypatch):
+    predictor = FakePredictor()
+    monkeypatch.setattr(app_advanced, 'get_predictor', lambda: predictor)
+    return predictor
+
+@pytest.fixture
+def client():
+    return app_advanced.app.test_client()
+
+def png_upload(seed=0, size=(40, 40)):
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer, f'leaf-{seed}.png'
+
+def test_predict_serves_uint8_uploads_through_the_scheduler(client, predictor):
+    response = client.post('/predict', data={'file': png_upload(1), 'top_n': '2'})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results['all_predictions']) == 2
+    assert results['processing_options']['top_n'] == 2
+    assert predictor.batches[0][0].dtype == np.uint8
+
+def test_remote_inference_gets_a_dispatcher_per_batch_in_flight():
+    config = {'INFERENCE_WORKERS': ['127.0.0.1:6000', '127.0.0.1:6001'], 'INFERENCE_SLOTS': 32,
+              'MAX_BATCH_SIZE': 16, 'PREDICTOR_REPLICAS': 1}
+    assert app_advanced.scheduler_dispatchers(config) == 4
+    assert app_advanced.scheduler_dispatchers(dict(config, INFERENCE_SLOTS=8)) == 2
+    assert app_advanced.scheduler_dispatchers(dict(config, INFERENCE_WORKERS=[], PREDICTOR_REPLICAS=3)) == 3
+
+@pytest.mark.parametrize('top_n', ['0', '-3', 'five'])
+def test_predict_rejects_invalid_top_n(client, predictor, top_n):
+    response = client.post('/predict', data={'file': png_upload(2), 'top_n': top_n})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert 'top_n' in response.get_json()['error']
+    assert predictor.batches == []
+
+def test_predict_caps_top_n(client, predictor):
+    response = client.post('/predict', data={'file': png_upload(3), 'top_n': '50'})
+    assert response.status_code == 200
+    assert response.get_json()['results']['processing_options']['top_n'] == 10
+
+def test_predict_without_a_file_is_a_client_error(client, predictor):
+    assert client.post('/predict', data={}).status_code == 400
+    assert client.post('/predict', data={'file': (io.BytesIO(b'text'), 'notes.txt')}).status_code == 400
+
+def test_undecodable_upload_is_a_client_error(client, predictor):
+    response = client.post('/predict', data={'file': (io.BytesIO(b'not an image'), 'leaf.png')})
+    assert response.status_code == 400
+    assert 'Error processing image' in response.get_json()['error']
+
+def test_similar_rejects_invalid_k(client, predictor, monkeypatch):
+    monkeypatch.setattr(predictor, 'supports_embeddings', lambda: True)
+    monkeypatch.setattr(app_advanced, 'near_duplicate_index', object())
+    response = client.post('/similar', data={'file': png_upload(4), 'k': '0'})
+    assert response.status_code == 400
+    assert 'Invalid k' in response.get_json()['error']
+
+def test_requests_before_the_model_is_ready_get_503(client, monkeypatch):
+    monkeypatch.setattr(app_advanced, 'get_predictor', lambda: None)
+    monkeypatch.setattr(app_advanced.predictor_manager, 'start', lambda force=False: False)
+    response = client.post('/predict', data={'file': png_upload(5)})
+    assert response.status_code == 503
+
+def test_requests_are_answered_503_until_the_model_is_warm(client, monkeypatch):
+    loaded = threading.Event()
+    predictor = FakePredictor()
+    manager = PredictorManager(lambda: loaded.wait(timeout=5) and predictor)
+    monkeypatch.setattr(app_advanced, 'predictor_manager', manager)
+    manager.start()
+
+    response = client.post('/predict', data={'file': png_upload(13)})
+    assert response.status_code == 503
+    assert response.get_json()['model_state'] == 'loading'
+    assert int(response.headers['Retry-After']) == app_advanced.app.config['MODEL_RETRY_AFTER']
+    assert client.get('/health/ready').status_code == 503
+    assert client.get('/health/live').status_code == 200
+
+    loaded.set()
+    assert manager.wait_ready(timeout=5)
+    assert client.get('/health/ready').get_json()['ready'] is True
+    assert client.post('/predict', data={'file': png_upload(13)}).status_code == 200
+
+def test_clients_are_told_to_wait_out_the_circuit_breaker_backoff(client, monkeypatch):
+    def failing_factory():
+        raise FileNotFoundError("No model files found")
+
+    manager = PredictorManager(failing_factory, retry_backoff=60.0)
+    monkeypatch.setattr(app_advanced, 'predictor_manager', manager)
+    manager.start()
+    manager._thread.join(timeout=5)
+
+    response = client.post('/predict', data={'file': png_upload(14)})
+    assert response.status_code == 503
+    assert response.get_json()['circuit'] == 'open'
+    assert response.headers['Retry-After'] == '60'
+    assert manager.get_status()['load_attempts'] == 1  # The request didn't trigger another load
+
+def test_request_bodies_over_the_route_limit_get_a_json_413(client, predictor, monkeypatch):
+    monkeypatch.setitem(app_advanced.app.config, 'MAX_CONTENT_LENGTH', 2000)
+    response = client.post('/predict', data={'file': png_upload(6, size=(300, 300))})
+    assert response.status_code == 413
+    assert 'Request too large' in response.get_json()['error']
+    assert predictor.batches == []
+
+def test_only_batch_predict_gets_the_batch_allowance(client, predictor, monkeypatch):
+    monkeypatch.setitem(app_advanced.app.config, 'MAX_CONTENT_LENGTH', 2000)
+    response = client.post('/batch_predict', data={'files': [png_upload(7, (300, 300)), png_upload(8, (300, 300))]})
+    assert response.status_code == 200
+    assert response.get_json()['processed_count'] == 2
+
+def test_batch_files_over_the_file_limit_are_reported_individually(client, predictor, monkeypatch):
+    monkeypatch.setitem(app_advanced.app.config, 'MAX_FILE_SIZE', 5000)
+    response = client.post('/batch_predict', data={'files': [png_upload(9, (16, 16)), png_upload(10, (300, 300))]})
+    assert response.status_code == 200
+    small, large = response.get_json()['results']
+    assert 'error' not in small
+    assert 'File too large' in large['error']
+
+def test_batch_decodes_are_bounded_by_the_decode_gate(client, predictor, monkeypatch):
+    gate = app_advanced.AdmissionGate('decode', 1, wait_seconds=0.01)
+    monkeypatch.setattr(app_advanced, 'decode_gate', gate)
+    with gate:  # Every decode slot is taken by other uploads
+        response = client.post('/batch_predict', data={'files': [png_upload(41), png_upload(42)]})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+    assert predictor.batches == []
+    assert gate.get_stats()['rejected'] >= 1
+
+    gate.wait_seconds = 5.0  # Let decodes left over from the rejected batch finish
+    response = client.post('/batch_predict', data={'files': [png_upload(43), png_upload(44)]})
+    assert response.status_code == 200
+    assert response.get_json()['processed_count'] == 2
+    assert gate.get_stats()['in_use'] == 0
+
+def test_uploaded_size_is_measured_on_the_stream():
+    stream = io.BytesIO(b'x' * 1234)
+    stream.seek(100)
+    file = FileStorage(stream=stream, filename='leaf.png')
+    assert app_advanced.uploaded_size(file) == 1234
+    assert stream.tell() == 100
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip', 'gzip'),
+    ('GZIP, deflate', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_compression_honors_accept_encoding_quality(client, predictor, monkeypatch, accept_encoding, expected):
+    monkeypatch.setitem(app_advanced.app.config, 'COMPRESSION_MIN_SIZE', 0)
+    response = client.post('/predict', data={'file': png_upload(11)}, headers={'Accept-Encoding': accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == expected
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    body = gzip.decompress(response.data) if expected == 'gzip' else response.data
+    assert json.loads(body)['success'] is True
+
+def test_gzip_is_used_when_brotli_is_unavailable(client, predictor, monkeypatch):
+    monkeypatch.setitem(app_advanced.app.config, 'COMPRESSION_MIN_SIZE', 0)
+    monkeypatch.setattr(app_advanced, 'brotli', None)
+    response = client.post('/predict', data={'file': png_upload(12)}, headers={'Accept-Encoding': 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+@pytest.fixture
+def embedding_predictor(monkeypatch):
+    predictor = EmbeddingPredictor()
+    monkeypatch.setattr(app_advanced, 'get_predictor', lambda: predictor)
+    monkeypatch.setattr(app_advanced, 'near_duplicate_index', EmbeddingIndex(similarity_threshold=0.9))
+    return predictor
+
+def test_near_duplicate_uploads_are_answered_without_the_tta_pass(client, embedding_predictor):
+    first = client.post('/predict', data={'file': png_upload(20), 'use_tta': 'true'}).get_json()['results']
+    assert embedding_predictor.passes == [{'use_tta': False, 'return_embeddings': True},
+                                          {'use_tta': True, 'return_embeddings': False}]
+    assert first['tta_views'] == 5
+    assert 'near_duplicate' not in first
+
+    second = client.post('/predict', data={'file': png_upload(21), 'use_tta': 'true'}).get_json()['results']
+    assert len(embedding_predictor.passes) == 3  # Only the un-augmented pass
+    assert second['near_duplicate']['similarity'] == pytest.approx(1.0)
+    assert second['tta_views'] == 5  # The neighbour's TTA result
+    assert second['cache'] == 'computed'
+
+def test_near_duplicates_are_only_reused_for_the_same_options(client, embedding_predictor):
+    client.post('/predict', data={'file': png_upload(22), 'use_tta': 'true'})
+    results = client.post('/predict', data={'file': png_upload(23), 'use_tta': 'false'}).get_json()['results']
+    assert 'near_duplicate' not in results
+    assert embedding_predictor.passes[2:] == [{'use_tta': False, 'return_embeddings': True}]  # No TTA asked for
+
+class RecordingManager:
+    """PredictorManager stand-in that records swaps instead of loading models"""
+
+    version = 'v1'
+
+    def __init__(self):
+        self.swaps = []
+
+    def swap(self, factory, version):
+        self.swaps.append(version)
+        return True
+
+@pytest.fixture
+def swap_client(client, monkeypatch):
+    monkeypatch.setitem(app_advanced.app.config, 'MODEL_ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(app_advanced, 'predictor_manager', RecordingManager())
+    return lambda body: client.post('/model/swap', json=body, headers={'X-Admin-Token': 'secret'})
+
+@pytest.mark.parametrize('engine, shipped_file', [
+    ('tensorflow', 'model.h5'),
+    ('tensorflow', 'model.h5.gz'),
+    ('onnx', 'model.onnx'),
+    ('tflite', 'model.float16.tflite'),
+])
+def test_swap_accepts_any_model_file_the_engine_can_serve(swap_client, monkeypatch, tmp_path, engine, shipped_file):
+    monkeypatch.setitem(app_advanced.app.config, 'INFERENCE_ENGINE', engine)
+    (tmp_path / shipped_file).write_bytes(b'model')
+
+    response = swap_client({'model_path': str(tmp_path / 'model.h5'), 'version': 'v2'})
+    assert response.status_code == 202
+    assert app_advanced.predictor_manager.swaps == ['v2']
+
+@pytest.mark.parametrize('engine, shipped_file', [('tensorflow', 'model.onnx'), ('onnx', 'missing')])
+def test_swap_rejects_models_the_engine_cannot_serve(swap_client, monkeypatch, tmp_path, engine, shipped_file):
+    monkeypatch.setitem(app_advanced.app.config, 'INFERENCE_ENGINE', engine)
+    (tmp_path / shipped_file).write_bytes(b'model')
+
+    response = swap_client({'model_path': str(tmp_path / 'model.h5'), 'version': 'v2'})
+    assert response.status_code == 400
+    assert app_advanced.predictor_manager.swaps == []
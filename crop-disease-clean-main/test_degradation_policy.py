@@ -0,0 +1,95 @@
+"""
+Tests for load-aware quality degradation
+"""
+
+import pytest
+
+import degradation_policy
+from degradation_policy import DegradationPolicy
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(degradation_policy.time, 'monotonic', clock)
+    return clock
+
+def test_levels_follow_queue_depth_thresholds(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48))
+    assert policy.update(queue_depth=0) == 0
+    assert policy.update(queue_depth=8) == 1
+    assert policy.update(queue_depth=24) == 2
+    assert policy.update(queue_depth=100) == 3
+
+def test_degrades_immediately_but_recovers_one_level_at_a_time(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48), recovery_seconds=5.0)
+    assert policy.update(queue_depth=48) == 3
+
+    assert policy.update(queue_depth=0) == 3  # Load dropped; recovery timer starts
+    clock.now += 4.9
+    assert policy.update(queue_depth=0) == 3
+    clock.now += 0.2
+    assert policy.update(queue_depth=0) == 2
+    clock.now += 5.0
+    assert policy.update(queue_depth=0) == 1
+    clock.now += 5.0
+    assert policy.update(queue_depth=0) == 0
+
+def test_load_returning_resets_recovery(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48), recovery_seconds=5.0)
+    policy.update(queue_depth=24)
+    policy.update(queue_depth=0)
+    clock.now += 4.0
+    assert policy.update(queue_depth=24) == 2  # Back at the current level
+    clock.now += 4.0
+    assert policy.update(queue_depth=0) == 2  # Timer restarted, not 8s old
+    clock.now += 5.0
+    assert policy.update(queue_depth=0) == 1
+
+def test_latency_mode_uses_the_smoothed_latency(clock):
+    policy = DegradationPolicy(mode='latency', latency_slo_ms=100.0, latency_thresholds=(0.8, 1.0, 1.5), ewma_alpha=1.0)
+    policy.observe_latency(50.0)
+    assert policy.update() == 0
+    policy.observe_latency(120.0)
+    assert policy.update() == 2
+
+def test_apply_reports_only_the_options_it_changed(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48))
+    requested = {'use_tta': 'adaptive', 'enhance_image': True, 'top_n': 5}
+
+    assert policy.apply(requested, queue_depth=0) == (requested, None)
+
+    served, degraded = policy.apply(requested, queue_depth=24)
+    assert served == {'use_tta': False, 'enhance_image': False, 'top_n': 3}
+    assert degraded['level'] == 2
+    assert degraded['changes']['top_n'] == {'requested': 5, 'served': 3}
+
+    served, degraded = policy.apply({'use_tta': False, 'enhance_image': False, 'top_n': 1}, queue_depth=24)
+    assert degraded is None
+
+def test_fewer_tta_views_at_level_one(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48))
+    served, degraded = policy.apply({'use_tta': True, 'enhance_image': False, 'top_n': 5}, queue_depth=8)
+    assert served['tta_views'] == 3
+    assert degraded['changes'] == {'tta_views': {'requested': degradation_policy.TTA_VIEWS, 'served': 3}}
+
+def test_cascade_escalation_is_only_skipped_for_cascades(clock):
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48))
+    options = {'use_tta': False, 'enhance_image': False, 'top_n': 1}
+    assert 'escalate' not in policy.apply(options, queue_depth=48)[0]
+    assert policy.apply(options, queue_depth=48, cascade=True)[0]['escalate'] is False
+
+def test_disabled_policy_serves_full_quality(clock):
+    policy = DegradationPolicy(enabled=False)
+    options = {'use_tta': True, 'enhance_image': True, 'top_n': 5}
+    assert policy.apply(options, queue_depth=1000) == (options, None)
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        DegradationPolicy(mode='cpu')
@@ -0,0 +1,51 @@
+"""
+Tests for the engine parity harness that don't need a loaded model
+"""
+
+import numpy as np
+from PIL import Image
+
+from engine_parity import compare, load_uint8_images, run_engine_uint8
+
+CLASS_NAMES = ['Apple___Apple_scab', 'Apple___healthy', 'Tomato___Late_blight']
+
+class ServingPredictor:
+    """Serving-path stand-in: records its inputs and answers from a fixed probability vector"""
+
+    IMG_HEIGHT = IMG_WIDTH = 16
+    class_names = CLASS_NAMES
+    class_index = {name: i for i, name in enumerate(CLASS_NAMES)}
+
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+        self.inputs = []
+
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, **options):
+        self.inputs.extend(image_arrays)
+        order = np.argsort(-np.array(self.probabilities))[:top_n]
+        return [{'all_predictions': [
+            {'full_name': CLASS_NAMES[i], 'confidence': self.probabilities[i]} for i in order
+        ]} for _ in image_arrays]
+
+def test_uint8_run_rebuilds_every_class_probability():
+    predictor = ServingPredictor([0.2, 0.1, 0.7])
+    images = [np.zeros((40, 40, 3), dtype=np.uint8), np.ones((20, 30, 3), dtype=np.uint8)]
+
+    probabilities, latencies = run_engine_uint8(predictor, images, use_tta=False)
+
+    np.testing.assert_allclose(probabilities, [[0.2, 0.1, 0.7]] * 2)
+    assert len(latencies) == 2
+    assert all(image.dtype == np.uint8 for image in predictor.inputs)
+
+def test_uint8_images_are_decoded_near_the_model_size(tmp_path):
+    Image.new('RGB', (100, 64), (10, 200, 30)).save(tmp_path / 'leaf.png')
+    image, = load_uint8_images(ServingPredictor([1, 0, 0]), str(tmp_path), ['leaf.png'])
+    assert image.dtype == np.uint8
+    assert image.shape == (16, 25, 3)  # Box-reduced by 4, like process_uploaded_image
+    assert image[0, 0].tolist() == [10, 200, 30]
+
+def test_identical_probabilities_are_in_parity():
+    probabilities = np.array([[0.2, 0.1, 0.7], [0.6, 0.3, 0.1]])
+    assert compare(probabilities, probabilities, top_k=2) == {
+        'max_delta': 0.0, 'mean_delta': 0.0, 'top1_agreement': 1.0, 'top5_overlap': 1.0
+    }
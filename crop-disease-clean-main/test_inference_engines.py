@@ -0,0 +1,81 @@
+"""
+Tests for the alternate inference engines
+The TFLite interpreter is replaced by a small fake, so no runtime is needed.
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from inference_engines import TFLiteEngine
+
+class FakeInterpreter:
+    """TFLite interpreter stand-in: each class probability is the image's mean pixel"""
+
+    created = []
+
+    def __init__(self, model_path=None, model_content=None, num_threads=None):
+        self.shape = np.array([1, 4, 4, 3])
+        self.allocations = 0
+        self.input = None
+        FakeInterpreter.created.append(self)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': self.shape.copy(), 'shape_signature': np.array([-1, 4, 4, 3]), 'dtype': np.float32}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'dtype': np.float32}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = np.array(shape)
+
+    def allocate_tensors(self):
+        self.allocations += 1
+
+    def set_tensor(self, index, value):
+        assert value.shape == tuple(self.shape)
+        self.input = value
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return np.repeat(self.input.mean(axis=(1, 2, 3))[:, np.newaxis], 2, axis=1)
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    runtime = types.ModuleType('tflite_runtime')
+    runtime.interpreter = types.SimpleNamespace(Interpreter=FakeInterpreter)
+    monkeypatch.setitem(sys.modules, 'tflite_runtime', runtime)
+    monkeypatch.setitem(sys.modules, 'tflite_runtime.interpreter', runtime.interpreter)
+    FakeInterpreter.created = []
+
+    model_path = tmp_path / 'model.float16.tflite'
+    model_path.write_bytes(b'flatbuffer')
+    return TFLiteEngine(str(model_path))
+
+def batch_of(*values):
+    return np.stack([np.full((4, 4, 3), value, dtype=np.float32) for value in values])
+
+def test_a_single_interpreter_serves_every_bucket(engine):
+    for size in (1, 3, 5, 16, 20):
+        assert engine.predict(batch_of(*range(size))).shape == (size, 2)
+    assert len(FakeInterpreter.created) == 1
+
+def test_the_input_is_only_resized_when_the_bucket_changes(engine):
+    interpreter = FakeInterpreter.created[0]
+    allocations = interpreter.allocations
+
+    engine.predict(batch_of(1, 2, 3))
+    engine.predict(batch_of(1, 2, 3, 4))  # Same bucket of 4
+    assert engine.resizes == 1
+    assert interpreter.allocations == allocations + 1
+
+    engine.predict(batch_of(1))
+    assert engine.resizes == 2
+    assert engine.get_info()['allocated_bucket'] == 1
+
+def test_padding_rows_are_dropped_from_the_output(engine):
+    np.testing.assert_allclose(engine.predict(batch_of(0.25, 0.5, 0.75)), [[0.25] * 2, [0.5] * 2, [0.75] * 2])
@@ -0,0 +1,154 @@
+"""
+Tests for the micro-batching inference scheduler
+"""
+
+import threading
+import time
+
+import pytest
+
+from inference_scheduler import MicroBatchScheduler, QueueFullError, INTERACTIVE, BATCH, BACKGROUND
+
+class RecordingPredictFn:
+    """predict_batch_fn stand-in that records every batch it is called with"""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, image_arrays, **options):
+        with self._lock:
+            self.batches.append((list(image_arrays), options))
+        return [dict(options, image=image) for image in image_arrays]
+
+class BlockingPredictFn(RecordingPredictFn):
+    """Holds the first batch until released, so later submits stay queued"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, image_arrays, **options):
+        results = super().__call__(image_arrays, **options)
+        self.started.set()
+        self.release.wait(timeout=5)
+        return results
+
+def test_concurrent_requests_are_coalesced_into_one_batch():
+    predict_fn = RecordingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=16, batch_window_ms=200)
+    try:
+        futures = [scheduler.submit(i, top_n=5) for i in range(5)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert [result['image'] for result in results] == list(range(5))
+    assert len(predict_fn.batches) == 1
+    assert predict_fn.batches[0][0] == list(range(5))
+
+def test_batches_never_exceed_max_batch_size():
+    predict_fn = RecordingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=4, batch_window_ms=50)
+    try:
+        futures = [scheduler.submit(i) for i in range(10)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert [result['image'] for result in results] == list(range(10))
+    assert max(len(images) for images, _ in predict_fn.batches) <= 4
+    assert sum(len(images) for images, _ in predict_fn.batches) == 10
+
+def test_requests_are_only_coalesced_with_matching_options():
+    predict_fn = RecordingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=16, batch_window_ms=200)
+    try:
+        futures = [scheduler.submit(i, top_n=1 if i % 2 else 3) for i in range(6)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    for i, result in enumerate(results):
+        assert result['image'] == i
+        assert result['top_n'] == (1 if i % 2 else 3)
+    assert sorted((options['top_n'], images) for images, options in predict_fn.batches) == [
+        (1, [1, 3, 5]), (3, [0, 2, 4])
+    ]
+
+def test_errors_are_delivered_to_every_request_in_the_batch():
+    def failing_predict_fn(image_arrays, **options):
+        raise RuntimeError("model failed")
+
+    scheduler = MicroBatchScheduler(failing_predict_fn, batch_window_ms=50)
+    try:
+        futures = [scheduler.submit(i) for i in range(3)]
+        errors = [future.exception(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+def test_interactive_submits_beyond_the_queue_cap_are_rejected():
+    predict_fn = BlockingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=1, batch_window_ms=1, max_queue_depth=2)
+    try:
+        running = scheduler.submit('running')
+        assert predict_fn.started.wait(timeout=5)
+
+        queued = [scheduler.submit('queued-1'), scheduler.submit('queued-2')]
+        assert scheduler.is_saturated()
+        with pytest.raises(QueueFullError):
+            scheduler.submit('rejected')
+
+        # Batch work is bounded by its callers, not by the interactive cap
+        batch = scheduler.submit_many(['bulk-1', 'bulk-2', 'bulk-3'], BATCH)
+
+        predict_fn.release.set()
+        for future in [running] + queued + batch:
+            future.result(timeout=5)
+    finally:
+        predict_fn.release.set()
+        scheduler.stop()
+
+    assert scheduler.get_stats()['rejected'] == 1
+    assert not scheduler.is_saturated()
+
+def dispatch_order(scheduler, predict_fn, queue_work, wait_before_release=0.0):
+    """Queue work behind a running batch, release it and return the images in dispatch order"""
+    try:
+        running = scheduler.submit('running')
+        assert predict_fn.started.wait(timeout=5)
+        futures = queue_work(scheduler)
+        time.sleep(wait_before_release)
+        predict_fn.release.set()
+        for future in [running] + futures:
+            future.result(timeout=5)
+    finally:
+        predict_fn.release.set()
+        scheduler.stop()
+    return [image for images, _ in predict_fn.batches for image in images][1:]
+
+def test_interactive_requests_are_served_before_queued_bulk_work():
+    predict_fn = BlockingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=1, batch_window_ms=1)
+
+    def queue_work(scheduler):
+        return (scheduler.submit_many(['background'], BACKGROUND)
+                + scheduler.submit_many(['bulk'], BATCH)
+                + [scheduler.submit('interactive', INTERACTIVE)])
+
+    assert dispatch_order(scheduler, predict_fn, queue_work) == ['interactive', 'bulk', 'background']
+
+def test_starved_classes_are_served_out_of_turn():
+    predict_fn = BlockingPredictFn()
+    scheduler = MicroBatchScheduler(predict_fn, max_batch_size=1, batch_window_ms=1, starvation_ms={BACKGROUND: 1})
+
+    def queue_work(scheduler):
+        return (scheduler.submit_many(['background'], BACKGROUND)
+                + [scheduler.submit(f'interactive-{i}', INTERACTIVE) for i in range(3)])
+
+    order = dispatch_order(scheduler, predict_fn, queue_work, wait_before_release=0.05)
+    assert order[0] == 'background'
+    assert scheduler.get_stats()['classes'][BACKGROUND]['starvation_promotions'] == 1
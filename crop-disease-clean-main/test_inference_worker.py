@@ -0,0 +1,99 @@
+"""
+Tests for handing images to out-of-process inference workers
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from inference_scheduler import MicroBatchScheduler
+from inference_worker import RemotePredictor, fit_to_slot
+
+SLOT_BYTES = 4 * 1024 * 1024
+
+def test_images_that_fit_are_passed_through():
+    image = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    assert fit_to_slot(image, SLOT_BYTES) is image
+
+def test_oversized_images_are_reduced_once_by_the_smallest_factor():
+    image = np.zeros((3000, 4000, 3), dtype=np.uint8)  # 36MB: a factor of 3 brings it to 4MB
+    reduced = fit_to_slot(image, SLOT_BYTES)
+    assert reduced.shape == (1000, 1334, 3)
+    assert reduced.nbytes <= SLOT_BYTES
+
+@pytest.mark.parametrize('shape', [(4000, 6000, 3), (1200, 1200, 3), (8000, 500, 3)])
+def test_reduction_is_never_more_than_needed(shape):
+    image = np.zeros(shape, dtype=np.uint8)
+    reduced = fit_to_slot(image, SLOT_BYTES)
+    assert reduced.nbytes <= SLOT_BYTES
+
+    factor = -(-shape[0] // reduced.shape[0])
+    if factor > 2:
+        larger = -(-shape[0] // (factor - 1)) * -(-shape[1] // (factor - 1)) * 3
+        assert larger > SLOT_BYTES
+
+def test_pixels_are_averaged_from_the_original():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    image[:2, :2] = 200
+    assert fit_to_slot(image, 12)[0, 0, 0] == 200
+
+def test_float_images_are_rejected():
+    with pytest.raises(ValueError):
+        fit_to_slot(np.zeros((10, 10, 3), dtype=np.float32), SLOT_BYTES)
+
+class FakeConnection:
+    """Inference process stand-in that holds each request until the test releases it"""
+
+    def __init__(self, address):
+        self.address = address
+        self.alive = True
+        self.requests = []
+
+    def in_flight(self):
+        return sum(not future.done() for _, future in self.requests)
+
+    def submit(self, image_arrays, options, timeout=None):
+        future = Future()
+        self.requests.append((list(image_arrays), future))
+        return future
+
+    def release(self):
+        for image_arrays, future in self.requests:
+            future.set_result([{'worker': self.address, 'image': image} for image in image_arrays])
+
+def remote_predictor(addresses):
+    predictor = RemotePredictor.__new__(RemotePredictor)
+    predictor.slots = 32
+    predictor.timeout = 5.0
+    predictor._connections = [FakeConnection(address) for address in addresses]
+    predictor._last_reconnect = {}
+    predictor._assigning = {}
+    predictor._lock = threading.Lock()
+    return predictor
+
+def test_concurrent_batches_reach_different_inference_workers():
+    predictor = remote_predictor(['127.0.0.1:6000', '127.0.0.1:6001'])
+    scheduler = MicroBatchScheduler(
+        lambda image_arrays, **options: predictor.predict_batch_from_arrays(image_arrays, **options),
+        max_batch_size=1, batch_window_ms=1, num_workers=2
+    )
+    scheduler.start()
+    try:
+        futures = [scheduler.submit('first'), scheduler.submit('second')]
+
+        deadline = time.monotonic() + 5
+        while sum(len(worker.requests) for worker in predictor._connections) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [len(worker.requests) for worker in predictor._connections] == [1, 1]
+
+        for worker in predictor._connections:
+            worker.release()
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert {result['worker'] for result in results} == {'127.0.0.1:6000', '127.0.0.1:6001'}
+    assert predictor._assigning == {}
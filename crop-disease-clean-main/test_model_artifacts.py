@@ -0,0 +1,119 @@
+"""
+Tests for the pre-converted model artifact cache
+Keras is replaced by a small fake that records weights, so TensorFlow isn't needed.
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from model_artifacts import ModelArtifactCache, find_model_source, save_keras_artifact, load_keras_artifact
+
+class FakeModel:
+    def __init__(self, weights=None, architecture='{"layers": 2}'):
+        self.weights = weights or []
+        self.architecture = architecture
+
+    def get_weights(self):
+        return self.weights
+
+    def set_weights(self, weights):
+        self.weights = weights
+
+    def to_json(self):
+        return self.architecture
+
+def fake_keras(loaded_models):
+    """keras stand-in whose load_model returns (and records) a fixed model"""
+    def load_model(path, compile=False):
+        loaded_models.append(path)
+        return FakeModel([np.arange(6, dtype=np.float32).reshape(2, 3), np.ones(5, dtype=np.float16)])
+
+    return types.SimpleNamespace(models=types.SimpleNamespace(
+        load_model=load_model,
+        model_from_json=lambda architecture: FakeModel(architecture=architecture)
+    ))
+
+def write_model(path, content=b'model weights'):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+def test_find_model_source_accepts_a_gzip_copy(tmp_path):
+    assert find_model_source(str(tmp_path / 'model.h5')) is None
+    write_model(tmp_path / 'model.h5.gz')
+    assert find_model_source(str(tmp_path / 'model.h5')) == str(tmp_path / 'model.h5.gz')
+    write_model(tmp_path / 'model.h5')
+    assert find_model_source(str(tmp_path / 'model.h5')) == str(tmp_path / 'model.h5')
+
+def test_checksums_are_remembered_until_the_file_changes(tmp_path):
+    cache = ModelArtifactCache(str(tmp_path / 'cache'))
+    model_path = write_model(tmp_path / 'model.h5')
+    checksum = cache.source_checksum(model_path)
+
+    index = json.load(open(cache.index_path))
+    assert index[os.path.abspath(model_path)]['sha256'] == checksum
+
+    write_model(tmp_path / 'model.h5', b'retrained weights')
+    os.utime(model_path, ns=(0, 10 ** 9))
+    assert cache.source_checksum(model_path) != checksum
+
+def checksum_in_child(cache_dir, model_path):
+    ModelArtifactCache(cache_dir).source_checksum(model_path)
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='serve_production forks workers on POSIX only')
+def test_index_updates_from_several_processes_are_all_kept(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    model_paths = [write_model(tmp_path / f'model-{i}.h5', os.urandom(256)) for i in range(16)]
+
+    with multiprocessing.get_context('fork').Pool(8) as pool:
+        pool.starmap(checksum_in_child, [(cache_dir, path) for path in model_paths])
+
+    index = json.load(open(os.path.join(cache_dir, 'checksums.json')))
+    assert sorted(index) == sorted(os.path.abspath(path) for path in model_paths)
+
+def test_artifact_round_trip_memory_maps_aligned_weights(tmp_path):
+    weights = [np.arange(6, dtype=np.float32).reshape(2, 3), np.ones(5, dtype=np.float16), np.zeros(3, dtype=np.int64)]
+    artifact_path = save_keras_artifact(FakeModel(weights), str(tmp_path / 'artifact'))
+
+    model = load_keras_artifact(fake_keras([]), artifact_path)
+    assert model.architecture == '{"layers": 2}'
+    for loaded, original in zip(model.weights, weights):
+        assert isinstance(loaded, np.memmap) or isinstance(loaded.base, np.memmap)
+        assert loaded.dtype == original.dtype
+        np.testing.assert_array_equal(loaded, original)
+
+def test_second_load_comes_from_the_artifact(tmp_path):
+    cache = ModelArtifactCache(str(tmp_path / 'cache'))
+    model_path = write_model(tmp_path / 'model.h5')
+    loaded_models = []
+    keras = fake_keras(loaded_models)
+
+    first_timings, second_timings = {}, {}
+    first = cache.load_keras_model(keras, model_path, first_timings)
+    second = cache.load_keras_model(keras, model_path, second_timings)
+
+    assert loaded_models == [model_path]
+    assert first_timings['source'] == 'model_file'
+    assert second_timings['source'] == 'artifact'
+    assert second_timings['converted_source_load_seconds'] == first_timings['source_load_seconds']
+    assert 'source_load_seconds' not in second_timings
+    for loaded, original in zip(second.get_weights(), first.get_weights()):
+        np.testing.assert_array_equal(loaded, original)
+
+def test_gzip_sources_are_decompressed_into_the_cache(tmp_path):
+    cache = ModelArtifactCache(str(tmp_path / 'cache'))
+    with gzip.open(tmp_path / 'model.h5.gz', 'wb') as f:
+        f.write(b'model weights')
+    loaded_models = []
+
+    cache.load_keras_model(fake_keras(loaded_models), str(tmp_path / 'model.h5.gz'))
+
+    assert os.path.dirname(loaded_models[0]) == cache.cache_dir
+    assert open(loaded_models[0], 'rb').read() == b'model weights'
@@ -0,0 +1,21 @@
+"""
+Tests for the on-disk model registry
+"""
+
+import pytest
+
+from model_registry import ModelRegistry
+
+@pytest.mark.parametrize('shipped_file', ['model.h5', 'model.h5.gz', 'model.onnx', 'model.int8.tflite'])
+def test_versions_shipped_in_any_servable_form_can_be_registered(tmp_path, shipped_file):
+    (tmp_path / shipped_file).write_bytes(b'model')
+    registry = ModelRegistry(str(tmp_path / 'registry.json'))
+
+    registry.register('v2', str(tmp_path / 'model.h5'))
+    assert registry.active()['model_path'] == str(tmp_path / 'model.h5')
+
+def test_missing_models_are_not_registered(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry.json'))
+    with pytest.raises(FileNotFoundError):
+        registry.register('v2', str(tmp_path / 'model.h5'))
+    assert registry.list_versions() == {'active': None, 'versions': {}}
@@ -0,0 +1,181 @@
+"""
+Tests for prediction post-processing that don't need a loaded model
+"""
+
+import threading
+
+import numpy as np
+
+from degradation_policy import DegradationPolicy
+from predict_advanced import AdvancedPlantDiseasePredictor, CascadePlantDiseasePredictor, top_k, TTA_POLICY
+
+CLASS_NAMES = ['Apple___Apple_scab', 'Apple___healthy', 'Tomato___Late_blight', 'Tomato___healthy']
+
+def formatting_predictor():
+    """A predictor with its class table built but no model loaded"""
+    predictor = AdvancedPlantDiseasePredictor.__new__(AdvancedPlantDiseasePredictor)
+    predictor.model_type = 'advanced'
+    predictor.class_names = CLASS_NAMES
+    predictor.disease_info = {}
+    predictor._build_class_table()
+    return predictor
+
+class FakeModel:
+    """_run_model stand-in that records each forward pass and answers by image brightness"""
+
+    CONFIDENT = [0.97, 0.01, 0.01, 0.01]
+    UNCERTAIN = [0.3, 0.3, 0.2, 0.2]
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch, return_embeddings=False):
+        self.batches.append(np.array(batch))
+        return np.array([self.CONFIDENT if image.mean() > 0.5 else self.UNCERTAIN for image in batch])
+
+def tta_predictor(tta_seed=0):
+    """A predictor whose forward passes go to a FakeModel"""
+    predictor = formatting_predictor()
+    predictor.tta_seed = tta_seed
+    predictor.adaptive_tta_margin = 0.3
+    predictor.adaptive_tta_entropy = 0.35
+    predictor._run_model = FakeModel()
+    return predictor
+
+def leaf(seed, size=8):
+    return np.random.default_rng(seed).random((size, size, 3), dtype=np.float32)
+
+def test_top_k_is_sorted_by_confidence():
+    predictions = np.array([[0.1, 0.5, 0.3, 0.05], [0.7, 0.05, 0.04, 0.21]])
+    indices, confidences = top_k(predictions, 3)
+    assert indices.tolist() == [[1, 2, 0], [0, 3, 1]]
+    assert confidences.tolist() == [[0.5, 0.3, 0.1], [0.7, 0.21, 0.05]]
+
+def test_batch_results_have_the_same_fields_for_every_top_n():
+    predictor = formatting_predictor()
+    predictions = np.array([[0.15, 0.2, 0.6, 0.05]])
+    full = predictor.format_batch_results(predictions, 3, [5])[0]
+
+    for top_n in (0, -1, 1):
+        result = predictor.format_batch_results(predictions, top_n, [5])[0]
+        assert result.keys() == full.keys()
+        assert result['tta_views'] == 5
+        assert result['top_prediction'] == 'Tomato___Late_blight'
+        assert len(result['all_predictions']) == 1
+
+    assert [p['full_name'] for p in full['all_predictions']] == [
+        'Tomato___Late_blight', 'Apple___healthy', 'Apple___Apple_scab'
+    ]
+
+def test_tta_views_are_deterministic_for_a_seed():
+    image = leaf(1)
+    batch = tta_predictor(tta_seed=7).build_tta_batch(image, 5)
+
+    np.testing.assert_array_equal(batch, tta_predictor(tta_seed=7).build_tta_batch(image, 5))
+    assert not np.array_equal(batch, tta_predictor(tta_seed=8).build_tta_batch(image, 5))
+    assert batch.shape == (5, 8, 8, 3) and batch.dtype == np.float32
+    np.testing.assert_array_equal(batch[0], image)
+
+    brightness, flip = TTA_POLICY[1]  # Views after the original follow the policy plus a little noise
+    expected = np.clip((image[:, ::-1] if flip else image) * brightness, 0, 1)
+    assert np.abs(batch[2] - expected).max() < 0.1
+
+def test_every_tta_view_of_a_batch_goes_through_one_forward_pass():
+    predictor = tta_predictor()
+    batch = np.stack([leaf(1), leaf(2), leaf(3)])
+
+    predictions, views = predictor._predict_batch_probabilities(batch, use_tta=True, tta_views=5)
+
+    assert len(predictor._run_model.batches) == 1
+    assert predictor._run_model.batches[0].shape == (15, 8, 8, 3)
+    np.testing.assert_array_equal(predictor._run_model.batches[0][5:10], predictor.build_tta_batch(batch[1], 5))
+    assert views == [5, 5, 5]
+    assert predictions.shape == (3, 4)
+
+def test_confident_first_pass_skips_the_remaining_tta_views():
+    predictor = tta_predictor()
+    bright = np.full((2, 8, 8, 3), 0.8, dtype=np.float32)
+
+    predictions, views = predictor._predict_batch_probabilities(bright, use_tta='adaptive', tta_views=5)
+
+    assert views == [1, 1]
+    assert len(predictor._run_model.batches) == 1
+    np.testing.assert_allclose(predictions, [FakeModel.CONFIDENT] * 2)
+
+def test_only_uncertain_images_get_the_full_tta_set():
+    predictor = tta_predictor()
+    batch = np.stack([np.full((8, 8, 3), 0.8, dtype=np.float32), np.full((8, 8, 3), 0.2, dtype=np.float32)])
+
+    predictions, views = predictor._predict_batch_probabilities(batch, use_tta='adaptive', tta_views=5)
+
+    assert views == [1, 5]
+    first_pass, augmented = predictor._run_model.batches
+    assert first_pass.shape == (2, 8, 8, 3)
+    np.testing.assert_array_equal(augmented, predictor.build_tta_batch(batch[1], 5)[1:])
+    np.testing.assert_allclose(predictions[1], FakeModel.UNCERTAIN)
+
+def test_confidence_gate_uses_margin_and_entropy():
+    predictor = tta_predictor()
+    assert predictor.is_confident(np.array(FakeModel.CONFIDENT))
+    assert not predictor.is_confident(np.array(FakeModel.UNCERTAIN))
+    assert not predictor.is_confident(np.array([0.55, 0.45, 0.0, 0.0]))  # Two close classes
+    assert not predictor.is_confident(np.array([0.5, 0.2, 0.15, 0.15]))  # Wide margin, but a spread-out tail
+
+class FakeAdvancedStage:
+    """Advanced cascade stage that records the images escalated to it"""
+
+    def __init__(self):
+        self.escalated = []
+
+    def predict_batch_from_arrays(self, image_arrays, top_n=5, use_tta=True, enhance_image=False, tta_views=5):
+        self.escalated.extend(image_arrays)
+        return [{'top_prediction': 'Tomato___Late_blight', 'tta_views': tta_views} for _ in image_arrays]
+
+def cascade_predictor(escalation_threshold=0.85):
+    """A cascade whose basic stage answers by image brightness (see FakeModel)"""
+    basic = tta_predictor()
+    basic.model_type = 'basic'
+    basic.IMG_HEIGHT = basic.IMG_WIDTH = 8
+    basic.batch_memory_budget = 32 * 1024 * 1024
+
+    cascade = CascadePlantDiseasePredictor.__new__(CascadePlantDiseasePredictor)
+    cascade.basic = basic
+    cascade.advanced = FakeAdvancedStage()
+    cascade.escalation_threshold = escalation_threshold
+    cascade._stats_lock = threading.Lock()
+    cascade.stage_counts = {'basic': 0, 'advanced': 0}
+    return cascade
+
+def test_confident_basic_results_are_returned():
+    cascade = cascade_predictor()
+    result, = cascade.predict_batch_from_arrays(np.full((1, 8, 8, 3), 0.8, dtype=np.float32), top_n=2)
+
+    assert result['cascade_stage'] == 'basic'
+    assert result['top_prediction'] == CLASS_NAMES[0]
+    assert cascade.advanced.escalated == []
+    assert cascade.stage_counts == {'basic': 1, 'advanced': 0}
+
+def test_low_confidence_images_are_escalated():
+    cascade = cascade_predictor()
+    batch = np.stack([np.full((8, 8, 3), 0.8, dtype=np.float32), np.full((8, 8, 3), 0.2, dtype=np.float32)])
+
+    confident, uncertain = cascade.predict_batch_from_arrays(batch, top_n=2, use_tta=True)
+
+    assert confident['cascade_stage'] == 'basic'
+    assert uncertain['cascade_stage'] == 'advanced'
+    assert uncertain['basic_confidence'] == FakeModel.UNCERTAIN[0]
+    assert len(cascade.advanced.escalated) == 1
+    np.testing.assert_array_equal(cascade.advanced.escalated[0], batch[1])
+    assert cascade.stage_counts == {'basic': 1, 'advanced': 1}
+
+def test_degradation_policy_turns_escalation_off():
+    cascade = cascade_predictor()
+    policy = DegradationPolicy(queue_thresholds=(8, 24, 48))
+    options, degraded = policy.apply({'use_tta': True, 'enhance_image': False, 'top_n': 5}, queue_depth=48, cascade=True)
+    assert options['escalate'] is False
+
+    result, = cascade.predict_batch_from_arrays(np.full((1, 8, 8, 3), 0.2, dtype=np.float32), **options)
+
+    assert result['cascade_stage'] == 'basic'
+    assert cascade.advanced.escalated == []
+    assert degraded['changes']['escalate'] == {'requested': True, 'served': False}
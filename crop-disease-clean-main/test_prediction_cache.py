@@ -0,0 +1,122 @@
+"""
+Tests for the content-addressed prediction cache
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+from prediction_cache import PredictionCache, hash_stream
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.005)
+
+def test_hash_stream_rewinds_the_stream():
+    stream = io.BytesIO(b'leaf image bytes')
+    assert hash_stream(stream) == hash_stream(stream)
+    assert stream.tell() == 0
+
+def test_keys_depend_on_content_and_options():
+    key = PredictionCache.make_key('abc', top_n=5, use_tta=True)
+    assert key == PredictionCache.make_key('abc', use_tta=True, top_n=5)
+    assert key != PredictionCache.make_key('abc', top_n=3, use_tta=True)
+    assert key != PredictionCache.make_key('abd', top_n=5, use_tta=True)
+
+def test_concurrent_identical_requests_compute_once():
+    cache = PredictionCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {'top_prediction': 'Tomato___healthy'}
+
+    outcomes = []
+    def request():
+        outcomes.append(cache.get_or_compute('key', compute))
+
+    owner = threading.Thread(target=request)
+    owner.start()
+    assert started.wait(timeout=5)
+    waiters = [threading.Thread(target=request) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    wait_for(lambda: cache.get_stats()['coalesced'] == 4)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert sorted(source for _, source in outcomes) == ['coalesced'] * 4 + ['computed']
+    assert all(result == {'top_prediction': 'Tomato___healthy'} for result, _ in outcomes)
+    assert cache.get_or_compute('key', compute)[1] == 'memory'
+
+def test_a_failed_computation_reaches_waiters_and_is_retried():
+    cache = PredictionCache()
+
+    def fail():
+        raise RuntimeError("decode failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', fail)
+    assert cache.get_or_compute('key', lambda: {'ok': True}) == ({'ok': True}, 'computed')
+
+def test_cached_results_are_copies():
+    cache = PredictionCache()
+    cache.put('key', {'all_predictions': [1, 2]})
+    result, _ = cache.get('key')
+    result['all_predictions'].append(3)
+    assert cache.get('key')[0] == {'all_predictions': [1, 2]}
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    cache.get('a')
+    cache.put('c', {'n': 3})
+    assert cache.get('b') == (None, None)
+    assert cache.get('a')[1] == 'memory'
+
+def test_expired_entries_are_misses():
+    cache = PredictionCache(ttl_seconds=0)
+    cache.put('key', {'n': 1})
+    time.sleep(0.01)
+    assert cache.get('key') == (None, None)
+
+def test_sqlite_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'predictions.sqlite')
+    PredictionCache(sqlite_path=path).put('key', {'n': 1})
+    assert PredictionCache(sqlite_path=path).get('key') == ({'n': 1}, 'disk')
+
+def test_a_result_stored_after_the_first_lookup_is_not_recomputed():
+    cache = PredictionCache()
+    lookup = cache.get
+
+    def leader_finishes_during_lookup(key):
+        result = lookup(key)
+        cache.put(key, {'n': 1})  # The previous leader stores its result and leaves
+        return result
+
+    cache.get = leader_finishes_during_lookup
+    assert cache.get_or_compute('key', lambda: pytest.fail("recomputed")) == ({'n': 1}, 'memory')
+    assert cache.get_stats()['in_flight'] == 0
+
+def test_results_stored_by_another_process_are_rechecked_on_disk(tmp_path):
+    path = str(tmp_path / 'predictions.sqlite')
+    cache, other_process = PredictionCache(sqlite_path=path), PredictionCache(sqlite_path=path)
+    lookup = cache.get
+
+    def other_process_finishes_during_lookup(key):
+        result = lookup(key)
+        other_process.put(key, {'n': 2})
+        return result
+
+    cache.get = other_process_finishes_during_lookup
+    assert cache.get_or_compute('key', lambda: pytest.fail("recomputed")) == ({'n': 2}, 'disk')
@@ -0,0 +1,169 @@
+"""
+Tests for background predictor loading and hot swaps
+"""
+
+import threading
+import time
+import types
+
+import pytest
+
+import predictor_manager
+from predictor_manager import PredictorManager, LOADING, WARMING, READY, FAILED
+
+class FakePredictor:
+    def __init__(self, class_names=('Tomato___healthy', 'Tomato___Late_blight')):
+        self.class_names = list(class_names)
+        self.closed = False
+
+    def warmup(self):
+        pass
+
+    def get_model_info(self):
+        return {'load_timings': {}}
+
+    def close(self):
+        self.closed = True
+
+class SlowPredictor(FakePredictor):
+    """Holds its load and its warmup until each is released"""
+
+    def __init__(self):
+        super().__init__()
+        self.loaded = threading.Event()
+        self.warmed = threading.Event()
+
+    def load(self):
+        assert self.loaded.wait(timeout=5)
+        return self
+
+    def warmup(self):
+        assert self.warmed.wait(timeout=5)
+
+def failing_factory():
+    raise FileNotFoundError("No model files found")
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.005)
+
+def ready_manager(predictor, **kwargs):
+    manager = PredictorManager(lambda: predictor, version='v1', **kwargs)
+    manager.start()
+    assert manager.wait_ready(timeout=5)
+    return manager
+
+def test_swap_closes_the_previous_predictor_after_the_grace_period():
+    old, new = FakePredictor(), FakePredictor()
+    manager = ready_manager(old, retire_after=0.5)
+
+    assert manager.swap(lambda: new, 'v2')
+    wait_for(lambda: manager.get_status()['swap']['state'] == READY)
+    assert manager.predictor is new
+    assert not old.closed  # Requests holding the old predictor can still finish
+    wait_for(lambda: old.closed)
+    assert not new.closed
+
+def test_a_rejected_replacement_is_closed_and_the_old_one_keeps_serving():
+    old, mismatched = FakePredictor(), FakePredictor(class_names=('Potato___healthy',))
+    manager = ready_manager(old, retire_after=0.0)
+
+    assert manager.swap(lambda: mismatched, 'v2')
+    wait_for(lambda: manager.get_status()['swap']['state'] == FAILED)
+    assert manager.predictor is old
+    assert mismatched.closed
+    assert not old.closed
+
+def test_loading_moves_through_warming_to_ready():
+    predictor = SlowPredictor()
+    manager = PredictorManager(predictor.load)
+    assert manager.start()
+    assert manager.state == LOADING
+    assert manager.predictor is None
+    assert not manager.start()  # Only one load at a time
+
+    predictor.loaded.set()
+    wait_for(lambda: manager.state == WARMING)
+    assert manager.predictor is None  # Not served until warm
+
+    predictor.warmed.set()
+    assert manager.wait_ready(timeout=5)
+    assert manager.state == READY
+    assert manager.predictor is predictor
+    assert manager.get_status()['timings']['load_seconds'] >= 0
+
+def test_a_failed_load_is_reported():
+    manager = PredictorManager(failing_factory)
+    manager.start()
+    wait_for(lambda: manager.state == FAILED)
+
+    status = manager.get_status()
+    assert manager.predictor is None
+    assert status['error'] == 'No model files found'
+    assert status['load_failures'] == 1
+    assert not manager.is_ready()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive the manager's monotonic clock by hand, leaving the real one to the test helpers"""
+    clock = FakeClock()
+    monkeypatch.setattr(predictor_manager, 'time', types.SimpleNamespace(
+        monotonic=clock, time=time.time, perf_counter=time.perf_counter
+    ))
+    return clock
+
+def failed_manager(factory, **kwargs):
+    manager = PredictorManager(factory, **kwargs)
+    manager.start()
+    wait_for(lambda: manager.state == FAILED)
+    return manager
+
+def test_circuit_opens_after_a_failed_load_and_half_opens_after_the_backoff(clock):
+    manager = failed_manager(failing_factory, retry_backoff=5.0)
+    assert manager.circuit_state() == 'open'
+    assert manager.get_status()['retry_in_seconds'] == 5.0
+
+    assert not manager.start()  # Requests asking for a retry don't each pay for a load
+    assert manager.get_status()['rejected_retries'] == 1
+    assert manager.state == FAILED
+
+    clock.now += 5.0
+    assert manager.circuit_state() == 'half_open'
+    assert manager.start()
+    wait_for(lambda: manager.state == FAILED)
+    assert manager.consecutive_failures == 2
+
+def test_backoff_doubles_up_to_its_cap(clock):
+    manager = failed_manager(failing_factory, retry_backoff=5.0, max_retry_backoff=30.0)
+    backoffs = [manager.next_retry_at - clock.now]
+    for failures in range(2, 6):
+        clock.now = manager.next_retry_at
+        assert manager.start()
+        wait_for(lambda: manager.consecutive_failures == failures and manager.state == FAILED)
+        backoffs.append(manager.next_retry_at - clock.now)
+
+    assert backoffs == [5.0, 10.0, 20.0, 30.0, 30.0]
+
+def test_a_forced_retry_ignores_the_open_circuit_and_success_closes_it(clock):
+    attempts = []
+    def flaky_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model file is still being copied")
+        return FakePredictor()
+
+    manager = failed_manager(flaky_factory, retry_backoff=60.0)
+    assert manager.start(force=True)
+    assert manager.wait_ready(timeout=5)
+    assert manager.circuit_state() == 'closed'
+    assert manager.consecutive_failures == 0
+    assert manager.get_status()['error'] is None
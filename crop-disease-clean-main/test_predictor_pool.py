@@ -0,0 +1,71 @@
+"""
+Tests for checking predictor replicas in and out of the pool
+Replicas are small fakes, so no model is loaded.
+"""
+
+import threading
+import time
+
+import pytest
+
+from predictor_pool import PredictorPool, default_pool_size
+
+class FakeReplica:
+    model_type = 'advanced'
+    engine = 'tflite'
+    model_version = 'test'
+    IMG_HEIGHT = IMG_WIDTH = 32
+
+    def __init__(self):
+        self.class_names = ['Tomato___Late_blight', 'Tomato___healthy']
+        self.disease_info = {}
+
+def test_tensorflow_defaults_to_a_single_replica():
+    assert default_pool_size('tensorflow') == 1
+    assert 1 <= default_pool_size('tflite', threads_per_replica=1) <= 4
+
+def test_replicas_share_the_primarys_read_only_assets():
+    pool = PredictorPool(FakeReplica, size=3)
+    assert len({id(replica) for replica in pool.replicas}) == 3
+    assert all(replica.class_names is pool.class_names for replica in pool.replicas)
+
+def test_a_checked_out_replica_is_not_handed_to_anyone_else():
+    pool = PredictorPool(FakeReplica, size=2)
+    with pool.checkout() as first, pool.checkout() as second:
+        assert first is not second
+        assert pool.get_stats()['available'] == 0
+    assert pool.get_stats()['available'] == 2
+
+def test_checkout_waits_for_a_busy_replica_and_records_the_wait():
+    pool = PredictorPool(FakeReplica, size=1)
+    checked_out = threading.Event()
+    waiter = {}
+
+    def wait_for_replica():
+        checked_out.wait()
+        with pool.checkout() as replica:
+            waiter['replica'] = replica
+
+    thread = threading.Thread(target=wait_for_replica)
+    thread.start()
+    with pool.checkout() as holder:
+        checked_out.set()
+        time.sleep(0.1)
+        assert 'replica' not in waiter  # Still waiting while the only replica is busy
+    thread.join(timeout=5)
+
+    assert waiter['replica'] is holder
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 2
+    assert stats['max_wait_ms'] >= 50
+    assert 0 < stats['mean_wait_ms'] <= stats['max_wait_ms']
+    assert stats['timeouts'] == 0
+
+def test_checkout_times_out_when_every_replica_stays_busy():
+    pool = PredictorPool(FakeReplica, size=1, checkout_timeout=0.05)
+    with pool.checkout():
+        with pytest.raises(TimeoutError):
+            with pool.checkout():
+                pass
+    assert pool.get_stats()['timeouts'] == 1
+    assert pool.get_stats()['available'] == 1
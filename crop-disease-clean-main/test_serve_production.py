@@ -0,0 +1,61 @@
+"""
+Tests for the gunicorn hooks of the pre-fork server
+The hooks get stand-in arbiter and worker objects, so gunicorn isn't needed.
+"""
+
+import os
+import types
+
+import pytest
+
+import predict_advanced
+from serve_production import assign_core_slot, make_post_fork, worker_cores
+
+def worker(pid):
+    return types.SimpleNamespace(pid=pid)
+
+def test_workers_get_the_lowest_free_core_slot():
+    server = types.SimpleNamespace(WORKERS={})
+    for pid in (10, 11, 12):
+        new_worker = worker(pid)
+        assign_core_slot(server, new_worker)
+        server.WORKERS[pid] = new_worker
+    assert [w.core_slot for w in server.WORKERS.values()] == [0, 1, 2]
+
+    del server.WORKERS[11]  # A replacement takes over the dead worker's cores
+    replacement = worker(13)
+    assign_core_slot(server, replacement)
+    assert replacement.core_slot == 1
+
+def test_post_fork_sizes_thread_pools_to_the_workers_cores(monkeypatch):
+    configured = []
+    monkeypatch.setattr(predict_advanced, 'configure_tensorflow_threads',
+                        lambda intra_op, inter_op: configured.append((intra_op, inter_op)))
+    monkeypatch.delenv('INFERENCE_THREADS', raising=False)
+    monkeypatch.delenv('PREDICTOR_REPLICAS', raising=False)
+    args = types.SimpleNamespace(pin_cores=False, intra_op_threads=None, inter_op_threads=2)
+    cores = list(range(8))
+
+    new_worker = worker(os.getpid())
+    new_worker.core_slot = 1
+    make_post_fork(args, cores, num_workers=2)(None, new_worker)
+
+    assert worker_cores(cores, 1, 2) == [4, 5, 6, 7]
+    assert configured == [(4, 2)]
+    assert os.environ['INFERENCE_THREADS'] == '4'
+    assert os.environ['PREDICTOR_REPLICAS'] == '1'
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='core pinning needs sched_setaffinity')
+def test_post_fork_pins_the_worker_when_asked(monkeypatch):
+    pinned = []
+    monkeypatch.setattr(predict_advanced, 'configure_tensorflow_threads', lambda intra_op, inter_op: None)
+    monkeypatch.setattr(os, 'sched_setaffinity', lambda pid, cores: pinned.append(list(cores)))
+    monkeypatch.setenv('INFERENCE_THREADS', '1')
+    monkeypatch.setenv('PREDICTOR_REPLICAS', '1')
+    args = types.SimpleNamespace(pin_cores=True, intra_op_threads=None, inter_op_threads=2)
+
+    new_worker = worker(os.getpid())
+    new_worker.core_slot = 0
+    make_post_fork(args, [0, 1, 2, 3], num_workers=2)(None, new_worker)
+
+    assert pinned == [[0, 1]]